@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'centroSoluciones.apps.CentrosolucionesConfig',
     'operationsCenter',
     'ventaMaquinarias',
+    'buscador.apps.BuscadorConfig',
     'crispy_forms',
     'crispy_bootstrap5',
     'django_select2',
@@ -157,6 +158,25 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Caché
+# Los widgets AJAX de django_select2 guardan su configuración en caché y la
+# vista de autocompletado la lee en otro request, así que necesitan una caché
+# compartida entre procesos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'select2': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'select2'),
+    },
+}
+
+SELECT2_CACHE_BACKEND = 'select2'
+# base.html ya carga select2 desde el CDN
+SELECT2_JS = ''
+SELECT2_CSS = ''
+
 
 #Messages
 from django.contrib.messages import constants as messages
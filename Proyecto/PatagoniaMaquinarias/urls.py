@@ -15,6 +15,7 @@ urlpatterns = [
     path('centro-soluciones/', include('centroSoluciones.urls')),
     path('operations-center/', include('operationsCenter.urls')),
     path('venta-maquinarias/', include('ventaMaquinarias.urls')),
+    path('buscar/', include('buscador.urls')),
     path('select2/', include('django_select2.urls')),
     path('admin/', admin.site.urls),
     path('login/', auth_views.LoginView.as_view(
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from .models import DocumentoBusqueda
+from .services import BuscadorService
+
+
+class BusquedaAdminMixin:
+    """Resuelve el buscador del admin con el índice unificado en lugar de icontains por columna"""
+
+    def get_search_results(self, request, queryset, search_term):
+        tipo = BuscadorService.tipo_de(self.model)
+        if not search_term.strip() or tipo is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=BuscadorService.ids(tipo, search_term)), False
+
+
+@admin.register(DocumentoBusqueda)
+class DocumentoBusquedaAdmin(admin.ModelAdmin):
+    list_display = ['tipo', 'titulo', 'claves', 'sucursal', 'fecha_actualizacion']
+    list_filter = ['tipo', 'sucursal']
+    search_fields = ['claves', 'titulo']
+    readonly_fields = ['tipo', 'objeto_id', 'titulo', 'claves', 'contenido', 'sucursal', 'url', 'fecha_actualizacion']
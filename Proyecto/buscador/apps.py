@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BuscadorConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'buscador'
+
+    def ready(self):
+        import buscador.signals  # Mantiene el índice de búsqueda al día
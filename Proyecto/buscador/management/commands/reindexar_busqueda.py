@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from buscador.models import DocumentoBusqueda
+from buscador.services import BuscadorService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda unificado (DocumentoBusqueda)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo',
+            action='append',
+            choices=[tipo for tipo, _ in DocumentoBusqueda.TIPO_CHOICES],
+            help='Tipo a reindexar (se puede repetir). Por defecto, todos.',
+        )
+
+    def handle(self, *args, **options):
+        resultado = BuscadorService.reindexar(options['tipo'])
+        for tipo, cantidad in resultado.items():
+            self.stdout.write(f'{tipo}: {cantidad} documentos')
+        self.stdout.write(self.style.SUCCESS('Índice de búsqueda reconstruido'))
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def crear_indice_fulltext(apps, schema_editor):
+    # Django no declara índices FULLTEXT; solo aplica en MySQL
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX buscador_documento_fulltext '
+            'ON buscador_documentobusqueda (titulo, claves, contenido)'
+        )
+
+
+def eliminar_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'DROP INDEX buscador_documento_fulltext ON buscador_documentobusqueda'
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('recursosHumanos', '0013_remove_actividadtrabajo_categoria_facturacion_destinatario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CLIENTE', 'Cliente'), ('EQUIPO', 'Equipo'), ('SERVICIO', 'Servicio'), ('REPUESTO', 'Repuesto'), ('ALERTA', 'Alerta'), ('MAQUINA', 'Máquina Operations Center'), ('EQUIPO_STOCK', 'Equipo en Stock')], max_length=20, verbose_name='Tipo')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID del Objeto')),
+                ('titulo', models.CharField(max_length=255, verbose_name='Título')),
+                ('claves', models.CharField(blank=True, help_text='Identificadores exactos: CUIT, números de serie, PIN, códigos', max_length=255, verbose_name='Claves')),
+                ('contenido', models.TextField(blank=True, verbose_name='Contenido')),
+                ('url', models.CharField(max_length=255, verbose_name='URL')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('sucursal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recursosHumanos.sucursal', verbose_name='Sucursal')),
+            ],
+            options={
+                'verbose_name': 'Documento de Búsqueda',
+                'verbose_name_plural': 'Documentos de Búsqueda',
+                'indexes': [models.Index(fields=['claves'], name='buscador_do_claves_8847df_idx'), models.Index(fields=['titulo'], name='buscador_do_titulo_3c7c7b_idx')],
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(crear_indice_fulltext, eliminar_indice_fulltext),
+    ]
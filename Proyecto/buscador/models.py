@@ -0,0 +1,56 @@
+from django.db import models
+from recursosHumanos.models import Sucursal
+
+
+class DocumentoBusqueda(models.Model):
+    """
+    Documento desnormalizado del índice de búsqueda unificado.
+
+    Hay una fila por cada cliente, equipo, servicio, repuesto, alerta, máquina
+    y equipo en stock, mantenida por las señales de buscador/signals.py. En
+    MySQL las columnas titulo, claves y contenido tienen un índice FULLTEXT
+    (ver la migración inicial).
+    """
+
+    TIPO_CHOICES = [
+        ('CLIENTE', 'Cliente'),
+        ('EQUIPO', 'Equipo'),
+        ('SERVICIO', 'Servicio'),
+        ('REPUESTO', 'Repuesto'),
+        ('ALERTA', 'Alerta'),
+        ('MAQUINA', 'Máquina Operations Center'),
+        ('EQUIPO_STOCK', 'Equipo en Stock'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="ID del Objeto")
+    titulo = models.CharField(max_length=255, verbose_name="Título")
+    claves = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Claves",
+        help_text="Identificadores exactos: CUIT, números de serie, PIN, códigos"
+    )
+    contenido = models.TextField(blank=True, verbose_name="Contenido")
+    sucursal = models.ForeignKey(
+        Sucursal,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Sucursal"
+    )
+    url = models.CharField(max_length=255, verbose_name="URL")
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+
+    class Meta:
+        verbose_name = "Documento de Búsqueda"
+        verbose_name_plural = "Documentos de Búsqueda"
+        unique_together = ['tipo', 'objeto_id']
+        indexes = [
+            models.Index(fields=['claves']),
+            models.Index(fields=['titulo']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.titulo}"
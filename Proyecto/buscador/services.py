@@ -0,0 +1,294 @@
+"""
+Servicios de búsqueda unificada
+"""
+import re
+from urllib.parse import urlencode
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from centroSoluciones.models import AlertaEquipo
+from clientes.models import Cliente, Equipo
+from gestionDeTaller.models import Repuesto, Servicio
+from operationsCenter.models import Machine
+from operationsCenter.services import normalizar_serie, secuencia_pin
+from ventaMaquinarias.models import EquipoStock
+from .models import DocumentoBusqueda
+
+
+def _unir(*partes):
+    """Une las partes no vacías en un solo texto, sin repetir"""
+    vistas = []
+    for parte in partes:
+        if parte and str(parte) not in vistas:
+            vistas.append(str(parte))
+    return ' '.join(vistas)
+
+
+def _documento_cliente(cliente):
+    return {
+        'titulo': cliente.razon_social,
+        'claves': _unir(cliente.cuit, normalizar_serie(cliente.cuit)),
+        'contenido': _unir(cliente.nombre_fantasia, cliente.email, cliente.telefono, cliente.ciudad.nombre),
+        'sucursal_id': cliente.sucursal_id,
+        'url': reverse('detalle_cliente', args=[cliente.pk]),
+    }
+
+
+def _documento_equipo(equipo):
+    return {
+        'titulo': f"{equipo.modelo.nombre} - {equipo.numero_serie}",
+        'claves': _unir(
+            normalizar_serie(equipo.numero_serie),
+            secuencia_pin(equipo.numero_serie),
+            normalizar_serie(equipo.numero_serie_motor),
+        ),
+        'contenido': _unir(equipo.cliente.razon_social, equipo.modelo.marca),
+        'sucursal_id': equipo.cliente.sucursal_id,
+        'url': reverse('detalle_equipo', args=[equipo.cliente_id, equipo.pk]),
+    }
+
+
+def _documento_servicio(servicio):
+    preorden = servicio.preorden
+    return {
+        'titulo': f"Servicio #{servicio.pk} - {preorden.cliente.razon_social}",
+        'claves': _unir(
+            servicio.pk,
+            servicio.orden_servicio,
+            servicio.numero_factura,
+            servicio.numero_cotizacion,
+            normalizar_serie(preorden.equipo.numero_serie),
+        ),
+        'contenido': _unir(
+            preorden.equipo.modelo.nombre,
+            servicio.get_trabajo_display(),
+            preorden.solicitud_cliente,
+            servicio.observaciones,
+        ),
+        'sucursal_id': preorden.sucursal_id,
+        'url': reverse('gestionDeTaller:detalle_servicio', args=[servicio.pk]),
+    }
+
+
+def _documento_repuesto(repuesto):
+    return {
+        'titulo': f"{repuesto.codigo} - {repuesto.descripcion[:200]}",
+        'claves': _unir(repuesto.codigo, normalizar_serie(repuesto.codigo)),
+        'contenido': _unir(repuesto.descripcion, repuesto.categoria, repuesto.proveedor),
+        'sucursal_id': None,
+        'url': f"{reverse('gestionDeTaller:gestionar_repuestos')}?{urlencode({'search': repuesto.codigo})}",
+    }
+
+
+def _documento_alerta(alerta):
+    return {
+        'titulo': f"{alerta.codigo} - {alerta.cliente.razon_social}",
+        'claves': _unir(
+            alerta.codigo,
+            normalizar_serie(alerta.pin_equipo),
+            secuencia_pin(alerta.pin_equipo),
+        ),
+        'contenido': _unir(alerta.descripcion, alerta.get_clasificacion_display()),
+        'sucursal_id': alerta.sucursal_id,
+        'url': reverse('centroSoluciones:alerta_detail', args=[alerta.pk]),
+    }
+
+
+def _documento_maquina(maquina):
+    cliente = maquina.equipo_local.cliente if maquina.equipo_local else None
+    return {
+        'titulo': (_unir(maquina.make_name, maquina.model_name, maquina.serial_number) or maquina.machine_id)[:255],
+        'claves': _unir(
+            normalizar_serie(maquina.serial_number),
+            secuencia_pin(maquina.serial_number),
+            maquina.machine_id,
+        ),
+        'contenido': _unir(cliente.razon_social if cliente else '', maquina.description),
+        'sucursal_id': cliente.sucursal_id if cliente else None,
+        'url': reverse('operationsCenter:detalle_maquina', args=[maquina.pk]),
+    }
+
+
+def _documento_equipo_stock(equipo):
+    return {
+        'titulo': f"{equipo.modelo.nombre} - {equipo.numero_serie}",
+        'claves': _unir(
+            normalizar_serie(equipo.numero_serie),
+            secuencia_pin(equipo.numero_serie),
+            equipo.numero_orden_compra,
+        ),
+        'contenido': _unir(equipo.modelo.marca, equipo.tipo_equipo.nombre, equipo.ubicacion_fisica, equipo.color),
+        'sucursal_id': equipo.sucursal_id,
+        'url': reverse('ventaMaquinarias:detalle_equipo_stock', args=[equipo.pk]),
+    }
+
+
+class BuscadorService:
+    """
+    Índice de búsqueda unificado sobre DocumentoBusqueda.
+
+    Cada tipo indexado tiene su modelo, las relaciones que necesita su
+    documento y la función que lo arma. En MySQL las palabras se buscan con el
+    índice FULLTEXT (modo booleano, por prefijo y ordenado por relevancia); los
+    términos con dígitos (facturas, series, códigos, CUIT) y los más cortos que
+    el token mínimo de InnoDB se buscan por coincidencia parcial, para que un
+    fragmento del medio de un identificador también encuentre el documento. En
+    otros motores todo se busca por coincidencia parcial sobre la misma tabla.
+    """
+
+    INDEXADORES = {
+        'CLIENTE': (Cliente, ['ciudad'], _documento_cliente),
+        'EQUIPO': (Equipo, ['modelo', 'cliente'], _documento_equipo),
+        'SERVICIO': (Servicio, ['preorden__cliente', 'preorden__equipo__modelo'], _documento_servicio),
+        'REPUESTO': (Repuesto, [], _documento_repuesto),
+        'ALERTA': (AlertaEquipo, ['cliente'], _documento_alerta),
+        'MAQUINA': (Machine, ['equipo_local__cliente'], _documento_maquina),
+        'EQUIPO_STOCK': (EquipoStock, ['modelo', 'tipo_equipo'], _documento_equipo_stock),
+    }
+
+    MIN_TOKEN = 3  # innodb_ft_min_token_size por defecto
+    TAMANO_LOTE = 500
+    CAMPOS_DOCUMENTO = ['titulo', 'claves', 'contenido', 'sucursal', 'url', 'fecha_actualizacion']
+
+    @classmethod
+    def tipo_de(cls, modelo):
+        for tipo, (modelo_indexado, _, _) in cls.INDEXADORES.items():
+            if modelo is modelo_indexado:
+                return tipo
+        return None
+
+    # Mantenimiento del índice
+
+    @classmethod
+    def indexar(cls, instancia):
+        """Indexar (o reindexar) un objeto"""
+        tipo = cls.tipo_de(type(instancia))
+        modelo = cls.INDEXADORES[tipo][0]
+        cls.indexar_queryset(tipo, modelo.objects.filter(pk=instancia.pk))
+
+    @classmethod
+    def indexar_queryset(cls, tipo, queryset):
+        """Reindexar en lote los objetos del queryset. Devuelve la cantidad indexada."""
+        _, relaciones, documento = cls.INDEXADORES[tipo]
+        total = 0
+        lote = []
+        for objeto in queryset.select_related(*relaciones).iterator(chunk_size=cls.TAMANO_LOTE):
+            lote.append(DocumentoBusqueda(tipo=tipo, objeto_id=objeto.pk, **documento(objeto)))
+            if len(lote) >= cls.TAMANO_LOTE:
+                total += cls._guardar(lote)
+                lote = []
+        if lote:
+            total += cls._guardar(lote)
+        return total
+
+    @classmethod
+    def _guardar(cls, documentos):
+        # MySQL resuelve el conflicto por cualquier clave única (ON DUPLICATE KEY UPDATE)
+        unique_fields = None
+        if connection.features.supports_update_conflicts_with_target:
+            unique_fields = ['tipo', 'objeto_id']
+        DocumentoBusqueda.objects.bulk_create(
+            documentos,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=cls.CAMPOS_DOCUMENTO,
+        )
+        return len(documentos)
+
+    @classmethod
+    def eliminar(cls, instancia):
+        tipo = cls.tipo_de(type(instancia))
+        DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id=instancia.pk).delete()
+
+    @classmethod
+    def reindexar(cls, tipos=None):
+        """Reconstruir el índice de los tipos indicados (todos por defecto)"""
+        resultado = {}
+        for tipo in tipos or cls.INDEXADORES:
+            modelo = cls.INDEXADORES[tipo][0]
+            with transaction.atomic():
+                DocumentoBusqueda.objects.filter(tipo=tipo).delete()
+                resultado[tipo] = cls.indexar_queryset(tipo, modelo.objects.all())
+        return resultado
+
+    # Consultas
+
+    @classmethod
+    def terminos(cls, texto):
+        """
+        Términos de búsqueda: cada palabra sin separadores internos, de modo que
+        un CUIT "20-12345678-9" o un PIN con guiones se busquen como una sola clave.
+        """
+        return [t for t in (re.sub(r'\W+', '', palabra) for palabra in (texto or '').split()) if t]
+
+    @staticmethod
+    def es_identificador(termino):
+        """Los términos con dígitos se tratan como identificadores (factura, serie, código, CUIT)"""
+        return any(c.isdigit() for c in termino)
+
+    @classmethod
+    def documentos(cls, texto, tipos=None, sucursal=None):
+        """
+        Queryset de DocumentoBusqueda que coinciden con el texto, ordenado por relevancia.
+
+        Con sucursal, se limita a los documentos de esa sucursal y a los que
+        no pertenecen a ninguna (repuestos, máquinas sin vincular).
+        """
+        terminos = cls.terminos(texto)
+        documentos = DocumentoBusqueda.objects.all()
+        if not terminos:
+            return documentos.none()
+        if tipos:
+            documentos = documentos.filter(tipo__in=tipos)
+        if sucursal:
+            documentos = documentos.filter(Q(sucursal=sucursal) | Q(sucursal__isnull=True))
+
+        palabras = [t for t in terminos if len(t) >= cls.MIN_TOKEN and not cls.es_identificador(t)]
+        if connection.vendor == 'mysql' and palabras:
+            consulta = ' '.join(f'+{t}*' for t in palabras)
+            match = "MATCH (titulo, claves, contenido) AGAINST (%s IN BOOLEAN MODE)"
+            documentos = documentos.filter(
+                RawSQL(match, (consulta,), output_field=BooleanField())
+            ).annotate(
+                relevancia=RawSQL(match, (consulta,), output_field=FloatField())
+            )
+            # Identificadores y términos cortos van por coincidencia parcial sobre lo ya acotado
+            for termino in terminos:
+                if termino not in palabras:
+                    documentos = documentos.filter(
+                        Q(claves__icontains=termino) |
+                        Q(titulo__icontains=termino) |
+                        Q(contenido__icontains=termino)
+                    )
+            return documentos.order_by('-relevancia', 'titulo')
+
+        for termino in terminos:
+            documentos = documentos.filter(
+                Q(claves__icontains=termino) |
+                Q(titulo__icontains=termino) |
+                Q(contenido__icontains=termino)
+            )
+        return documentos.order_by('titulo')
+
+    @classmethod
+    def ids(cls, tipo, texto):
+        """Subconsulta de IDs del tipo que coinciden con el texto, para filtrar listados con pk__in"""
+        return cls.documentos(texto, tipos=[tipo]).order_by().values('objeto_id')
+
+    @classmethod
+    def buscar(cls, texto, tipos=None, sucursal=None, limite=20):
+        """Resultados rankeados de la búsqueda, listos para serializar"""
+        return [
+            {
+                'tipo': documento.tipo,
+                'tipo_display': documento.get_tipo_display(),
+                'id': documento.objeto_id,
+                'titulo': documento.titulo,
+                'claves': documento.claves,
+                'url': documento.url,
+            }
+            for documento in cls.documentos(texto, tipos, sucursal)[:limite]
+        ]
@@ -0,0 +1,68 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from clientes.models import Cliente, Equipo
+from gestionDeTaller.models import PreOrden, Servicio
+from centroSoluciones.models import AlertaEquipo
+from operationsCenter.models import Machine
+from .services import BuscadorService
+
+MODELOS_INDEXADOS = [modelo for modelo, _, _ in BuscadorService.INDEXADORES.values()]
+
+
+def _indexar(sender, instance, raw=False, **kwargs):
+    if not raw:
+        BuscadorService.indexar(instance)
+
+
+def _eliminar(sender, instance, **kwargs):
+    BuscadorService.eliminar(instance)
+
+
+for modelo in MODELOS_INDEXADOS:
+    post_save.connect(_indexar, sender=modelo, dispatch_uid=f'buscador_indexar_{modelo.__name__}')
+    post_delete.connect(_eliminar, sender=modelo, dispatch_uid=f'buscador_eliminar_{modelo.__name__}')
+
+
+# Datos del cliente que se copian en los documentos de sus equipos, servicios, alertas y máquinas
+CAMPOS_CLIENTE_INDEXADOS = ('razon_social', 'sucursal_id')
+
+
+@receiver(pre_save, sender=Cliente)
+def recordar_datos_indexados_del_cliente(sender, instance, raw=False, **kwargs):
+    """Guarda los valores previos para reindexar los documentos relacionados solo si cambiaron"""
+    instance._datos_indexados_anteriores = None
+    if instance.pk and not raw:
+        instance._datos_indexados_anteriores = Cliente.objects.filter(pk=instance.pk).values_list(
+            *CAMPOS_CLIENTE_INDEXADOS
+        ).first()
+
+
+@receiver(post_save, sender=Cliente)
+def reindexar_documentos_del_cliente(sender, instance, created, raw=False, **kwargs):
+    """La razón social y la sucursal del cliente forman parte de los documentos de sus equipos, servicios, alertas y máquinas"""
+    if created or raw:
+        return
+    anteriores = getattr(instance, '_datos_indexados_anteriores', None)
+    if anteriores == tuple(getattr(instance, campo) for campo in CAMPOS_CLIENTE_INDEXADOS):
+        return
+    BuscadorService.indexar_queryset('EQUIPO', Equipo.objects.filter(cliente=instance))
+    BuscadorService.indexar_queryset('SERVICIO', Servicio.objects.filter(preorden__cliente=instance))
+    BuscadorService.indexar_queryset('ALERTA', AlertaEquipo.objects.filter(cliente=instance))
+    BuscadorService.indexar_queryset('MAQUINA', Machine.objects.filter(equipo_local__cliente=instance))
+
+
+@receiver(post_save, sender=Equipo)
+def reindexar_documentos_del_equipo(sender, instance, created, raw=False, **kwargs):
+    """Serie y modelo del equipo forman parte de los documentos de sus servicios"""
+    if created or raw:
+        return
+    BuscadorService.indexar_queryset('SERVICIO', Servicio.objects.filter(preorden__equipo=instance))
+
+
+@receiver(post_save, sender=PreOrden)
+def reindexar_servicio_de_la_preorden(sender, instance, created, raw=False, **kwargs):
+    """El documento del servicio toma cliente, equipo y solicitud de su preorden"""
+    if created or raw:
+        return
+    BuscadorService.indexar_queryset('SERVICIO', Servicio.objects.filter(preorden=instance))
@@ -0,0 +1,145 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+
+from clientes.models import Cliente, Equipo, ModeloEquipo, TipoEquipo
+from gestionDeTaller.models import Repuesto
+from operationsCenter.models import Machine
+from operationsCenter.services import MachineMatchingService
+from recursosHumanos.models import Ciudad, Provincia, Sucursal
+from .models import DocumentoBusqueda
+from .services import BuscadorService
+
+
+class BuscadorServiceTests(TestCase):
+    """Índice unificado: mantenimiento por señales y coincidencias parciales sobre identificadores"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provincia = Provincia.objects.create(nombre='Neuquén')
+        cls.ciudad = Ciudad.objects.create(nombre='Neuquén', provincia=cls.provincia)
+        cls.sucursal = Sucursal.objects.create(
+            nombre='Neuquén', direccion='Ruta 22', ciudad=cls.ciudad, provincia=cls.provincia
+        )
+        cls.otra_sucursal = Sucursal.objects.create(
+            nombre='Cipolletti', direccion='Ruta 151', ciudad=cls.ciudad, provincia=cls.provincia
+        )
+        cls.cliente = cls._cliente('Agropecuaria del Valle', '30-71234567-9', cls.sucursal)
+        cls.otro_cliente = cls._cliente('Frutícola Cipolletti', '30-70000111-2', cls.otra_sucursal)
+        cls.repuesto = Repuesto.objects.create(
+            codigo='RE-504836',
+            descripcion='Filtro de aceite de motor',
+            precio_venta=Decimal('15000'),
+        )
+
+    @classmethod
+    def _cliente(cls, razon_social, cuit, sucursal):
+        return Cliente.objects.create(
+            sucursal=sucursal,
+            razon_social=razon_social,
+            cuit=cuit,
+            email='contacto@example.com',
+            telefono='2994000000',
+            direccion='Calle 1',
+            codigo_postal='8300',
+            ciudad=cls.ciudad,
+            provincia=cls.provincia,
+        )
+
+    def _ids(self, tipo, texto):
+        return set(BuscadorService.ids(tipo, texto).values_list('objeto_id', flat=True))
+
+    def test_terminos_compactan_separadores(self):
+        self.assertEqual(BuscadorService.terminos(' 30-71234567-9  re.504836 '), ['30712345679', 're504836'])
+        self.assertEqual(BuscadorService.terminos(''), [])
+
+    def test_es_identificador(self):
+        self.assertTrue(BuscadorService.es_identificador('RE504836'))
+        self.assertFalse(BuscadorService.es_identificador('filtro'))
+
+    def test_guardar_indexa_el_objeto(self):
+        documento = DocumentoBusqueda.objects.get(tipo='CLIENTE', objeto_id=self.cliente.pk)
+        self.assertEqual(documento.titulo, 'Agropecuaria del Valle')
+        self.assertEqual(documento.sucursal_id, self.sucursal.pk)
+        self.assertIn('30712345679', documento.claves)
+
+    def test_cuit_con_o_sin_separadores(self):
+        self.assertEqual(self._ids('CLIENTE', '30-71234567-9'), {self.cliente.pk})
+        self.assertEqual(self._ids('CLIENTE', '30712345679'), {self.cliente.pk})
+
+    def test_fragmento_del_medio_de_un_identificador(self):
+        self.assertEqual(self._ids('CLIENTE', '1234567'), {self.cliente.pk})
+        self.assertEqual(self._ids('REPUESTO', '4836'), {self.repuesto.pk})
+
+    def test_todos_los_terminos_deben_coincidir(self):
+        self.assertEqual(self._ids('REPUESTO', 'filtro aceite'), {self.repuesto.pk})
+        self.assertEqual(self._ids('REPUESTO', 'filtro hidráulico'), set())
+
+    def test_filtra_por_tipo(self):
+        resultados = BuscadorService.buscar('30', tipos=['REPUESTO'])
+        self.assertEqual(resultados, [])
+
+    def test_sucursal_incluye_documentos_sin_sucursal(self):
+        resultados = BuscadorService.buscar('e', sucursal=self.sucursal)
+        encontrados = {(r['tipo'], r['id']) for r in resultados}
+
+        self.assertIn(('CLIENTE', self.cliente.pk), encontrados)
+        self.assertIn(('REPUESTO', self.repuesto.pk), encontrados)
+        self.assertNotIn(('CLIENTE', self.otro_cliente.pk), encontrados)
+
+    def test_editar_reindexa(self):
+        self.cliente.razon_social = 'Agropecuaria Confluencia'
+        self.cliente.save()
+
+        self.assertEqual(self._ids('CLIENTE', 'confluencia'), {self.cliente.pk})
+        self.assertEqual(self._ids('CLIENTE', 'valle'), set())
+
+    def test_borrar_quita_el_documento(self):
+        pk = self.repuesto.pk
+        self.repuesto.delete()
+
+        self.assertFalse(DocumentoBusqueda.objects.filter(tipo='REPUESTO', objeto_id=pk).exists())
+
+    def test_reindexar_reconstruye_el_indice(self):
+        DocumentoBusqueda.objects.all().delete()
+
+        resultado = BuscadorService.reindexar(['CLIENTE', 'REPUESTO'])
+
+        self.assertEqual(resultado, {'CLIENTE': 2, 'REPUESTO': 1})
+        self.assertEqual(self._ids('REPUESTO', 'RE-504836'), {self.repuesto.pk})
+
+    def test_guardar_cliente_sin_cambios_indexados_no_reindexa_relacionados(self):
+        with mock.patch.object(BuscadorService, 'indexar_queryset', wraps=BuscadorService.indexar_queryset) as indexar:
+            self.cliente.telefono = '2994111111'
+            self.cliente.save()
+
+        self.assertEqual([llamada.args[0] for llamada in indexar.call_args_list], ['CLIENTE'])
+
+    def test_cambiar_razon_social_reindexa_relacionados(self):
+        with mock.patch.object(BuscadorService, 'indexar_queryset', wraps=BuscadorService.indexar_queryset) as indexar:
+            self.cliente.razon_social = 'Agropecuaria Confluencia'
+            self.cliente.save()
+
+        self.assertEqual(
+            [llamada.args[0] for llamada in indexar.call_args_list],
+            ['CLIENTE', 'EQUIPO', 'SERVICIO', 'ALERTA', 'MAQUINA'],
+        )
+
+    def test_vincular_maquinas_en_lote_reindexa_con_el_cliente(self):
+        tipo = TipoEquipo.objects.create(nombre='Tractor')
+        modelo = ModeloEquipo.objects.create(nombre='6110J', tipo_equipo=tipo, marca='John Deere')
+        Equipo.objects.create(cliente=self.cliente, modelo=modelo, numero_serie='1PY6110JCMN123456', año_fabricacion=2021)
+        maquina = Machine.objects.create(machine_id='M-1', serial_number='1PY6110JCMN123456')
+        self.assertEqual(self._ids('MAQUINA', 'agropecuaria'), set())
+
+        vinculadas, _ = MachineMatchingService().match_machines()
+
+        self.assertEqual([m.pk for m in vinculadas], [maquina.pk])
+        self.assertEqual(self._ids('MAQUINA', 'agropecuaria'), {maquina.pk})
+
+    def test_titulo_de_maquina_se_recorta(self):
+        maquina = Machine.objects.create(machine_id='M-2', make_name='M' * 100, model_name='X' * 200, serial_number='S' * 100)
+
+        documento = DocumentoBusqueda.objects.get(tipo='MAQUINA', objeto_id=maquina.pk)
+        self.assertEqual(len(documento.titulo), 255)
@@ -0,0 +1,30 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .models import DocumentoBusqueda
+from .services import BuscadorService
+
+
+@login_required
+def buscar(request):
+    """
+    Búsqueda unificada: clientes, equipos, servicios, repuestos, alertas y máquinas.
+
+    Parámetros: q (texto), tipo (uno o varios separados por comas) y limite (máximo 50).
+    Administrativos y técnicos solo ven resultados de su sucursal.
+    """
+    texto = request.GET.get('q', '').strip()
+    tipos_validos = dict(DocumentoBusqueda.TIPO_CHOICES)
+    tipos = [t for t in request.GET.get('tipo', '').upper().split(',') if t in tipos_validos]
+    try:
+        limite = min(max(int(request.GET.get('limite', 20)), 1), 50)
+    except ValueError:
+        limite = 20
+
+    sucursal = None
+    usuario = request.user
+    if usuario.rol in ['ADMINISTRATIVO', 'TECNICO'] and usuario.sucursal:
+        sucursal = usuario.sucursal
+
+    resultados = BuscadorService.buscar(texto, tipos=tipos, sucursal=sucursal, limite=limite)
+    return JsonResponse({'q': texto, 'resultados': resultados})
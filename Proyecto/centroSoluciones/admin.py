@@ -1,4 +1,5 @@
 from django.contrib import admin
+from buscador.admin import BusquedaAdminMixin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
@@ -8,7 +9,7 @@ from datetime import timedelta
 from .models import AlertaEquipo, LeadJohnDeere, AsignacionAlerta, CodigoAlerta
 
 @admin.register(AlertaEquipo)
-class AlertaEquipoAdmin(admin.ModelAdmin):
+class AlertaEquipoAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = [
         'codigo', 
         'cliente', 
@@ -26,7 +27,8 @@ class AlertaEquipoAdmin(admin.ModelAdmin):
         'clasificacion', 
         'sucursal', 
         'fecha', 
-        'tecnico_asignado'
+        'tecnico_asignado',
+        'sla_vencido'
     ]
     search_fields = [
         'cliente__razon_social', 
@@ -42,8 +44,12 @@ class AlertaEquipoAdmin(admin.ModelAdmin):
         ('Información Básica', {
             'fields': ('cliente', 'pin_equipo', 'codigo', 'descripcion', 'clasificacion', 'sucursal')
         }),
+        ('Origen y Resolución', {
+            'fields': ('machine_alert', 'instrucciones_resolucion'),
+            'classes': ('collapse',)
+        }),
         ('Asignación y Seguimiento', {
-            'fields': ('estado', 'tecnico_asignado', 'observaciones_tecnico'),
+            'fields': ('estado', 'tecnico_asignado', 'observaciones_tecnico', 'fecha_limite_respuesta', 'fecha_limite_resolucion', 'sla_vencido'),
             'classes': ('collapse',)
         }),
         ('Conexión SAR y CRM', {
@@ -57,6 +63,7 @@ class AlertaEquipoAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['fecha_creacion', 'fecha_modificacion', 'fecha_asignacion', 'fecha_resolucion', 'fecha_conexion_sar']
+    raw_id_fields = ['machine_alert']
     
     actions = ['asignar_tecnicos', 'marcar_resueltas', 'marcar_canceladas']
     
@@ -155,11 +162,13 @@ class LeadJohnDeereAdmin(admin.ModelAdmin):
         'estado_badge', 
         'fecha', 
         'valor_estimado_display',
+        'puntaje',
         'tiempo_sin_contactar_display'
     ]
     list_filter = [
         'estado', 
         'clasificacion',
+        'segmento_cliente',
         'sucursal', 
         'fecha'
     ]
@@ -180,13 +189,20 @@ class LeadJohnDeereAdmin(admin.ModelAdmin):
             'fields': ('estado', 'observaciones_contacto', 'valor_estimado'),
             'classes': ('collapse',)
         }),
+        ('Prioridad', {
+            'fields': ('puntaje', 'segmento_cliente', 'detalle_puntaje', 'fecha_puntaje'),
+            'classes': ('collapse',)
+        }),
         ('Información de Auditoría', {
             'fields': ('creado_por', 'fecha_creacion', 'fecha_modificacion'),
             'classes': ('collapse',)
         }),
     )
     
-    readonly_fields = ['fecha_creacion', 'fecha_modificacion', 'fecha_contacto']
+    readonly_fields = [
+        'fecha_creacion', 'fecha_modificacion', 'fecha_contacto',
+        'puntaje', 'segmento_cliente', 'detalle_puntaje', 'fecha_puntaje'
+    ]
     
     actions = ['marcar_contactados', 'marcar_calificados', 'marcar_convertidos']
     
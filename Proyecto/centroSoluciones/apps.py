@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CentrosolucionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'centroSoluciones'
+
+    def ready(self):
+        import centroSoluciones.signals  # Importa las señales al iniciar la app
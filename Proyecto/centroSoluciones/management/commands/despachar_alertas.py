@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from centroSoluciones.models import AlertaEquipo
+from centroSoluciones.services import DespachoAlertasService
+
+
+class Command(BaseCommand):
+    help = 'Asigna las alertas críticas pendientes al técnico mejor ubicado según carga, sucursal, certificaciones y distancia'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar los técnicos sugeridos sin asignar'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            alertas = AlertaEquipo.objects.filter(
+                clasificacion='CRITICA', estado='PENDIENTE', tecnico_asignado__isnull=True
+            ).select_related('machine_alert__machine', 'cliente').order_by('fecha')
+            for alerta in alertas:
+                self.stdout.write(f"{alerta.codigo} | {alerta.cliente.razon_social}")
+                for candidato in DespachoAlertasService(alerta).candidatos(limite=3):
+                    self.stdout.write(
+                        f"  {candidato['puntaje']:>5}  {candidato['nombre_completo']:<30} "
+                        f"carga {candidato['carga']}, {candidato['sucursal__nombre'] or 'sin sucursal'}"
+                    )
+            return
+
+        asignadas = DespachoAlertasService.despachar_criticas()
+        for alerta, candidato in asignadas:
+            self.stdout.write(
+                f"  {alerta.codigo:<20} → {candidato['nombre_completo']} (puntaje {candidato['puntaje']})"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Alertas críticas asignadas: {len(asignadas)}'))
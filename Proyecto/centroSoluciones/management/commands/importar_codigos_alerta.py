@@ -0,0 +1,64 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from centroSoluciones.services import ImportacionCodigosAlertaService
+from recursosHumanos.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Importa una lista de códigos de diagnóstico de John Deere (Excel o CSV) al catálogo de códigos de alerta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta al archivo .xlsx, .xls o .csv')
+        parser.add_argument(
+            '--modelo',
+            type=str,
+            help='Modelo de equipo a asignar a todos los códigos de la lista (por defecto, la columna del archivo)'
+        )
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que figura como creador de los códigos nuevos'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar el informe de cambios, sin guardar'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.exists(ruta):
+            raise CommandError(f'El archivo {ruta} no existe')
+
+        usuario = None
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+            if not usuario:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        with open(ruta, 'rb') as archivo:
+            servicio = ImportacionCodigosAlertaService(
+                archivo, os.path.basename(ruta), modelo_equipo=options['modelo'], usuario=usuario
+            )
+            try:
+                informe = servicio.comparar() if options['dry_run'] else servicio.aplicar()
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(f"Filas leídas: {informe['filas']}")
+        self.stdout.write(f"Códigos nuevos: {len(informe['nuevos'])}")
+        self.stdout.write(f"Códigos actualizados: {len(informe['actualizados'])}")
+        self.stdout.write(f"Sin cambios: {informe['sin_cambios']}")
+
+        for cambio in informe['actualizados'][:20]:
+            self.stdout.write(
+                f"  {cambio['codigo']} ({cambio['modelo_equipo'] or 'genérico'}): {', '.join(cambio['campos'])}"
+            )
+        for error in informe['errores']:
+            self.stdout.write(self.style.WARNING(error))
+
+        if informe['aplicado']:
+            self.stdout.write(self.style.SUCCESS('Códigos de alerta importados'))
+        else:
+            self.stdout.write(self.style.WARNING('Simulación: no se guardó ningún cambio'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from centroSoluciones.models import LeadJohnDeere
+from centroSoluciones.services import PuntajeLeadsService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el puntaje de prioridad de los leads John Deere abiertos (pensado para ejecutarse una vez por día)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sucursal',
+            type=int,
+            help='ID de la sucursal a recalcular (por defecto, todas)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Cantidad de leads a mostrar al terminar'
+        )
+
+    def handle(self, *args, **options):
+        leads = LeadJohnDeere.objects.all()
+        if options['sucursal']:
+            leads = leads.filter(sucursal_id=options['sucursal'])
+
+        actualizados = PuntajeLeadsService().calcular(leads)
+        self.stdout.write(self.style.SUCCESS(f'Leads puntuados: {actualizados}'))
+
+        mejores = leads.filter(estado__in=LeadJohnDeere.ESTADOS_ABIERTOS).select_related(
+            'cliente', 'equipo'
+        ).order_by('-puntaje', '-fecha')[:options['top']]
+        for lead in mejores:
+            self.stdout.write(
+                f"  {lead.puntaje:>3}  {lead.segmento_cliente or '-':<5} {lead.cliente.razon_social:<30} "
+                f"{lead.equipo.numero_serie:<20} {lead.get_clasificacion_display()}"
+            )
@@ -0,0 +1,69 @@
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+from centroSoluciones.services import SlaAlertasService
+from recursosHumanos.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Marca las alertas que incumplieron el SLA y avisa por email a cada sucursal (pensado para ejecutarse cada hora)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Marcar las alertas sin enviar los emails'
+        )
+
+    def handle(self, *args, **options):
+        vencidas = SlaAlertasService.marcar_vencidas()
+
+        if not vencidas:
+            self.stdout.write('No hay alertas abiertas nuevas fuera de SLA')
+            return
+
+        for alerta in vencidas:
+            self.stdout.write(
+                f"  {alerta.sucursal.nombre:<20} {alerta.codigo:<20} {alerta.get_clasificacion_display():<8} "
+                f"límite {timezone.localtime(alerta.fecha_limite_resolucion):%d/%m/%Y %H:%M} | {alerta.cliente.razon_social}"
+            )
+
+        if options['dry_run']:
+            return
+
+        # vencidas viene ordenada por sucursal
+        for sucursal, alertas in groupby(vencidas, key=lambda alerta: alerta.sucursal):
+            alertas = list(alertas)
+            destinatarios = set(
+                Usuario.objects.filter(rol__in=['GERENTE', 'ADMINISTRATIVO'], sucursal=sucursal, is_active=True)
+                .exclude(email='').values_list('email', flat=True)
+            )
+            destinatarios.update(
+                alerta.tecnico_asignado.email for alerta in alertas
+                if alerta.tecnico_asignado and alerta.tecnico_asignado.email
+            )
+            if not destinatarios:
+                self.stdout.write(self.style.WARNING(f'No hay destinatarios en {sucursal.nombre}'))
+                continue
+
+            context = {
+                'alertas': alertas,
+                'sucursal': sucursal,
+                'fecha_alerta': timezone.localtime().strftime('%d/%m/%Y %H:%M'),
+            }
+            mensaje_html = render_to_string('centroSoluciones/email_alerta_sla.html', context)
+
+            email = EmailMultiAlternatives(
+                f"⚠️ Alertas fuera de SLA en {sucursal.nombre}: {len(alertas)}",
+                strip_tags(mensaje_html),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=sorted(destinatarios),
+            )
+            email.attach_alternative(mensaje_html, "text/html")
+            email.send()
+            self.stdout.write(self.style.SUCCESS(f'{sucursal.nombre}: aviso enviado a {len(destinatarios)} destinatarios'))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operationsCenter', '0002_machinealert_code'),
+        ('centroSoluciones', '0005_codigoalerta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertaequipo',
+            name='instrucciones_resolucion',
+            field=models.TextField(blank=True, verbose_name='Instrucciones de Resolución'),
+        ),
+        migrations.AddField(
+            model_name='alertaequipo',
+            name='machine_alert',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerta_equipo', to='operationsCenter.machinealert', verbose_name='Alerta de Operations Center'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centroSoluciones', '0006_alertaequipo_machine_alert'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='codigoalerta',
+            name='codigo',
+            field=models.CharField(max_length=20, verbose_name='Código de Alerta'),
+        ),
+        migrations.AlterField(
+            model_name='codigoalerta',
+            name='modelo_equipo',
+            field=models.CharField(blank=True, help_text='Vacío para la versión genérica del código, válida para cualquier modelo', max_length=100, verbose_name='Modelo de Equipo'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='codigoalerta',
+            unique_together={('codigo', 'modelo_equipo')},
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:58
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Copia de AlertaEquipo.SLA_HORAS al momento de la migración
+SLA_HORAS = {
+    'CRITICA': (2, 24),
+    'ALTA': (4, 48),
+    'MEDIA': (24, 96),
+    'BAJA': (48, 168),
+}
+
+
+def calcular_limites_existentes(apps, schema_editor):
+    """Límites de SLA de las alertas existentes, según su clasificación"""
+    AlertaEquipo = apps.get_model('centroSoluciones', 'AlertaEquipo')
+    for clasificacion, (respuesta, resolucion) in SLA_HORAS.items():
+        AlertaEquipo.objects.filter(clasificacion=clasificacion, fecha_limite_respuesta__isnull=True).update(
+            fecha_limite_respuesta=models.F('fecha') + timedelta(hours=respuesta),
+            fecha_limite_resolucion=models.F('fecha') + timedelta(hours=resolucion),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centroSoluciones', '0007_codigoalerta_por_modelo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertaequipo',
+            name='fecha_limite_resolucion',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Límite de Resolución'),
+        ),
+        migrations.AddField(
+            model_name='alertaequipo',
+            name='fecha_limite_respuesta',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Límite de Respuesta'),
+        ),
+        migrations.AddField(
+            model_name='alertaequipo',
+            name='sla_vencido',
+            field=models.BooleanField(default=False, verbose_name='SLA Vencido'),
+        ),
+        migrations.AddIndex(
+            model_name='alertaequipo',
+            index=models.Index(fields=['estado', 'fecha_limite_resolucion'], name='centroSoluc_estado_3abc50_idx'),
+        ),
+        migrations.RunPython(calcular_limites_existentes, migrations.RunPython.noop),
+    ]
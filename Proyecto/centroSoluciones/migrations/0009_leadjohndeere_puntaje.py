@@ -0,0 +1,37 @@
+# Generated by Django 4.2.2 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('centroSoluciones', '0008_alertaequipo_sla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leadjohndeere',
+            name='detalle_puntaje',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Detalle del Puntaje'),
+        ),
+        migrations.AddField(
+            model_name='leadjohndeere',
+            name='fecha_puntaje',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha del Puntaje'),
+        ),
+        migrations.AddField(
+            model_name='leadjohndeere',
+            name='puntaje',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Puntaje'),
+        ),
+        migrations.AddField(
+            model_name='leadjohndeere',
+            name='segmento_cliente',
+            field=models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('NUEVO', 'Sin facturación')], max_length=5, verbose_name='Segmento del Cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='leadjohndeere',
+            index=models.Index(fields=['sucursal', '-puntaje', '-fecha'], name='centroSoluc_sucursa_9080fc_idx'),
+        ),
+    ]
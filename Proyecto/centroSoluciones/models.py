@@ -1,7 +1,10 @@
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 from clientes.models import Cliente, Equipo
 from recursosHumanos.models import Usuario, Sucursal
+from operationsCenter.models import MachineAlert
 
 class AlertaEquipo(models.Model):
     """Modelo para las alertas de equipos recibidas del Centro de Soluciones Conectadas"""
@@ -21,6 +24,17 @@ class AlertaEquipo(models.Model):
         ('BAJA', 'Baja'),
     ]
     
+    ESTADOS_ABIERTOS = ['PENDIENTE', 'ASIGNADA', 'EN_PROCESO']
+    
+    # Horas objetivo de (respuesta, resolución) por clasificación. La respuesta es
+    # la asignación de un técnico; la resolución puede venir del código de alerta.
+    SLA_HORAS = {
+        'CRITICA': (2, 24),
+        'ALTA': (4, 48),
+        'MEDIA': (24, 96),
+        'BAJA': (48, 168),
+    }
+    
     # Información básica de la alerta
     fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Recepción")
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, verbose_name="Cliente")
@@ -30,6 +44,15 @@ class AlertaEquipo(models.Model):
     descripcion = models.TextField(verbose_name="Descripción")
     estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name="Estado")
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, verbose_name="Sucursal")
+    instrucciones_resolucion = models.TextField(blank=True, verbose_name="Instrucciones de Resolución")
+    machine_alert = models.OneToOneField(
+        MachineAlert,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alerta_equipo',
+        verbose_name="Alerta de Operations Center"
+    )
     
     # Campos de seguimiento y asignación
     fecha_asignacion = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Asignación")
@@ -44,6 +67,11 @@ class AlertaEquipo(models.Model):
     fecha_resolucion = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Resolución")
     observaciones_tecnico = models.TextField(blank=True, verbose_name="Observaciones del Técnico")
     
+    # Campos de SLA
+    fecha_limite_respuesta = models.DateTimeField(null=True, blank=True, verbose_name="Límite de Respuesta")
+    fecha_limite_resolucion = models.DateTimeField(null=True, blank=True, verbose_name="Límite de Resolución")
+    sla_vencido = models.BooleanField(default=False, verbose_name="SLA Vencido")
+    
     # Campos para procesamiento SAR
     conexion_sar_realizada = models.BooleanField(default=False, verbose_name="Conexión SAR Realizada")
     fecha_conexion_sar = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Conexión SAR")
@@ -69,11 +97,38 @@ class AlertaEquipo(models.Model):
             models.Index(fields=['estado', 'clasificacion']),
             models.Index(fields=['cliente', 'fecha']),
             models.Index(fields=['tecnico_asignado', 'estado']),
+            models.Index(fields=['estado', 'fecha_limite_resolucion']),
         ]
     
     def __str__(self):
         return f"Alerta {self.codigo} - {self.cliente.razon_social} - {self.get_estado_display()}"
     
+    def calcular_limites_sla(self, horas_resolucion=None, inicio=None):
+        """
+        Fija los límites de respuesta y resolución desde el inicio indicado o,
+        si no, desde la recepción de la alerta. Vuelve a evaluar el vencimiento.
+        """
+        respuesta, resolucion = self.SLA_HORAS.get(self.clasificacion, self.SLA_HORAS['MEDIA'])
+        inicio = inicio or self.fecha or timezone.now()
+        self.fecha_limite_respuesta = inicio + timedelta(hours=respuesta)
+        self.fecha_limite_resolucion = inicio + timedelta(hours=horas_resolucion or resolucion)
+        self.sla_vencido = False
+    
+    def recalcular_limites_sla(self, clasificacion_anterior):
+        """
+        Límites de SLA para la nueva clasificación, desde el mismo inicio. Si el
+        plazo de resolución venía del código de alerta (no coincide con el de la
+        clasificación anterior), se conserva.
+        """
+        horas_anteriores = self.SLA_HORAS.get(clasificacion_anterior, self.SLA_HORAS['MEDIA'])
+        inicio = self.fecha_limite_respuesta - timedelta(hours=horas_anteriores[0])
+        horas_resolucion = None
+        if self.fecha_limite_resolucion:
+            plazo = self.fecha_limite_resolucion - inicio
+            if plazo != timedelta(hours=horas_anteriores[1]):
+                horas_resolucion = plazo.total_seconds() / 3600
+        self.calcular_limites_sla(horas_resolucion, inicio=inicio)
+    
     def save(self, *args, **kwargs):
         # Actualizar fecha de asignación cuando se asigna un técnico
         if self.tecnico_asignado and not self.fecha_asignacion:
@@ -87,6 +142,14 @@ class AlertaEquipo(models.Model):
         if self.conexion_sar_realizada and not self.fecha_conexion_sar:
             self.fecha_conexion_sar = timezone.now()
         
+        if not self.fecha_limite_respuesta:
+            self.calcular_limites_sla()
+        elif self.pk:
+            # Un cambio de clasificación mueve los límites de SLA
+            anterior = AlertaEquipo.objects.filter(pk=self.pk).values_list('clasificacion', flat=True).first()
+            if anterior and anterior != self.clasificacion:
+                self.recalcular_limites_sla(anterior)
+        
         super().save(*args, **kwargs)
     
     @property
@@ -139,6 +202,15 @@ class LeadJohnDeere(models.Model):
         ('OTROS', 'Otros'),
     ]
     
+    SEGMENTO_CHOICES = [
+        ('A', 'A'),
+        ('B', 'B'),
+        ('C', 'C'),
+        ('NUEVO', 'Sin facturación'),
+    ]
+    
+    ESTADOS_ABIERTOS = ['NUEVO', 'CONTACTADO', 'CALIFICADO']
+    
     # Información básica del lead
     fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Recepción")
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, verbose_name="Cliente")
@@ -164,6 +236,17 @@ class LeadJohnDeere(models.Model):
         verbose_name="Valor Estimado"
     )
     
+    # Prioridad calculada por PuntajeLeadsService (comando puntuar_leads)
+    puntaje = models.PositiveSmallIntegerField(default=0, verbose_name="Puntaje")
+    segmento_cliente = models.CharField(
+        max_length=5,
+        choices=SEGMENTO_CHOICES,
+        blank=True,
+        verbose_name="Segmento del Cliente"
+    )
+    detalle_puntaje = models.JSONField(default=dict, blank=True, verbose_name="Detalle del Puntaje")
+    fecha_puntaje = models.DateTimeField(null=True, blank=True, verbose_name="Fecha del Puntaje")
+    
     # Campos de auditoría
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Última Modificación")
@@ -184,6 +267,7 @@ class LeadJohnDeere(models.Model):
             models.Index(fields=['cliente', 'equipo']),
             models.Index(fields=['sucursal', 'estado']),
             models.Index(fields=['clasificacion', 'estado']),
+            models.Index(fields=['sucursal', '-puntaje', '-fecha']),
         ]
     
     def __str__(self):
@@ -270,8 +354,13 @@ class CodigoAlerta(models.Model):
     ]
     
     # Información del código de alerta
-    codigo = models.CharField(max_length=20, verbose_name="Código de Alerta", unique=True)
-    modelo_equipo = models.CharField(max_length=100, verbose_name="Modelo de Equipo")
+    codigo = models.CharField(max_length=20, verbose_name="Código de Alerta")
+    modelo_equipo = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Modelo de Equipo",
+        help_text="Vacío para la versión genérica del código, válida para cualquier modelo"
+    )
     descripcion = models.TextField(verbose_name="Descripción del Código")
     clasificacion = models.CharField(
         max_length=10, 
@@ -313,6 +402,7 @@ class CodigoAlerta(models.Model):
         verbose_name = "Código de Alerta"
         verbose_name_plural = "Códigos de Alerta"
         ordering = ['codigo', 'modelo_equipo']
+        unique_together = ['codigo', 'modelo_equipo']
         indexes = [
             models.Index(fields=['codigo']),
             models.Index(fields=['modelo_equipo']),
@@ -321,7 +411,7 @@ class CodigoAlerta(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.codigo} - {self.modelo_equipo}"
+        return f"{self.codigo} - {self.modelo_equipo or 'Genérico'}"
     
     def get_prioridad_color(self):
         """Retorna el color CSS para la prioridad"""
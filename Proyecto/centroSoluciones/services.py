@@ -0,0 +1,927 @@
+"""
+Servicios del Centro de Soluciones Conectadas
+"""
+import io
+import logging
+import re
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import (
+    Avg, Case, Count, DecimalField, DurationField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from buscador.services import BuscadorService
+from gestionDeTaller.models import GastoAsistencia, PreOrden, Servicio, VentaRepuesto
+from operationsCenter.models import Machine, MachineAlert
+from recursosHumanos.models import CertificacionTecnico, Usuario
+from .models import AlertaEquipo, AsignacionAlerta, CodigoAlerta, LeadJohnDeere
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar_modelo(modelo):
+    """Modelo de equipo comparable: mayúsculas, sin espacios ni separadores"""
+    return re.sub(r'[^0-9A-Z]', '', (modelo or '').upper())
+
+
+def _normalizar_columna(nombre):
+    """Encabezado en minúsculas, sin acentos ni guiones bajos, para reconocer columnas"""
+    nombre = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[\s_]+', ' ', nombre).strip().lower()
+
+
+class CatalogoCodigosAlertaService:
+    """
+    Catálogo de códigos de alerta en la memoria del proceso.
+
+    La tabla se arma una vez con los códigos activos, indexada por (código,
+    modelo normalizado) y por código solo para el respaldo genérico, así que
+    cada búsqueda es un acceso a diccionario sin consultas a la base. Cada
+    alta, edición o baja de CodigoAlerta incrementa la versión guardada en la
+    caché; antes de usar su tabla, el proceso compara esa versión y la vuelve
+    a armar si cambió. Con una caché que no se comparte entre procesos, la
+    tabla se renueva además cada VIGENCIA_LOCAL segundos.
+    """
+
+    CACHE_KEY_VERSION = 'centroSoluciones:codigos_alerta:version'
+    VIGENCIA_LOCAL = 60 * 5
+
+    _tabla = None
+    _codigos = None
+    _version = None
+    _cargada = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def clave(codigo):
+        return (codigo or '').strip().upper()
+
+    @classmethod
+    def version(cls):
+        version = cache.get(cls.CACHE_KEY_VERSION)
+        if version is None:
+            # Valor inicial distinto en cada arranque, para no confundirlo con una versión anterior
+            cache.add(cls.CACHE_KEY_VERSION, time.time_ns(), None)
+            version = cache.get(cls.CACHE_KEY_VERSION)
+        return version
+
+    @classmethod
+    def invalidar(cls):
+        """Marcar el catálogo como modificado para todos los procesos"""
+        try:
+            cache.incr(cls.CACHE_KEY_VERSION)
+        except ValueError:
+            cache.set(cls.CACHE_KEY_VERSION, time.time_ns(), None)
+        cls._tabla = None
+
+    @classmethod
+    def _armar(cls):
+        tabla = {}
+        codigos = list(CodigoAlerta.objects.filter(activo=True).order_by('codigo', 'modelo_equipo'))
+        for codigo in codigos:
+            modelo = normalizar_modelo(codigo.modelo_equipo)
+            # La versión genérica (sin modelo) es el respaldo del código; las de un modelo
+            # solo se usan para ese modelo, nunca para otro
+            tabla[(cls.clave(codigo.codigo), modelo or None)] = codigo
+            # Sin modelo en la consulta y sin versión genérica: la primera por orden de modelo
+            tabla.setdefault((cls.clave(codigo.codigo), ''), codigo)
+        return tabla, codigos
+
+    @classmethod
+    def tabla(cls):
+        version = cls.version()
+        vencida = time.monotonic() - cls._cargada > cls.VIGENCIA_LOCAL
+        if cls._tabla is None or cls._version != version or vencida:
+            with cls._lock:
+                if cls._tabla is None or cls._version != version or vencida:
+                    # La versión se lee antes de armar: un cambio durante la carga fuerza otra
+                    cls._tabla, cls._codigos = cls._armar()
+                    cls._version = version
+                    cls._cargada = time.monotonic()
+        return cls._tabla
+
+    @classmethod
+    def buscar(cls, codigo, modelo_equipo=None):
+        """
+        CodigoAlerta activo para el código y el modelo, o su versión genérica.
+
+        Sin modelo, si el código no tiene versión genérica se usa la del primer
+        modelo (los códigos cargados antes de admitir genéricos tienen todos
+        modelo). None si el código no existe.
+        """
+        tabla = cls.tabla()
+        clave = cls.clave(codigo)
+        if modelo_equipo:
+            especifico = tabla.get((clave, normalizar_modelo(modelo_equipo)))
+            if especifico:
+                return especifico
+            return tabla.get((clave, None))
+        return tabla.get((clave, None)) or tabla.get((clave, ''))
+
+    @classmethod
+    def listar(cls):
+        """Todos los códigos activos, ordenados por código y modelo"""
+        cls.tabla()
+        return cls._codigos
+
+
+class ImportacionCodigosAlertaService:
+    """
+    Importa una lista de códigos de diagnóstico de John Deere (Excel o CSV).
+
+    Cada fila es un código para un modelo (o genérico, sin modelo). El código
+    puede venir armado o como columnas SPN y FMI, que se unen como "SPN.FMI".
+    El archivo se compara en memoria contra el catálogo, traído en una sola
+    consulta, y las altas y cambios se guardan con bulk_create/bulk_update.
+    comparar() solo arma el informe; aplicar() además guarda.
+    """
+
+    COLUMNAS = {
+        'codigo': ['codigo', 'cod', 'codigo de alerta', 'codigo alerta', 'dtc', 'code', 'codigo de diagnostico'],
+        'spn': ['spn'],
+        'fmi': ['fmi'],
+        'modelo_equipo': ['modelo', 'modelo equipo', 'modelo de equipo', 'model'],
+        'descripcion': ['descripcion', 'description', 'detalle'],
+        'clasificacion': ['clasificacion', 'severidad', 'severity', 'prioridad', 'nivel'],
+        'instrucciones_resolucion': [
+            'instrucciones', 'instrucciones de resolucion', 'solucion', 'accion recomendada', 'recommended action',
+        ],
+        'repuestos_comunes': ['repuestos', 'repuestos comunes'],
+        'tiempo_estimado_resolucion': ['tiempo estimado', 'tiempo estimado de resolucion', 'horas estimadas'],
+    }
+    # Niveles de Deere (STOP / SERVICE / INFO) y en inglés, además de los propios
+    CLASIFICACIONES = {
+        'CRITICA': 'CRITICA', 'CRITICAL': 'CRITICA', 'STOP': 'CRITICA', 'ROJO': 'CRITICA', 'RED': 'CRITICA',
+        'ALTA': 'ALTA', 'HIGH': 'ALTA', 'SERVICE': 'ALTA', 'SERVICIO': 'ALTA', 'AMBAR': 'ALTA', 'AMBER': 'ALTA',
+        'MEDIA': 'MEDIA', 'MEDIUM': 'MEDIA',
+        'BAJA': 'BAJA', 'LOW': 'BAJA', 'INFO': 'BAJA', 'INFORMATION': 'BAJA',
+    }
+    CAMPOS_ACTUALIZABLES = [
+        'descripcion', 'clasificacion', 'instrucciones_resolucion', 'repuestos_comunes', 'tiempo_estimado_resolucion',
+    ]
+    TAMANO_LOTE = 1000
+
+    def __init__(self, archivo, nombre_archivo, modelo_equipo=None, usuario=None):
+        self.archivo = archivo
+        self.nombre_archivo = nombre_archivo
+        self.modelo_equipo = modelo_equipo
+        self.usuario = usuario
+
+    def leer(self):
+        """DataFrame con las columnas renombradas a los campos de CodigoAlerta (todo como texto)"""
+        contenido = self.archivo.read()
+        if self.nombre_archivo.lower().endswith(('.xlsx', '.xls')):
+            df = pd.read_excel(io.BytesIO(contenido), dtype=str)
+        else:
+            try:
+                texto = contenido.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                texto = contenido.decode('latin-1')
+            df = pd.read_csv(io.StringIO(texto), dtype=str, sep=None, engine='python')
+
+        alias = {nombre: campo for campo, nombres in self.COLUMNAS.items() for nombre in nombres}
+        renombres = {}
+        for columna in df.columns:
+            campo = alias.get(_normalizar_columna(columna))
+            if campo and campo not in renombres.values():
+                renombres[columna] = campo
+        df = df.rename(columns=renombres)[list(renombres.values())]
+
+        if 'codigo' not in df.columns and not {'spn', 'fmi'} <= set(df.columns):
+            raise ValueError("El archivo debe tener la columna codigo, o las columnas spn y fmi")
+        return df.astype(object).where(df.notna(), None)
+
+    @staticmethod
+    def _texto(fila, campo):
+        return str(fila.get(campo) or '').strip()
+
+    def _codigo(self, fila):
+        codigo = self._texto(fila, 'codigo')
+        if not codigo and self._texto(fila, 'spn'):
+            spn, fmi = self._texto(fila, 'spn'), self._texto(fila, 'fmi')
+            codigo = f"{spn.lstrip('0') or '0'}.{fmi.lstrip('0') or '0'}"
+        return codigo.upper()
+
+    def comparar(self):
+        """Informe de la importación sin guardar nada"""
+        df = self.leer()
+        existentes = {
+            (codigo['codigo'].upper(), codigo['modelo_equipo'].strip().upper()): codigo
+            for codigo in CodigoAlerta.objects.values('id', 'codigo', 'modelo_equipo', *self.CAMPOS_ACTUALIZABLES)
+        }
+
+        filas = {}
+        errores = []
+        for numero, fila in enumerate(df.to_dict('records'), start=2):
+            codigo = self._codigo(fila)
+            if not codigo:
+                continue
+            if len(codigo) > 20:
+                errores.append(f'Fila {numero} ({codigo}): el código supera los 20 caracteres')
+                continue
+            modelo = (self.modelo_equipo or self._texto(fila, 'modelo_equipo'))[:100]
+            nivel = _normalizar_columna(self._texto(fila, 'clasificacion')).upper()
+            clasificacion = self.CLASIFICACIONES.get(nivel.split(' ')[0] if nivel else '')
+            if nivel and not clasificacion:
+                errores.append(f'Fila {numero} ({codigo}): clasificación "{nivel}" no reconocida, se usa la actual')
+            tiempo = self._texto(fila, 'tiempo_estimado_resolucion')
+            filas[(codigo, modelo.upper())] = {
+                'codigo': codigo,
+                'modelo_equipo': modelo,
+                'descripcion': self._texto(fila, 'descripcion'),
+                'clasificacion': clasificacion,
+                'instrucciones_resolucion': self._texto(fila, 'instrucciones_resolucion'),
+                'repuestos_comunes': self._texto(fila, 'repuestos_comunes'),
+                'tiempo_estimado_resolucion': int(float(tiempo)) if re.fullmatch(r'\d+(\.\d+)?', tiempo) else None,
+            }
+
+        nuevos, actualizados = [], []
+        sin_cambios = 0
+        for clave, valores in filas.items():
+            actual = existentes.get(clave)
+            if actual is None:
+                if not valores['descripcion']:
+                    errores.append(f"{valores['codigo']} ({valores['modelo_equipo'] or 'genérico'}): falta la descripción")
+                    continue
+                valores['clasificacion'] = valores['clasificacion'] or 'MEDIA'
+                nuevos.append(valores)
+                continue
+            # Las celdas vacías no pisan los datos existentes
+            final = {
+                campo: valores[campo] if valores[campo] not in (None, '') else actual[campo]
+                for campo in self.CAMPOS_ACTUALIZABLES
+            }
+            campos = [campo for campo in self.CAMPOS_ACTUALIZABLES if final[campo] != actual[campo]]
+            if not campos:
+                sin_cambios += 1
+                continue
+            actualizados.append({
+                'id': actual['id'],
+                'codigo': actual['codigo'],
+                'modelo_equipo': actual['modelo_equipo'],
+                'valores': final,
+                'campos': campos,
+            })
+
+        return {
+            'filas': len(df),
+            'nuevos': nuevos,
+            'actualizados': actualizados,
+            'sin_cambios': sin_cambios,
+            'errores': errores,
+            'aplicado': False,
+        }
+
+    def aplicar(self):
+        """Comparar y guardar las altas y los cambios. Devuelve el mismo informe que comparar()."""
+        informe = self.comparar()
+        ahora = timezone.now()
+        with transaction.atomic():
+            CodigoAlerta.objects.bulk_create(
+                [CodigoAlerta(creado_por=self.usuario, **valores) for valores in informe['nuevos']],
+                batch_size=self.TAMANO_LOTE,
+            )
+            # bulk_update no actualiza los campos auto_now
+            CodigoAlerta.objects.bulk_update(
+                [
+                    CodigoAlerta(id=cambio['id'], fecha_modificacion=ahora, **cambio['valores'])
+                    for cambio in informe['actualizados']
+                ],
+                self.CAMPOS_ACTUALIZABLES + ['fecha_modificacion'],
+                batch_size=self.TAMANO_LOTE,
+            )
+        # Las operaciones masivas no disparan las señales que invalidan el catálogo
+        CatalogoCodigosAlertaService.invalidar()
+        informe['aplicado'] = True
+        return informe
+
+
+class PuenteAlertasService:
+    """
+    Genera las alertas del Centro de Soluciones a partir de las alertas de
+    máquinas sincronizadas desde Operations Center.
+
+    Cada MachineAlert activa de una máquina vinculada a un equipo local crea
+    una AlertaEquipo con el cliente y la sucursal del equipo. Mientras siguen
+    pendientes, las alertas se actualizan con los cambios de Operations Center
+    y se dan por resueltas cuando allí se resuelven o limpian. Clasificación,
+    descripción e instrucciones se completan desde el catálogo de códigos en
+    memoria (CatalogoCodigosAlertaService), sin consultas por alerta.
+    """
+
+    SEVERIDAD_A_CLASIFICACION = {
+        'CRITICAL': 'CRITICA',
+        'HIGH': 'ALTA',
+        'MEDIUM': 'MEDIA',
+        'LOW': 'BAJA',
+    }
+    GRAVEDAD = {'CRITICA': 4, 'ALTA': 3, 'MEDIA': 2, 'BAJA': 1}
+    ESTADOS_CERRADOS = ['RESOLVED', 'CLEARED']
+    CAMPOS_ACTUALIZABLES = ['clasificacion', 'codigo', 'descripcion', 'instrucciones_resolucion']
+    TAMANO_LOTE = 500
+
+    # Armado de alertas
+
+    def _campos(self, machine_alert):
+        """
+        Campos de AlertaEquipo derivados de la alerta de la máquina y del catálogo,
+        junto con las horas estimadas de resolución del código (o None)
+        """
+        machine = machine_alert.machine
+        equipo = machine.equipo_local
+        modelo = equipo.modelo.nombre if equipo else machine.model_name
+        codigo = (machine_alert.code or machine_alert.category or machine_alert.alert_id)[:20]
+
+        clasificacion = self.SEVERIDAD_A_CLASIFICACION.get(machine_alert.severity, 'MEDIA')
+        descripcion = machine_alert.description or ''
+        instrucciones = ''
+
+        catalogo = CatalogoCodigosAlertaService.buscar(codigo, modelo)
+        if catalogo:
+            # El catálogo puede subir la clasificación, nunca bajar la informada por la máquina
+            if self.GRAVEDAD.get(catalogo.clasificacion, 0) > self.GRAVEDAD[clasificacion]:
+                clasificacion = catalogo.clasificacion
+            if catalogo.descripcion and catalogo.descripcion != descripcion:
+                descripcion = f"{catalogo.descripcion}\n\n{descripcion}".strip()
+            instrucciones = catalogo.instrucciones_resolucion
+            if catalogo.repuestos_comunes:
+                instrucciones = f"{instrucciones}\n\nRepuestos comunes: {catalogo.repuestos_comunes}".strip()
+
+        campos = {
+            'clasificacion': clasificacion,
+            'codigo': codigo,
+            'descripcion': descripcion,
+            'instrucciones_resolucion': instrucciones,
+        }
+        return campos, catalogo.tiempo_estimado_resolucion if catalogo else None
+
+    def _nueva_alerta(self, machine_alert):
+        equipo = machine_alert.machine.equipo_local
+        campos, horas_resolucion = self._campos(machine_alert)
+        alerta = AlertaEquipo(
+            machine_alert=machine_alert,
+            cliente=equipo.cliente,
+            sucursal_id=equipo.cliente.sucursal_id,
+            pin_equipo=(machine_alert.machine.serial_number or equipo.numero_serie)[:50],
+            estado='PENDIENTE',
+            **campos
+        )
+        # bulk_create no pasa por save(): los límites de SLA se fijan acá, desde que la máquina emitió la alerta
+        alerta.calcular_limites_sla(horas_resolucion, inicio=machine_alert.timestamp)
+        return alerta
+
+    # Sincronización
+
+    def sincronizar(self):
+        """Crear las alertas nuevas y actualizar las pendientes. Devuelve los contadores."""
+        activas = MachineAlert.objects.filter(status='ACTIVE', alerta_equipo__isnull=True)
+        resultado = {
+            'creadas': 0,
+            'actualizadas': 0,
+            'cerradas': 0,
+            'sin_equipo': activas.filter(machine__equipo_local__isnull=True).count(),
+        }
+
+        nuevas = [
+            self._nueva_alerta(machine_alert)
+            for machine_alert in activas.filter(machine__equipo_local__isnull=False).select_related(
+                'machine__equipo_local__cliente', 'machine__equipo_local__modelo'
+            )
+        ]
+        modificadas = []
+        ahora = timezone.now()
+
+        pendientes = AlertaEquipo.objects.filter(
+            estado='PENDIENTE',
+            machine_alert__isnull=False,
+            machine_alert__updated_at__gt=F('fecha_modificacion'),
+        ).select_related('machine_alert__machine__equipo_local__modelo')
+        for alerta in pendientes:
+            machine_alert = alerta.machine_alert
+            if machine_alert.status in self.ESTADOS_CERRADOS:
+                alerta.estado = 'RESUELTA'
+                alerta.fecha_resolucion = machine_alert.resolved_at or ahora
+                alerta.observaciones_tecnico = 'Resuelta en Operations Center'
+                resultado['cerradas'] += 1
+            else:
+                campos, horas_resolucion = self._campos(machine_alert)
+                if all(getattr(alerta, campo) == valor for campo, valor in campos.items()):
+                    continue
+                cambio_clasificacion = alerta.clasificacion != campos['clasificacion']
+                for campo, valor in campos.items():
+                    setattr(alerta, campo, valor)
+                if cambio_clasificacion:
+                    alerta.calcular_limites_sla(horas_resolucion, inicio=machine_alert.timestamp)
+                resultado['actualizadas'] += 1
+            alerta.fecha_modificacion = ahora
+            modificadas.append(alerta)
+
+        with transaction.atomic():
+            AlertaEquipo.objects.bulk_create(nuevas, batch_size=self.TAMANO_LOTE)
+            AlertaEquipo.objects.bulk_update(
+                modificadas,
+                self.CAMPOS_ACTUALIZABLES + [
+                    'estado', 'fecha_resolucion', 'observaciones_tecnico', 'fecha_limite_respuesta',
+                    'fecha_limite_resolucion', 'sla_vencido', 'fecha_modificacion',
+                ],
+                batch_size=self.TAMANO_LOTE,
+            )
+        resultado['creadas'] = len(nuevas)
+
+        # bulk_create no dispara señales (ni devuelve PK en MySQL): se indexa por la alerta de origen
+        machine_alert_ids = [alerta.machine_alert_id for alerta in nuevas + modificadas]
+        if machine_alert_ids:
+            BuscadorService.indexar_queryset(
+                'ALERTA', AlertaEquipo.objects.filter(machine_alert_id__in=machine_alert_ids)
+            )
+        return resultado
+
+
+def _horas(duracion):
+    return round(duracion.total_seconds() / 3600, 1) if duracion is not None else None
+
+
+def _porcentaje(parte, total):
+    return round(parte * 100 / total, 1) if total else None
+
+
+class SlaAlertasService:
+    """
+    Tiempos de respuesta y resolución de las alertas y cumplimiento del SLA,
+    calculados con agregados en la base.
+
+    La respuesta es la asignación de un técnico (o la resolución, si la alerta
+    se resolvió sin asignar) y la resolución, el paso a resuelta; las dos se
+    miden desde la recepción y se comparan con los límites que guarda cada
+    alerta. Una alerta abierta con el límite vencido cuenta como incumplida;
+    las que todavía están en término no entran en el porcentaje. Las
+    canceladas no se consideran.
+    """
+
+    def __init__(self, sucursal=None, desde=None, hasta=None):
+        self.sucursal = sucursal
+        self.desde = desde
+        self.hasta = hasta
+
+    def _alertas(self):
+        alertas = AlertaEquipo.objects.exclude(estado='CANCELADA').annotate(
+            fecha_respuesta=Coalesce('fecha_asignacion', 'fecha_resolucion')
+        )
+        if self.sucursal:
+            alertas = alertas.filter(sucursal=self.sucursal)
+        if self.desde:
+            alertas = alertas.filter(fecha__date__gte=self.desde)
+        if self.hasta:
+            alertas = alertas.filter(fecha__date__lte=self.hasta)
+        return alertas
+
+    @staticmethod
+    def _agregados():
+        ahora = timezone.now()
+
+        def duracion(hasta):
+            return ExpressionWrapper(F(hasta) - F('fecha'), output_field=DurationField())
+
+        return {
+            'total': Count('id'),
+            'abiertas': Count('id', filter=Q(estado__in=AlertaEquipo.ESTADOS_ABIERTOS)),
+            'respuesta_promedio': Avg(duracion('fecha_respuesta')),
+            'resolucion_promedio': Avg(duracion('fecha_resolucion')),
+            'respuesta_en_termino': Count('id', filter=Q(fecha_respuesta__lte=F('fecha_limite_respuesta'))),
+            'respuesta_fuera': Count('id', filter=(
+                Q(fecha_respuesta__gt=F('fecha_limite_respuesta')) |
+                Q(fecha_respuesta__isnull=True, fecha_limite_respuesta__lt=ahora)
+            )),
+            'resolucion_en_termino': Count('id', filter=Q(fecha_resolucion__lte=F('fecha_limite_resolucion'))),
+            'resolucion_fuera': Count('id', filter=(
+                Q(fecha_resolucion__gt=F('fecha_limite_resolucion')) |
+                Q(fecha_resolucion__isnull=True, fecha_limite_resolucion__lt=ahora)
+            )),
+        }
+
+    @staticmethod
+    def _con_indicadores(fila):
+        """Promedios en horas y porcentaje de cumplimiento sobre las alertas ya definidas"""
+        fila['respuesta_promedio'] = _horas(fila['respuesta_promedio'])
+        fila['resolucion_promedio'] = _horas(fila['resolucion_promedio'])
+        fila['cumplimiento_respuesta'] = _porcentaje(
+            fila['respuesta_en_termino'], fila['respuesta_en_termino'] + fila['respuesta_fuera']
+        )
+        fila['cumplimiento_resolucion'] = _porcentaje(
+            fila['resolucion_en_termino'], fila['resolucion_en_termino'] + fila['resolucion_fuera']
+        )
+        return fila
+
+    def _agrupado(self, *campos):
+        return [
+            self._con_indicadores(fila)
+            for fila in self._alertas().values(*campos).annotate(**self._agregados()).order_by(*campos)
+        ]
+
+    def totales(self):
+        return self._con_indicadores(self._alertas().aggregate(**self._agregados()))
+
+    def por_clasificacion(self):
+        orden = [clasificacion for clasificacion, _ in AlertaEquipo.CLASIFICACION_CHOICES]
+        nombres = dict(AlertaEquipo.CLASIFICACION_CHOICES)
+        filas = self._agrupado('clasificacion')
+        for fila in filas:
+            fila['nombre'] = nombres.get(fila['clasificacion'], fila['clasificacion'])
+        return sorted(filas, key=lambda fila: orden.index(fila['clasificacion']))
+
+    def por_tecnico(self):
+        """Técnicos con alertas asignadas, de menor a mayor cumplimiento de resolución"""
+        filas = self._agrupado('tecnico_asignado', 'tecnico_asignado__nombre', 'tecnico_asignado__apellido')
+        filas = [fila for fila in filas if fila['tecnico_asignado']]
+        for fila in filas:
+            fila['nombre'] = f"{fila['tecnico_asignado__nombre']} {fila['tecnico_asignado__apellido']}"
+        return sorted(filas, key=lambda fila: (fila['cumplimiento_resolucion'] is None, fila['cumplimiento_resolucion']))
+
+    def por_sucursal(self):
+        filas = self._agrupado('sucursal', 'sucursal__nombre')
+        for fila in filas:
+            fila['nombre'] = fila['sucursal__nombre']
+        return filas
+
+    # Tablero y vencimientos
+
+    @staticmethod
+    def tablero(usuario):
+        """Contadores del panel del Centro de Soluciones en una sola consulta"""
+        if usuario.rol in ['GERENTE', 'ADMINISTRATIVO']:
+            alertas = AlertaEquipo.objects.filter(sucursal=usuario.sucursal)
+        else:
+            alertas = AlertaEquipo.objects.filter(tecnico_asignado=usuario)
+        abiertas = Q(estado__in=AlertaEquipo.ESTADOS_ABIERTOS)
+        return alertas.filter(abiertas).aggregate(
+            pendientes=Count('id', filter=Q(estado='PENDIENTE')),
+            asignadas=Count('id', filter=Q(estado='ASIGNADA')),
+            en_proceso=Count('id', filter=Q(estado='EN_PROCESO')),
+            vencidas=Count('id', filter=Q(sla_vencido=True)),
+            criticas=Count('id', filter=Q(clasificacion='CRITICA')),
+        )
+
+    @staticmethod
+    def marcar_vencidas():
+        """
+        Marcar las alertas que incumplieron el SLA. Devuelve las abiertas recién
+        vencidas, para avisar; las ya cerradas fuera de término se marcan sin aviso.
+        """
+        ahora = timezone.now()
+        sin_marcar = AlertaEquipo.objects.filter(sla_vencido=False)
+        sin_marcar.exclude(estado__in=AlertaEquipo.ESTADOS_ABIERTOS).filter(
+            Q(fecha_asignacion__gt=F('fecha_limite_respuesta')) |
+            Q(fecha_resolucion__gt=F('fecha_limite_resolucion'))
+        ).update(sla_vencido=True)
+
+        vencidas = list(
+            sin_marcar.filter(estado__in=AlertaEquipo.ESTADOS_ABIERTOS).filter(
+                Q(fecha_limite_resolucion__lt=ahora) |
+                Q(fecha_asignacion__isnull=True, fecha_limite_respuesta__lt=ahora) |
+                Q(fecha_asignacion__gt=F('fecha_limite_respuesta'))
+            ).select_related('cliente', 'sucursal', 'tecnico_asignado').order_by('sucursal', 'fecha_limite_resolucion')
+        )
+        AlertaEquipo.objects.filter(pk__in=[alerta.pk for alerta in vencidas]).update(sla_vencido=True)
+        return vencidas
+
+
+def _distancia_km(lat, lng, lat_destino, lng_destino):
+    """Distancia por la fórmula del haversine, vectorizada sobre las series lat/lng"""
+    lat, lng = np.radians(lat), np.radians(lng)
+    lat_destino, lng_destino = np.radians(lat_destino), np.radians(lng_destino)
+    a = (
+        np.sin((lat_destino - lat) / 2) ** 2 +
+        np.cos(lat) * np.cos(lat_destino) * np.sin((lng_destino - lng) / 2) ** 2
+    )
+    return 6371 * 2 * np.arcsin(np.sqrt(a))
+
+
+def _contar(queryset, campo):
+    """Subconsulta con la cantidad de filas del queryset relacionadas con el técnico de la consulta externa"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{campo: OuterRef('pk')}).order_by().values(campo).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+class DespachoAlertasService:
+    """
+    Elige el técnico para una alerta.
+
+    Los técnicos activos se traen en una sola consulta con su carga actual
+    (alertas asignadas o en proceso, servicios en proceso y preórdenes
+    agendadas para los próximos días), el nivel de sus certificaciones John
+    Deere vigentes y la ubicación de su sucursal. El puntaje se calcula para
+    todos a la vez con pandas: suman menos carga, ser de la sucursal de la
+    alerta, más certificaciones y menor distancia a la última ubicación
+    conocida de la máquina (sin ubicación, la distancia puntúa neutro).
+
+    Las alertas críticas pendientes se asignan solas al mejor candidato,
+    salvo que hasta ese técnico esté sobrecargado. El aviso por email sale
+    después de confirmar la asignación, con un tiempo máximo de conexión, y
+    un error de envío se registra sin cortar el despacho ni la sincronización.
+    """
+
+    PESOS = {'carga': 40, 'sucursal': 25, 'certificaciones': 15, 'distancia': 20}
+    DIAS_AGENDA = 7
+    DISTANCIA_MAXIMA_KM = 500
+    CARGA_MAXIMA_AUTOMATICA = 6
+    TIMEOUT_EMAIL = 10  # segundos
+    ESTADOS_SERVICIO_CERRADOS = ['A_FACTURAR', 'COMPLETADO']
+
+    def __init__(self, alerta):
+        self.alerta = alerta
+
+    @classmethod
+    def _tecnicos(cls):
+        hoy = timezone.localdate()
+        agenda = PreOrden.objects.filter(
+            activo=True, fecha_estimada__range=(hoy, hoy + timedelta(days=cls.DIAS_AGENDA))
+        ).exclude(servicio__estado__in=cls.ESTADOS_SERVICIO_CERRADOS)
+        certificaciones = CertificacionTecnico.objects.filter(
+            Q(fecha_vencimiento__isnull=True) | Q(fecha_vencimiento__gte=hoy),
+            tecnico=OuterRef('pk'),
+            certificacion__activo=True,
+        ).order_by().values('tecnico').annotate(
+            nivel=Sum(Case(
+                When(certificacion__level='LEVEL3', then=Value(3)),
+                When(certificacion__level='LEVEL2', then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ))
+        ).values('nivel')
+
+        return Usuario.objects.filter(rol='TECNICO', is_active=True).annotate(
+            alertas_abiertas=_contar(
+                AlertaEquipo.objects.filter(estado__in=['ASIGNADA', 'EN_PROCESO']), 'tecnico_asignado'
+            ),
+            servicios_en_curso=_contar(Servicio.objects.filter(estado='EN_PROCESO'), 'preorden__tecnicos'),
+            agenda=_contar(agenda, 'tecnicos'),
+            certificaciones=Coalesce(Subquery(certificaciones), 0),
+        ).values(
+            'id', 'nombre', 'apellido', 'sucursal_id', 'sucursal__nombre', 'sucursal__latitud', 'sucursal__longitud',
+            'alertas_abiertas', 'servicios_en_curso', 'agenda', 'certificaciones',
+        )
+
+    def ubicacion_maquina(self):
+        """(latitud, longitud) de la última posición conocida de la máquina de la alerta, o None"""
+        if self.alerta.machine_alert_id:
+            maquina = self.alerta.machine_alert.machine
+        else:
+            maquina = Machine.objects.filter(serial_number=self.alerta.pin_equipo).first()
+        if maquina and maquina.last_location_lat is not None and maquina.last_location_lng is not None:
+            return float(maquina.last_location_lat), float(maquina.last_location_lng)
+        return None
+
+    def candidatos(self, limite=None):
+        """Técnicos ordenados por puntaje (0 a 100), con el detalle de cada criterio"""
+        df = pd.DataFrame(list(self._tecnicos()))
+        if df.empty:
+            return []
+
+        df['carga'] = df['alertas_abiertas'] + df['servicios_en_curso'] + df['agenda']
+        df['misma_sucursal'] = df['sucursal_id'] == self.alerta.sucursal_id
+
+        ubicacion = self.ubicacion_maquina()
+        if ubicacion:
+            df['distancia_km'] = _distancia_km(
+                pd.to_numeric(df['sucursal__latitud'], errors='coerce'),
+                pd.to_numeric(df['sucursal__longitud'], errors='coerce'),
+                *ubicacion
+            )
+        else:
+            df['distancia_km'] = np.nan
+        cercania = (1 - df['distancia_km'].clip(upper=self.DISTANCIA_MAXIMA_KM) / self.DISTANCIA_MAXIMA_KM).fillna(0.5)
+
+        df['puntaje'] = (
+            self.PESOS['carga'] * (1 - df['carga'] / max(df['carga'].max(), 1)) +
+            self.PESOS['sucursal'] * df['misma_sucursal'] +
+            self.PESOS['certificaciones'] * df['certificaciones'] / max(df['certificaciones'].max(), 1) +
+            self.PESOS['distancia'] * cercania
+        ).round(1)
+        df['distancia_km'] = df['distancia_km'].round(0)
+        df = df.sort_values(['puntaje', 'carga'], ascending=[False, True])
+        if limite:
+            df = df.head(limite)
+
+        candidatos = df.astype(object).where(df.notna(), None).to_dict('records')
+        for candidato in candidatos:
+            candidato['nombre_completo'] = f"{candidato['nombre']} {candidato['apellido']}"
+        return candidatos
+
+    def asignar(self, tecnico, usuario=None, motivo=''):
+        """Asignar la alerta al técnico y dejarlo en el historial de asignaciones"""
+        with transaction.atomic():
+            self.alerta.tecnico_asignado = tecnico
+            if self.alerta.estado == 'PENDIENTE':
+                self.alerta.estado = 'ASIGNADA'
+            self.alerta.save()
+            AsignacionAlerta.objects.create(
+                alerta=self.alerta, tecnico=tecnico, asignado_por=usuario, motivo=motivo
+            )
+
+    def asignar_automaticamente(self):
+        """Asignar al mejor candidato si no está sobrecargado. Devuelve el candidato o None."""
+        candidatos = self.candidatos(limite=1)
+        if not candidatos or candidatos[0]['carga'] >= self.CARGA_MAXIMA_AUTOMATICA:
+            return None
+        mejor = candidatos[0]
+        tecnico = Usuario.objects.get(pk=mejor['id'])
+        distancia = f", a {mejor['distancia_km']:.0f} km" if mejor['distancia_km'] is not None else ''
+        self.asignar(
+            tecnico,
+            motivo=(
+                f"Asignación automática (puntaje {mejor['puntaje']}): carga {mejor['carga']}, "
+                f"sucursal {mejor['sucursal__nombre']}{distancia}"
+            ),
+        )
+        transaction.on_commit(lambda: self._notificar(tecnico))
+        return mejor
+
+    def _notificar(self, tecnico):
+        if not tecnico.email:
+            return
+        try:
+            mensaje_html = render_to_string('centroSoluciones/email_alerta_asignada.html', {
+                'alerta': self.alerta,
+                'tecnico': tecnico,
+                'fecha_alerta': timezone.localtime().strftime('%d/%m/%Y %H:%M'),
+            })
+            email = EmailMultiAlternatives(
+                f"🚨 Alerta {self.alerta.get_clasificacion_display().lower()} asignada: {self.alerta.codigo}",
+                strip_tags(mensaje_html),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[tecnico.email],
+                connection=get_connection(timeout=self.TIMEOUT_EMAIL),
+            )
+            email.attach_alternative(mensaje_html, "text/html")
+            email.send()
+        except Exception:
+            logger.exception('No se pudo avisar a %s de la alerta %s', tecnico.email, self.alerta.pk)
+
+    @classmethod
+    def despachar_criticas(cls):
+        """Asignar las alertas críticas pendientes sin técnico. Devuelve [(alerta, candidato)]."""
+        alertas = AlertaEquipo.objects.filter(
+            clasificacion='CRITICA', estado='PENDIENTE', tecnico_asignado__isnull=True
+        ).select_related('machine_alert__machine', 'cliente').order_by('fecha')
+        asignadas = []
+        for alerta in alertas:
+            # La carga se vuelve a consultar en cada alerta: incluye las asignaciones anteriores
+            candidato = cls(alerta).asignar_automaticamente()
+            if candidato:
+                asignadas.append((alerta, candidato))
+        return asignadas
+
+
+class PuntajeLeadsService:
+    """
+    Prioriza los leads de John Deere con un puntaje de 0 a 100.
+
+    Criterios:
+    - segmento ABC del cliente según su facturación de servicios del último año
+    - antigüedad y horas del equipo (más uso, más necesidad de servicio)
+    - facturación reciente del cliente, en escala logarítmica
+    - alertas del equipo en los últimos días, ponderadas por gravedad
+
+    Todo se resuelve con consultas agrupadas y pandas; el resultado se guarda
+    en el lead para que la lista ordene por un campo indexado.
+    """
+
+    PESOS = {'segmento': 30, 'equipo': 25, 'facturacion': 25, 'alertas': 20}
+    PUNTOS_SEGMENTO = {'A': 1.0, 'B': 0.6, 'C': 0.3, 'NUEVO': 0.1}
+    PUNTOS_GRAVEDAD = {'CRITICA': 3, 'ALTA': 2, 'MEDIA': 1, 'BAJA': 1}
+    DIAS_SEGMENTO = 365
+    DIAS_FACTURACION_RECIENTE = 180
+    DIAS_ALERTAS = 90
+    ANTIGUEDAD_REFERENCIA = 10  # años
+    HORAS_REFERENCIA = 10000
+    ALERTAS_REFERENCIA = 6  # puntos de gravedad
+    TAMANIO_LOTE = 500
+
+    def __init__(self):
+        self.ahora = timezone.now()
+        self.hoy = timezone.localdate()
+
+    def facturacion_por_cliente(self, desde):
+        """Serie cliente_id -> mano de obra + gastos + repuestos de los servicios completados desde la fecha"""
+        filtro = {'estado': 'COMPLETADO', 'fecha_servicio__gte': desde}
+        mano_obra = Servicio.objects.filter(**filtro).values('preorden__cliente').annotate(
+            total=Sum('valor_mano_obra')
+        ).values_list('preorden__cliente', 'total')
+        gastos = GastoAsistencia.objects.filter(
+            **{f'servicio__{campo}': valor for campo, valor in filtro.items()}
+        ).values('servicio__preorden__cliente').annotate(total=Sum('monto')).values_list(
+            'servicio__preorden__cliente', 'total'
+        )
+        repuestos = VentaRepuesto.objects.filter(
+            **{f'servicio__{campo}': valor for campo, valor in filtro.items()}
+        ).values('servicio__preorden__cliente').annotate(
+            total=Sum(F('precio_unitario') * F('cantidad'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        ).values_list('servicio__preorden__cliente', 'total')
+
+        filas = [*mano_obra, *gastos, *repuestos]
+        if not filas:
+            return pd.Series(dtype=float)
+        df = pd.DataFrame(filas, columns=['cliente_id', 'total'])
+        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
+        return df.groupby('cliente_id')['total'].sum()
+
+    def segmentos(self, facturacion):
+        """
+        Segmento ABC por cliente: A hasta el 80% acumulado de la facturación,
+        B hasta el 95% y C el resto. Sin facturación, NUEVO.
+        """
+        facturacion = facturacion[facturacion > 0].sort_values(ascending=False)
+        if facturacion.empty:
+            return pd.Series(dtype=object)
+        acumulado_previo = (facturacion.cumsum() - facturacion) / facturacion.sum() * 100
+        return pd.Series(
+            np.select([acumulado_previo < 80, acumulado_previo < 95], ['A', 'B'], default='C'),
+            index=facturacion.index,
+        )
+
+    def _alertas_por_pin(self, pines):
+        desde = self.ahora - timedelta(days=self.DIAS_ALERTAS)
+        filas = AlertaEquipo.objects.filter(pin_equipo__in=pines, fecha__gte=desde).values(
+            'pin_equipo', 'clasificacion'
+        ).annotate(cantidad=Count('id')).values_list('pin_equipo', 'clasificacion', 'cantidad')
+        df = pd.DataFrame(list(filas), columns=['pin', 'clasificacion', 'cantidad'])
+        df['peso'] = df['clasificacion'].map(self.PUNTOS_GRAVEDAD).fillna(1) * df['cantidad']
+        return df.groupby('pin')['peso'].sum()
+
+    def calcular(self, leads=None):
+        """Recalcular y guardar el puntaje de los leads abiertos. Devuelve la cantidad actualizada."""
+        if leads is None:
+            leads = LeadJohnDeere.objects.all()
+        df = pd.DataFrame(list(
+            leads.filter(estado__in=LeadJohnDeere.ESTADOS_ABIERTOS).values(
+                'id', 'cliente_id', 'equipo__numero_serie', 'equipo__año_fabricacion', 'equipo__ultima_hora_registrada'
+            )
+        ))
+        if df.empty:
+            return 0
+
+        # El segmento se calcula sobre todos los clientes, no solo los de los leads
+        facturacion_anual = self.facturacion_por_cliente(self.hoy - timedelta(days=self.DIAS_SEGMENTO))
+        facturacion_reciente = self.facturacion_por_cliente(self.hoy - timedelta(days=self.DIAS_FACTURACION_RECIENTE))
+        df['segmento'] = df['cliente_id'].map(self.segmentos(facturacion_anual)).fillna('NUEVO')
+        df['facturacion_reciente'] = df['cliente_id'].map(facturacion_reciente).fillna(0)
+        df['alertas'] = df['equipo__numero_serie'].map(self._alertas_por_pin(df['equipo__numero_serie'].unique().tolist())).fillna(0)
+
+        antiguedad = (self.hoy.year - df['equipo__año_fabricacion']).clip(lower=0)
+        horas = pd.to_numeric(df['equipo__ultima_hora_registrada'], errors='coerce')
+        nota_antiguedad = (antiguedad / self.ANTIGUEDAD_REFERENCIA).clip(upper=1)
+        nota_horas = (horas / self.HORAS_REFERENCIA).clip(upper=1)
+        # Sin horómetro cargado, el equipo se evalúa solo por su antigüedad
+        nota_equipo = ((nota_antiguedad + nota_horas) / 2).fillna(nota_antiguedad)
+
+        # Se compara contra el cliente que más facturó, no contra los leads del lote: así el
+        # puntaje de un lead suelto o de una sucursal es el mismo que en la corrida completa
+        maximo_reciente = facturacion_reciente.max() if not facturacion_reciente.empty else 0
+        nota_facturacion = np.log1p(df['facturacion_reciente']) / np.log1p(maximo_reciente) if maximo_reciente > 0 else 0
+
+        notas = pd.DataFrame({
+            'segmento': df['segmento'].map(self.PUNTOS_SEGMENTO),
+            'equipo': nota_equipo,
+            'facturacion': nota_facturacion,
+            'alertas': (df['alertas'] / self.ALERTAS_REFERENCIA).clip(upper=1),
+        })
+        puntos = notas * pd.Series(self.PESOS)
+        df['puntaje'] = puntos.sum(axis=1).round().astype(int)
+        df['detalle'] = puntos.round(1).to_dict('records')
+
+        datos = df.set_index('id')
+        leads_a_guardar = list(LeadJohnDeere.objects.filter(id__in=datos.index.tolist()).only('id'))
+        for lead in leads_a_guardar:
+            fila = datos.loc[lead.id]
+            lead.puntaje = int(fila['puntaje'])
+            lead.segmento_cliente = fila['segmento']
+            lead.detalle_puntaje = {
+                **fila['detalle'],
+                'facturacion_reciente': round(float(fila['facturacion_reciente']), 2),
+                'alertas_recientes': float(fila['alertas']),
+            }
+            lead.fecha_puntaje = self.ahora
+        LeadJohnDeere.objects.bulk_update(
+            leads_a_guardar,
+            ['puntaje', 'segmento_cliente', 'detalle_puntaje', 'fecha_puntaje'],
+            batch_size=self.TAMANIO_LOTE,
+        )
+        return len(leads_a_guardar)
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CodigoAlerta
+from .services import CatalogoCodigosAlertaService
+
+
+@receiver(post_save, sender=CodigoAlerta)
+@receiver(post_delete, sender=CodigoAlerta)
+def invalidar_catalogo_codigos(sender, **kwargs):
+    """Cualquier cambio en los códigos de alerta obliga a rearmar el catálogo en memoria"""
+    # Después del commit, para que ningún proceso vuelva a cargar los datos anteriores
+    transaction.on_commit(CatalogoCodigosAlertaService.invalidar)
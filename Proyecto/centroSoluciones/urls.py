@@ -8,6 +8,8 @@ urlpatterns = [
     path('alertas/', views.alertas_list, name='alertas_list'),
     path('alertas/<int:alerta_id>/', views.alerta_detail, name='alerta_detail'),
     path('alertas/<int:alerta_id>/procesar/', views.procesar_alerta, name='procesar_alerta'),
+    path('alertas/<int:alerta_id>/asignar/', views.asignar_tecnico_alerta, name='asignar_tecnico_alerta'),
+    path('alertas/sla/', views.reporte_sla, name='reporte_sla'),
     path('leads/', views.leads_list, name='leads_list'),
     path('leads/<int:lead_id>/', views.lead_detail, name='lead_detail'),
     path('leads/<int:lead_id>/editar/', views.lead_edit, name='lead_edit'),
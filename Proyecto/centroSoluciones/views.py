@@ -1,7 +1,9 @@
+from datetime import datetime, timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
@@ -10,43 +12,42 @@ from .models import AlertaEquipo, LeadJohnDeere, AsignacionAlerta, CodigoAlerta
 from clientes.models import Cliente, Equipo
 from recursosHumanos.models import Usuario, Sucursal
 from crm.models import EmbudoVentas, ContactoCliente
+from buscador.services import BuscadorService
+from .services import CatalogoCodigosAlertaService, DespachoAlertasService, PuntajeLeadsService, SlaAlertasService
 
 # Create your views here.
 
 @login_required
 def dashboard(request):
     """Vista principal del Centro de Soluciones Conectadas"""
-    # Obtener estadísticas según el rol del usuario
+    # Contadores de alertas de la sucursal (o del técnico) en una sola consulta
+    tablero = SlaAlertasService.tablero(request.user)
+    sla = None
     if request.user.rol in ['GERENTE', 'ADMINISTRATIVO']:
         # Para gerentes/administrativos: ver todas las alertas de su sucursal
-        alertas_pendientes = AlertaEquipo.objects.filter(
-            estado='PENDIENTE',
-            sucursal=request.user.sucursal
-        ).count()
-        alertas_asignadas = AlertaEquipo.objects.filter(
-            estado__in=['ASIGNADA', 'EN_PROCESO'],
-            sucursal=request.user.sucursal
-        ).count()
+        alertas_pendientes = tablero['pendientes']
+        alertas_asignadas = tablero['asignadas'] + tablero['en_proceso']
         leads_nuevos = LeadJohnDeere.objects.filter(
             estado='NUEVO',
             sucursal=request.user.sucursal
         ).count()
+        sla = SlaAlertasService(
+            sucursal=request.user.sucursal,
+            desde=timezone.localdate() - timedelta(days=30),
+        ).totales()
     else:
         # Para técnicos: ver solo sus alertas asignadas
-        alertas_pendientes = AlertaEquipo.objects.filter(
-            tecnico_asignado=request.user,
-            estado='ASIGNADA'
-        ).count()
-        alertas_asignadas = AlertaEquipo.objects.filter(
-            tecnico_asignado=request.user,
-            estado='EN_PROCESO'
-        ).count()
+        alertas_pendientes = tablero['asignadas']
+        alertas_asignadas = tablero['en_proceso']
         leads_nuevos = 0  # Los técnicos no ven leads
     
     context = {
         'alertas_pendientes': alertas_pendientes,
         'alertas_asignadas': alertas_asignadas,
+        'alertas_vencidas': tablero['vencidas'],
+        'alertas_criticas': tablero['criticas'],
         'leads_nuevos': leads_nuevos,
+        'sla': sla,
     }
     
     return render(request, 'centroSoluciones/dashboard.html', context)
@@ -78,12 +79,7 @@ def alertas_list(request):
     if clasificacion:
         alertas = alertas.filter(clasificacion=clasificacion)
     if search:
-        alertas = alertas.filter(
-            Q(cliente__razon_social__icontains=search) |
-            Q(pin_equipo__icontains=search) |
-            Q(codigo__icontains=search) |
-            Q(descripcion__icontains=search)
-        )
+        alertas = alertas.filter(pk__in=BuscadorService.ids('ALERTA', search))
     
     # Ordenar por fecha (más recientes primero)
     alertas = alertas.order_by('-fecha')
@@ -113,25 +109,54 @@ def alerta_detail(request, alerta_id):
     else:
         alerta = get_object_or_404(AlertaEquipo, id=alerta_id, tecnico_asignado=request.user)
     
-    # Calcular horas para los tiempos
+    # Horas que exceden los días completos (el template muestra "N días, M horas")
     tiempo_pendiente_horas = 0
     tiempo_resolucion_horas = 0
     
     if alerta.tiempo_pendiente:
-        tiempo_pendiente_horas = round(alerta.tiempo_pendiente.seconds / 3600, 1)
+        tiempo_pendiente_horas = int(alerta.tiempo_pendiente.total_seconds() % 86400 // 3600)
     
     if alerta.tiempo_resolucion:
-        tiempo_resolucion_horas = round(alerta.tiempo_resolucion.seconds / 3600, 1)
+        tiempo_resolucion_horas = int(alerta.tiempo_resolucion.total_seconds() % 86400 // 3600)
+    
+    es_admin = request.user.rol in ['GERENTE', 'ADMINISTRATIVO']
+    
+    # Técnicos sugeridos por carga, sucursal, certificaciones y distancia a la máquina
+    candidatos = []
+    if es_admin and alerta.estado in ['PENDIENTE', 'ASIGNADA']:
+        candidatos = DespachoAlertasService(alerta).candidatos(limite=5)
     
     context = {
         'alerta': alerta,
-        'es_admin': request.user.rol in ['GERENTE', 'ADMINISTRATIVO'],
+        'es_admin': es_admin,
         'tiempo_pendiente_horas': tiempo_pendiente_horas,
         'tiempo_resolucion_horas': tiempo_resolucion_horas,
+        'candidatos': candidatos,
     }
     
     return render(request, 'centroSoluciones/alerta_detail.html', context)
 
+@login_required
+@require_http_methods(["POST"])
+def asignar_tecnico_alerta(request, alerta_id):
+    """Asignar la alerta a uno de los técnicos sugeridos"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para asignar alertas.')
+        return redirect('centroSoluciones:alertas_list')
+    
+    alerta = get_object_or_404(AlertaEquipo, id=alerta_id, sucursal=request.user.sucursal)
+    if alerta.estado not in ['PENDIENTE', 'ASIGNADA']:
+        messages.error(request, 'Solo se pueden asignar alertas pendientes o asignadas.')
+        return redirect('centroSoluciones:alerta_detail', alerta_id=alerta.id)
+    
+    tecnico = get_object_or_404(Usuario, id=request.POST.get('tecnico'), rol='TECNICO', is_active=True)
+    DespachoAlertasService(alerta).asignar(
+        tecnico, usuario=request.user, motivo=request.POST.get('motivo', 'Asignado desde técnicos sugeridos')
+    )
+    
+    messages.success(request, f'Alerta {alerta.codigo} asignada a {tecnico.get_nombre_completo()}.')
+    return redirect('centroSoluciones:alerta_detail', alerta_id=alerta.id)
+
 @login_required
 def procesar_alerta(request, alerta_id):
     """Vista para que los técnicos y gerentes procesen alertas con conexión SAR y oportunidades CRM"""
@@ -200,10 +225,10 @@ def procesar_alerta(request, alerta_id):
         messages.success(request, f'Alerta {alerta.codigo} procesada correctamente.')
         return redirect('centroSoluciones:alerta_detail', alerta_id=alerta.id)
     
-    # Calcular horas del tiempo pendiente para el template
+    # Horas que exceden los días completos (el template muestra "N días, M horas")
     tiempo_pendiente_seconds_hours = 0
     if alerta.tiempo_pendiente:
-        tiempo_pendiente_seconds_hours = int(alerta.tiempo_pendiente.total_seconds() // 3600)
+        tiempo_pendiente_seconds_hours = int(alerta.tiempo_pendiente.total_seconds() % 86400 // 3600)
     
     context = {
         'alerta': alerta,
@@ -238,8 +263,8 @@ def crear_alerta(request):
         if tecnico_id:
             tecnico = get_object_or_404(Usuario, id=tecnico_id, rol='TECNICO')
         
-        # Crear la alerta
-        alerta = AlertaEquipo.objects.create(
+        # Crear la alerta, con el tiempo de resolución del código si está en el catálogo
+        alerta = AlertaEquipo(
             cliente=cliente,
             pin_equipo=pin_equipo,
             clasificacion=clasificacion,
@@ -249,15 +274,26 @@ def crear_alerta(request):
             tecnico_asignado=tecnico,
             creado_por=request.user
         )
+        modelo_equipo = Equipo.objects.filter(
+            cliente=cliente, numero_serie=pin_equipo
+        ).values_list('modelo__nombre', flat=True).first()
+        codigo_alerta = CatalogoCodigosAlertaService.buscar(codigo, modelo_equipo)
+        alerta.calcular_limites_sla(codigo_alerta.tiempo_estimado_resolucion if codigo_alerta else None)
+        alerta.save()
         
-        # Si se asignó un técnico, actualizar estado
+        # Si se asignó un técnico, actualizar estado; las críticas sin técnico se despachan solas
+        mensaje = f'Alerta {alerta.codigo} creada exitosamente'
         if tecnico:
             alerta.estado = 'ASIGNADA'
             alerta.save()
+        elif clasificacion == 'CRITICA':
+            candidato = DespachoAlertasService(alerta).asignar_automaticamente()
+            if candidato:
+                mensaje += f" y asignada a {candidato['nombre_completo']}"
         
         return JsonResponse({
             'success': True, 
-            'message': f'Alerta {alerta.codigo} creada exitosamente',
+            'message': mensaje,
             'alerta_id': alerta.id
         })
         
@@ -306,6 +342,9 @@ def crear_lead(request):
             creado_por=request.user
         )
         
+        # Puntaje inicial, para que no espere a la próxima corrida del comando
+        PuntajeLeadsService().calcular(LeadJohnDeere.objects.filter(pk=lead.pk))
+        
         # Crear embudo de ventas automáticamente
         try:
             embudo = EmbudoVentas.objects.create(
@@ -416,8 +455,12 @@ def leads_list(request):
         messages.error(request, 'No tienes permisos para ver leads.')
         return redirect('centroSoluciones:centro_soluciones_dashboard')
     
-    # Filtrar leads por sucursal
-    leads = LeadJohnDeere.objects.filter(sucursal=request.user.sucursal)
+    # Filtrar leads por sucursal, con el embudo asociado resuelto en la misma consulta
+    leads = LeadJohnDeere.objects.filter(sucursal=request.user.sucursal).select_related(
+        'cliente', 'equipo__modelo'
+    ).annotate(
+        embudo_id=Subquery(EmbudoVentas.objects.filter(lead_jd=OuterRef('pk')).order_by('id').values('id')[:1])
+    )
     
     # Aplicar filtros
     estado = request.GET.get('estado')
@@ -435,8 +478,12 @@ def leads_list(request):
             Q(descripcion__icontains=search)
         )
     
-    # Ordenar por fecha (más recientes primero)
-    leads = leads.order_by('-fecha')
+    # Los mejores leads primero (puntaje calculado por el comando puntuar_leads), luego los más recientes
+    orden = request.GET.get('orden', 'puntaje')
+    if orden == 'fecha':
+        leads = leads.order_by('-fecha')
+    else:
+        leads = leads.order_by('-puntaje', '-fecha')
     
     # Paginación
     paginator = Paginator(leads, 20)
@@ -448,6 +495,7 @@ def leads_list(request):
         'estado_filtro': estado,
         'clasificacion_filtro': clasificacion,
         'search_filtro': search,
+        'orden': orden,
     }
     
     return render(request, 'centroSoluciones/leads_list.html', context)
@@ -546,24 +594,10 @@ def obtener_codigo_alerta(request):
         return JsonResponse({'success': False, 'message': 'Código de alerta requerido'})
     
     try:
-        # Buscar el código de alerta
-        codigo_alerta = CodigoAlerta.objects.filter(
-            codigo=codigo,
-            activo=True
-        ).first()
+        # Versión específica del modelo o, si no hay, la genérica (catálogo en memoria)
+        codigo_alerta = CatalogoCodigosAlertaService.buscar(codigo, modelo_equipo)
         
         if codigo_alerta:
-            # Si se especifica modelo, verificar que coincida
-            if modelo_equipo and codigo_alerta.modelo_equipo != modelo_equipo:
-                # Buscar una versión específica para ese modelo
-                codigo_especifico = CodigoAlerta.objects.filter(
-                    codigo=codigo,
-                    modelo_equipo=modelo_equipo,
-                    activo=True
-                ).first()
-                if codigo_especifico:
-                    codigo_alerta = codigo_especifico
-            
             return JsonResponse({
                 'success': True,
                 'codigo_alerta': {
@@ -633,7 +667,7 @@ def gestionar_codigos_alerta(request):
         codigos = codigos.filter(activo=activo == 'true')
     
     # Ordenar por código
-    codigos = codigos.order_by('codigo')
+    codigos = codigos.order_by('codigo', 'modelo_equipo')
     
     # Paginación
     paginator = Paginator(codigos, 20)
@@ -673,13 +707,17 @@ def crear_codigo_alerta(request):
             repuestos = request.POST.get('repuestos_comunes', '')
             tiempo_estimado = request.POST.get('tiempo_estimado_resolucion')
             
-            # Validaciones
-            if not all([codigo, modelo_equipo, descripcion, clasificacion]):
+            # Validaciones (sin modelo, el código es la versión genérica)
+            modelo_equipo = (modelo_equipo or '').strip()
+            if not all([codigo, descripcion, clasificacion]):
                 return JsonResponse({'success': False, 'message': 'Todos los campos obligatorios deben estar completos.'})
             
-            # Verificar si el código ya existe
-            if CodigoAlerta.objects.filter(codigo=codigo).exists():
-                return JsonResponse({'success': False, 'message': f'El código {codigo} ya existe en la base de datos.'})
+            # Verificar si el código ya existe para ese modelo
+            if CodigoAlerta.objects.filter(codigo=codigo, modelo_equipo=modelo_equipo).exists():
+                return JsonResponse({
+                    'success': False,
+                    'message': f'El código {codigo} ya existe para {modelo_equipo or "todos los modelos"}.'
+                })
             
             # Crear el código
             nuevo_codigo = CodigoAlerta(
@@ -709,13 +747,61 @@ def crear_codigo_alerta(request):
 def obtener_lista_codigos_alerta(request):
     """Vista API para obtener lista de códigos de alerta (AJAX)"""
     try:
-        codigos = CodigoAlerta.objects.filter(activo=True).values(
-            'codigo', 'modelo_equipo', 'descripcion', 'clasificacion'
-        ).order_by('codigo')
+        codigos = [
+            {
+                'codigo': codigo.codigo,
+                'modelo_equipo': codigo.modelo_equipo,
+                'descripcion': codigo.descripcion,
+                'clasificacion': codigo.clasificacion,
+            }
+            for codigo in CatalogoCodigosAlertaService.listar()
+        ]
         
         return JsonResponse({
             'success': True,
-            'codigos': list(codigos)
+            'codigos': codigos
         })
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error al obtener códigos: {str(e)}'})
+
+@login_required
+def reporte_sla(request):
+    """Cumplimiento de SLA de las alertas: por sucursal, clasificación y técnico"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para ver el reporte de SLA.')
+        return redirect('centroSoluciones:centro_soluciones_dashboard')
+    
+    hoy = timezone.localdate()
+    try:
+        fecha_desde = datetime.strptime(request.GET.get('fecha_desde', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_desde = hoy - timedelta(days=90)
+    try:
+        fecha_hasta = datetime.strptime(request.GET.get('fecha_hasta', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_hasta = hoy
+    
+    # El gerente puede elegir la sucursal (o ver todas); el administrativo ve la suya
+    sucursales = Sucursal.objects.filter(activo=True).order_by('nombre')
+    if request.user.rol == 'GERENTE':
+        sucursal_id = request.GET.get('sucursal')
+        sucursal = sucursales.filter(id=sucursal_id).first() if sucursal_id else None
+    else:
+        sucursal = request.user.sucursal
+    
+    servicio = SlaAlertasService(sucursal=sucursal, desde=fecha_desde, hasta=fecha_hasta)
+    context = {
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta,
+        'sucursal': sucursal,
+        'sucursales': sucursales,
+        'totales': servicio.totales(),
+        'por_sucursal': servicio.por_sucursal() if sucursal is None else None,
+        'por_clasificacion': servicio.por_clasificacion(),
+        'por_tecnico': servicio.por_tecnico(),
+        'sla_horas': [
+            (nombre, *AlertaEquipo.SLA_HORAS[clasificacion])
+            for clasificacion, nombre in AlertaEquipo.CLASIFICACION_CHOICES
+        ],
+    }
+    return render(request, 'centroSoluciones/reporte_sla.html', context)
@@ -1,9 +1,10 @@
 from django.contrib import admin
+from buscador.admin import BusquedaAdminMixin
 from .models import Equipo, ModeloEquipo, TipoEquipo, Usuario, Cliente, ContactoCliente, ModeloMotor, RegistroHorometro
 
 @admin.register(ModeloEquipo)
 class ModeloEquipoAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'marca', 'tipo_equipo', 'activo']
+    list_display = ['nombre', 'marca', 'tipo_equipo', 'intervalo_servicio', 'activo']
     list_filter = ['marca', 'tipo_equipo', 'activo']
     search_fields = ['nombre', 'marca', 'descripcion']
     list_editable = ['activo']
@@ -11,15 +12,15 @@ class ModeloEquipoAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Información del Modelo', {
-            'fields': ('tipo_equipo', 'nombre', 'marca', 'descripcion', 'activo')
+            'fields': ('tipo_equipo', 'nombre', 'marca', 'descripcion', 'intervalo_servicio', 'activo')
         }),
     )
 
 @admin.register(Equipo)
-class EquipoAdmin(admin.ModelAdmin):
+class EquipoAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = ['numero_serie', 'modelo', 'cliente']
     list_filter = ['modelo']
-    search_fields = ['numero_serie', 'cliente__nombre']
+    search_fields = ['numero_serie', 'cliente__razon_social']
 
 @admin.register(TipoEquipo)
 class TipoEquipoAdmin(admin.ModelAdmin):
@@ -37,7 +38,7 @@ class TipoEquipoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'razon_social', 'email', 'telefono']
     list_filter = ['razon_social']
     search_fields = ['razon_social', 'email']
@@ -1,8 +1,8 @@
 from django import forms
-from .models import Cliente, ContactoCliente, TipoEquipo, ModeloEquipo, ModeloMotor, Equipo, RegistroHorometro
+from .models import Cliente, ContactoCliente, TipoEquipo, ModeloEquipo, ModeloMotor, Equipo, RegistroHorometro, Ciudad, Provincia
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Submit
-from django_select2.forms import Select2Widget
+from django_select2.forms import Select2Widget, ModelSelect2Widget
 
 class ClienteForm(forms.ModelForm):
     class Meta:
@@ -15,6 +15,18 @@ class ClienteForm(forms.ModelForm):
         ]
         widgets = {
             'observaciones': forms.Textarea(attrs={'rows': 4}),
+            # Provincia y ciudad se buscan por AJAX: solo se renderiza la opción elegida
+            'provincia': ModelSelect2Widget(
+                queryset=Provincia.objects.order_by('nombre'),
+                search_fields=['nombre__istartswith'],
+                attrs={'data-minimum-input-length': 0, 'class': 'form-control'},
+            ),
+            'ciudad': ModelSelect2Widget(
+                queryset=Ciudad.objects.order_by('nombre'),
+                search_fields=['nombre__istartswith'],
+                dependent_fields={'provincia': 'provincia'},
+                attrs={'data-minimum-input-length': 2, 'class': 'form-control'},
+            ),
         }
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -56,7 +68,7 @@ class TipoEquipoForm(forms.ModelForm):
 class ModeloEquipoForm(forms.ModelForm):
     class Meta:
         model = ModeloEquipo
-        fields = ['tipo_equipo', 'nombre', 'marca', 'descripcion', 'activo']
+        fields = ['tipo_equipo', 'nombre', 'marca', 'descripcion', 'intervalo_servicio', 'activo']
         widgets = {
             'descripcion': forms.Textarea(attrs={'rows': 3}),
         }
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0009_alter_modeloequipo_nombre_alter_modelomotor_nombre_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modeloequipo',
+            name='intervalo_servicio',
+            field=models.PositiveIntegerField(default=500, help_text='Cada cuántas horas de motor corresponde un servicio programado', verbose_name='Intervalo de Servicio (horas)'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def cargar_ultimo_registro_horometro(apps, schema_editor):
+    """Inicializar el puntero a la última lectura de horómetro de cada equipo"""
+    Equipo = apps.get_model('clientes', 'Equipo')
+    RegistroHorometro = apps.get_model('clientes', 'RegistroHorometro')
+
+    ultimo = RegistroHorometro.objects.filter(
+        equipo=models.OuterRef('pk')
+    ).order_by('-fecha_registro')
+    Equipo.objects.filter(registros_horometro__isnull=False).update(
+        ultimo_registro_horometro=models.Subquery(ultimo.values('pk')[:1]),
+        ultima_hora_registrada=models.Subquery(ultimo.values('horas')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0010_modeloequipo_intervalo_servicio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipo',
+            name='ultimo_registro_horometro',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='clientes.registrohorometro', verbose_name='Último Registro de Horómetro'),
+        ),
+        migrations.AddIndex(
+            model_name='registrohorometro',
+            index=models.Index(fields=['equipo', '-fecha_registro'], name='clientes_re_equipo__370c2c_idx'),
+        ),
+        migrations.RunPython(cargar_ultimo_registro_horometro, migrations.RunPython.noop),
+    ]
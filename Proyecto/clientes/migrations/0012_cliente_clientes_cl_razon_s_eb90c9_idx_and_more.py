@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0011_equipo_ultimo_registro_horometro_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['razon_social'], name='clientes_cl_razon_s_eb90c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['sucursal', 'razon_social'], name='clientes_cl_sucursa_98f253_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['ultima_hora_registrada'], name='clientes_eq_ultima__3dfa5a_idx'),
+        ),
+    ]
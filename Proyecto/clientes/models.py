@@ -40,6 +40,10 @@ class Cliente(models.Model):
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
         ordering = ['razon_social']
+        indexes = [
+            models.Index(fields=['razon_social']),
+            models.Index(fields=['sucursal', 'razon_social']),
+        ]
 
     def __str__(self):
         return f"{self.razon_social} - {self.cuit}"
@@ -99,6 +103,11 @@ class ModeloEquipo(models.Model):
     nombre = models.CharField(max_length=100, unique=True)  # 310SL, 670G, PP100
     marca = models.CharField(max_length=100)  # John Deere, PowerPro
     descripcion = models.TextField(blank=True)
+    intervalo_servicio = models.PositiveIntegerField(
+        default=500,
+        verbose_name="Intervalo de Servicio (horas)",
+        help_text="Cada cuántas horas de motor corresponde un servicio programado"
+    )
     activo = models.BooleanField(default=True)
 
     class Meta:
@@ -147,6 +156,15 @@ class Equipo(models.Model):
         blank=True, 
         null=True
     )
+    # Puntero a la última lectura; lo mantienen las señales de RegistroHorometro
+    ultimo_registro_horometro = models.ForeignKey(
+        'RegistroHorometro',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Último Registro de Horómetro"
+    )
 
     class Meta:
         verbose_name = "Equipo"
@@ -157,14 +175,23 @@ class Equipo(models.Model):
         indexes = [
             models.Index(fields=['cliente', 'modelo']),
             models.Index(fields=['numero_serie']),
+            models.Index(fields=['ultima_hora_registrada']),
         ]
 
     def __str__(self):
         return f"{self.modelo} - Serie: {self.numero_serie} ({self.cliente.razon_social})"
 
+    def get_proximo_servicio(self):
+        """Horómetro en el que corresponde el próximo servicio según el intervalo del modelo"""
+        intervalo = self.modelo.intervalo_servicio
+        if self.ultima_hora_registrada is None or not intervalo:
+            return None
+        return (int(self.ultima_hora_registrada // intervalo) + 1) * intervalo
+
     def get_horas_para_servicio(self):
-        if self.proximo_servicio:
-            return self.proximo_servicio - self.horometro
+        proximo_servicio = self.get_proximo_servicio()
+        if proximo_servicio:
+            return proximo_servicio - self.ultima_hora_registrada
         return None
 
 
@@ -189,5 +216,8 @@ class RegistroHorometro(models.Model):
 
     class Meta:
         ordering = ['-fecha_registro']
+        indexes = [
+            models.Index(fields=['equipo', '-fecha_registro']),
+        ]
 
 
@@ -0,0 +1,47 @@
+"""
+Servicios de la app de clientes
+"""
+from django.core.cache import cache
+
+from .models import Provincia, Sucursal
+
+
+class GeografiaService:
+    """
+    Tabla de consulta de provincias y sucursales cacheada.
+
+    Son tablas que casi no cambian, así que se leen una vez y se guardan en la
+    caché; las señales de clientes/signals.py la invalidan cuando se modifica
+    alguna de ellas.
+    """
+
+    CACHE_KEY = 'clientes:geografia'
+    CACHE_TTL = 60 * 60 * 24
+
+    @classmethod
+    def _tabla(cls):
+        tabla = cache.get(cls.CACHE_KEY)
+        if tabla is None:
+            tabla = {
+                'provincias': dict(
+                    Provincia.objects.order_by('nombre').values_list('id', 'nombre')
+                ),
+                'sucursales': list(
+                    Sucursal.objects.filter(activo=True).values_list('id', 'nombre')
+                ),
+            }
+            cache.set(cls.CACHE_KEY, tabla, cls.CACHE_TTL)
+        return tabla
+
+    @classmethod
+    def invalidar(cls):
+        cache.delete(cls.CACHE_KEY)
+
+    @classmethod
+    def sucursales(cls):
+        """Lista de (id, nombre) de las sucursales activas"""
+        return cls._tabla()['sucursales']
+
+    @classmethod
+    def nombre_provincia(cls, provincia_id):
+        return cls._tabla()['provincias'].get(provincia_id, '')
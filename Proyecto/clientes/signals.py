@@ -0,0 +1,43 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Equipo, RegistroHorometro, Provincia, Sucursal
+from .services import GeografiaService
+
+
+@receiver(post_save, sender=RegistroHorometro)
+def actualizar_ultimo_horometro(sender, instance, created, **kwargs):
+    """
+    Cada lectura nueva pasa a ser la última del equipo (fecha_registro es
+    auto_now_add). Si se corrige la lectura que ya es la última, se copian
+    sus horas al equipo.
+    """
+    if created:
+        Equipo.objects.filter(pk=instance.equipo_id).update(
+            ultimo_registro_horometro=instance,
+            ultima_hora_registrada=instance.horas,
+        )
+    else:
+        Equipo.objects.filter(pk=instance.equipo_id, ultimo_registro_horometro=instance).update(
+            ultima_hora_registrada=instance.horas,
+        )
+
+
+@receiver(post_delete, sender=RegistroHorometro)
+def recalcular_ultimo_horometro(sender, instance, **kwargs):
+    """Si se borra la última lectura, el puntero pasa a la anterior"""
+    anterior = RegistroHorometro.objects.filter(
+        equipo_id=instance.equipo_id
+    ).order_by('-fecha_registro').first()
+    Equipo.objects.filter(
+        pk=instance.equipo_id,
+        ultimo_registro_horometro__isnull=True,
+    ).update(
+        ultimo_registro_horometro=anterior,
+        ultima_hora_registrada=anterior.horas if anterior else None,
+    )
+
+
+@receiver([post_save, post_delete], sender=Provincia)
+@receiver([post_save, post_delete], sender=Sucursal)
+def invalidar_geografia(sender, **kwargs):
+    GeografiaService.invalidar()
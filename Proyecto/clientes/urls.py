@@ -6,7 +6,10 @@ from . import views
 
 urlpatterns = [
     path('clientes/', views.clientes, name='clientes'),
+    path('clientes/datos/', views.clientes_datos, name='clientes_datos'),
     path('parque/', views.parque, name='parque'),
+    path('parque/datos/', views.parque_datos, name='parque_datos'),
+    path('parque/exportar/', views.exportar_parque_csv, name='exportar_parque_csv'),
     path('guardar_cliente/', views.guardar_cliente, name='guardar_cliente'),
     path('clientes/<int:cliente_id>/', views.detalle_cliente, name='detalle_cliente'),
     path('clientes/<int:cliente_id>/detalle_equipo/<int:equipo_id>/', views.detalle_equipo, name='detalle_equipo'),
@@ -1,9 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from clientes.models import Cliente, ContactoCliente, TipoEquipo, ModeloEquipo, ModeloMotor, Equipo, RegistroHorometro, Ciudad, Provincia, Sucursal
+from clientes.models import Cliente, ContactoCliente, TipoEquipo, ModeloEquipo, ModeloMotor, Equipo
 from clientes.forms import ClienteForm, ContactoClienteForm, TipoEquipoForm, EquipoForm
+from clientes.services import GeografiaService
 from django.urls import reverse
-from django.db.models import Subquery, OuterRef
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q, Count
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+import csv
 
 @login_required
 def clientes(request):
@@ -14,39 +18,222 @@ def clientes(request):
             return redirect('clientes')  # Redirige de nuevo a la vista `clientes` después de guardar
     else:
         form = ClienteForm()
-    
 
-    # # Filtrar los clientes según la sucursal del usuario logueado
-    usuario = request.user
-    if usuario.rol in ['ADMINISTRATIVO', 'TECNICO'] and usuario.sucursal:
-        lista_clientes = Cliente.objects.filter(sucursal=usuario.sucursal)
-    else:
-        lista_clientes = Cliente.objects.all()
-
-    sucursales = Sucursal.objects.all()
-    provincias = Provincia.objects.all()
-    ciudades = Ciudad.objects.all()
+    # La tabla se carga por AJAX desde `clientes_datos`; acá solo van los totales
+    estadisticas = _clientes_visibles(request.user).aggregate(
+        total=Count('id'),
+        empresas=Count('id', filter=Q(tipo='EMPRESA')),
+        activos=Count('id', filter=Q(activo=True)),
+    )
 
     context = {
-        'clientes': lista_clientes,
+        'estadisticas': estadisticas,
         'form': form,
-        'sucursales': sucursales,
-        'provincias': provincias,
-        'ciudades': ciudades,
+        'sucursales': GeografiaService.sucursales(),
     }
 
     return render(request, 'clientes/clientes.html', context)
 
+
+def _clientes_visibles(usuario):
+    """Clientes visibles para el usuario (su sucursal si es administrativo o técnico)"""
+    clientes = Cliente.objects.all()
+    if usuario.rol in ['ADMINISTRATIVO', 'TECNICO'] and usuario.sucursal:
+        clientes = clientes.filter(sucursal=usuario.sucursal)
+    return clientes
+
+
+# Columnas de la tabla de clientes, en el orden de la plantilla, y su campo de ordenamiento
+COLUMNAS_CLIENTES = [
+    'razon_social',
+    'email',
+    'telefono',
+    'provincia__nombre',
+]
+
+
 @login_required
-def parque(request):
+def clientes_datos(request):
+    """Página del directorio de clientes (procesamiento del lado del servidor de DataTables)"""
+    clientes = _clientes_visibles(request.user)
+    total = clientes.count()
+
+    busqueda = request.GET.get('search[value]', '').strip()
+    filtrados = clientes
+    if busqueda:
+        filtrados = clientes.filter(
+            Q(razon_social__istartswith=busqueda) |
+            Q(cuit__startswith=busqueda)
+        )
+    total_filtrados = filtrados.count() if busqueda else total
 
-    usuario = request.user
+    try:
+        columna = COLUMNAS_CLIENTES[int(request.GET.get('order[0][column]', 0))]
+    except (ValueError, IndexError):
+        columna = COLUMNAS_CLIENTES[0]
+    if request.GET.get('order[0][dir]') == 'desc':
+        columna = f'-{columna}'
+
+    try:
+        inicio = max(int(request.GET.get('start', 0)), 0)
+        cantidad = min(max(int(request.GET.get('length', 25)), 1), 100)
+    except ValueError:
+        inicio, cantidad = 0, 25
+
+    pagina = filtrados.order_by(columna, 'pk').values(
+        'id', 'razon_social', 'email', 'telefono', 'provincia_id'
+    )[inicio:inicio + cantidad]
+
+    data = [
+        {
+            'id': cliente['id'],
+            'razon_social': cliente['razon_social'],
+            'email': cliente['email'],
+            'telefono': cliente['telefono'],
+            'provincia': GeografiaService.nombre_provincia(cliente['provincia_id']),
+            'url': reverse('detalle_cliente', args=[cliente['id']]),
+        }
+        for cliente in pagina
+    ]
+
+    return JsonResponse({
+        'draw': int(request.GET.get('draw', 0) or 0),
+        'recordsTotal': total,
+        'recordsFiltered': total_filtrados,
+        'data': data,
+    })
+
+
+def _equipos_parque(usuario):
+    """Equipos visibles para el usuario (su sucursal si es administrativo o técnico)"""
+    equipos = Equipo.objects.all()
     if usuario.rol in ['ADMINISTRATIVO', 'TECNICO'] and usuario.sucursal:
-        equipos =Equipo.objects.select_related('cliente').filter(cliente__sucursal=usuario.sucursal)
-    else:
-        equipos = Equipo.objects.select_related('cliente').all()
+        equipos = equipos.filter(cliente__sucursal=usuario.sucursal)
+    return equipos
+
+
+def _buscar_equipos(equipos, busqueda):
+    """Búsqueda por prefijo, para que use los índices de serie, modelo y razón social"""
+    if busqueda:
+        equipos = equipos.filter(
+            Q(numero_serie__istartswith=busqueda) |
+            Q(modelo__nombre__istartswith=busqueda) |
+            Q(cliente__razon_social__istartswith=busqueda)
+        )
+    return equipos
+
+
+# Columnas de la tabla del parque, en el orden de la plantilla, y su campo de ordenamiento
+COLUMNAS_PARQUE = [
+    'numero_serie',
+    'modelo__nombre',
+    'modelo_motor__nombre',
+    'numero_serie_motor',
+    'ultima_hora_registrada',
+    'cliente__razon_social',
+]
 
-    return render(request, 'clientes/parque_equipos/parque.html', {'equipos': equipos})
+
+@login_required
+def parque(request):
+    equipos = _equipos_parque(request.user)
+    estadisticas = equipos.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(activo=True)),
+        clientes=Count('cliente', distinct=True, filter=Q(cliente__activo=True)),
+    )
+
+    return render(request, 'clientes/parque_equipos/parque.html', {'estadisticas': estadisticas})
+
+
+@login_required
+def parque_datos(request):
+    """Página de equipos para la tabla del parque (procesamiento del lado del servidor de DataTables)"""
+    equipos = _equipos_parque(request.user)
+    total = equipos.count()
+
+    filtrados = _buscar_equipos(equipos, request.GET.get('search[value]', '').strip())
+    total_filtrados = filtrados.count() if request.GET.get('search[value]') else total
+
+    try:
+        columna = COLUMNAS_PARQUE[int(request.GET.get('order[0][column]', 0))]
+    except (ValueError, IndexError):
+        columna = COLUMNAS_PARQUE[0]
+    if request.GET.get('order[0][dir]') == 'desc':
+        columna = f'-{columna}'
+
+    try:
+        inicio = max(int(request.GET.get('start', 0)), 0)
+        cantidad = min(max(int(request.GET.get('length', 25)), 1), 100)
+    except ValueError:
+        inicio, cantidad = 0, 25
+
+    pagina = filtrados.select_related(
+        'cliente', 'modelo__tipo_equipo', 'modelo_motor', 'ultimo_registro_horometro'
+    ).order_by(columna, 'pk')[inicio:inicio + cantidad]
+
+    data = [
+        {
+            'id': equipo.id,
+            'numero_serie': equipo.numero_serie,
+            'modelo': equipo.modelo.nombre,
+            'tipo': equipo.modelo.tipo_equipo.nombre,
+            'modelo_motor': equipo.modelo_motor.nombre if equipo.modelo_motor else None,
+            'numero_serie_motor': equipo.numero_serie_motor,
+            'horas': equipo.ultima_hora_registrada,
+            'horas_fecha': (
+                timezone.localtime(equipo.ultimo_registro_horometro.fecha_registro).strftime('%d/%m/%Y')
+                if equipo.ultimo_registro_horometro else None
+            ),
+            'horas_origen': (
+                equipo.ultimo_registro_horometro.get_origen_display() if equipo.ultimo_registro_horometro else None
+            ),
+            'cliente_id': equipo.cliente_id,
+            'cliente': equipo.cliente.razon_social,
+            'url_equipo': reverse('detalle_equipo', args=[equipo.cliente_id, equipo.id]),
+            'url_cliente': reverse('detalle_cliente', args=[equipo.cliente_id]),
+        }
+        for equipo in pagina
+    ]
+
+    return JsonResponse({
+        'draw': int(request.GET.get('draw', 0) or 0),
+        'recordsTotal': total,
+        'recordsFiltered': total_filtrados,
+        'data': data,
+    })
+
+
+class _Echo:
+    """Pseudo-buffer para que csv.writer escriba directamente en la respuesta"""
+    def write(self, value):
+        return value
+
+
+@login_required
+def exportar_parque_csv(request):
+    """Exportar el parque (con la búsqueda aplicada) como CSV sin cargarlo completo en memoria"""
+    equipos = _buscar_equipos(_equipos_parque(request.user), request.GET.get('q', '').strip())
+    filas = equipos.order_by('numero_serie').values_list(
+        'numero_serie', 'modelo__tipo_equipo__nombre', 'modelo__marca', 'modelo__nombre',
+        'modelo_motor__nombre', 'numero_serie_motor', 'año_fabricacion',
+        'ultima_hora_registrada', 'cliente__razon_social', 'cliente__cuit',
+    )
+
+    writer = csv.writer(_Echo())
+    encabezado = [
+        'PIN', 'Tipo', 'Marca', 'Modelo', 'Modelo Motor', 'Serie Motor',
+        'Año Fabricación', 'Horas', 'Cliente', 'CUIT',
+    ]
+
+    def generar():
+        yield writer.writerow(encabezado)
+        for fila in filas.iterator(chunk_size=2000):
+            yield writer.writerow(fila)
+
+    response = StreamingHttpResponse(generar(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="parque_equipos_{timezone.localdate():%Y%m%d}.csv"'
+    return response
 
 @login_required
 def guardar_cliente(request):
@@ -64,12 +251,8 @@ def detalle_cliente(request, cliente_id):
     cliente = get_object_or_404(Cliente, pk=cliente_id)
     contactos = ContactoCliente.objects.filter(cliente=cliente)
 
-    equipos = Equipo.objects.filter(cliente=cliente).annotate(
-        ultimo_horometro=Subquery(
-            RegistroHorometro.objects.filter(
-                equipo=OuterRef('pk')
-            ).order_by('-fecha_registro').values('horas')[:1]
-        )
+    equipos = Equipo.objects.filter(cliente=cliente).select_related(
+        'modelo__tipo_equipo', 'modelo_motor', 'ultimo_registro_horometro'
     )
 
     # Inicializar ambos formularios
@@ -117,23 +300,16 @@ def detalle_cliente(request, cliente_id):
 
     return render(request, 'clientes/detalle_cliente.html', context)
 
-from django.db.models import Subquery, OuterRef
 from django.shortcuts import get_object_or_404, render
-from .models import Cliente, Equipo, RegistroHorometro
+from .models import Cliente, Equipo
 from gestionDeTaller.models import Servicio
 
 @login_required
 def detalle_equipo(request, cliente_id, equipo_id):
     cliente = get_object_or_404(Cliente, pk=cliente_id)
-    equipo = get_object_or_404(Equipo, pk=equipo_id)
-    
-    # Obtener el último horómetro
-    horas = Equipo.objects.filter(cliente=cliente).annotate(
-        ultimo_horometro=Subquery(
-            RegistroHorometro.objects.filter(
-                equipo=OuterRef('pk')
-            ).order_by('-fecha_registro').values('horas')[:1]
-        )
+    equipo = get_object_or_404(
+        Equipo.objects.select_related('cliente', 'modelo__tipo_equipo', 'modelo_motor', 'ultimo_registro_horometro'),
+        pk=equipo_id
     )
 
     # Obtener los servicios asociados al equipo
@@ -142,7 +318,6 @@ def detalle_equipo(request, cliente_id, equipo_id):
     context = {
         'equipo': equipo,
         'cliente': cliente,
-        'horas': horas,
         'servicios': servicios,  # Pasar los servicios al contexto
     }
 
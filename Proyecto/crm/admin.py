@@ -4,7 +4,8 @@ from django.urls import reverse
 from django.utils import timezone
 from .models import (
     Campania, Contacto, AnalisisCliente, PaqueteServicio, ClientePaquete,
-    Campana, EmbudoVentas, ContactoCliente, SugerenciaMejora, PotencialCompraModelo
+    Campana, EmbudoVentas, ContactoCliente, SugerenciaMejora, PotencialCompraModelo, CambioEtapaEmbudo,
+    RendimientoDiarioCampana, OportunidadVenta
 )
 
 # ============================================================================
@@ -50,6 +51,41 @@ class CampanaAdmin(admin.ModelAdmin):
         return "-"
     presupuesto_display.short_description = 'Presupuesto'
 
+
+@admin.register(RendimientoDiarioCampana)
+class RendimientoDiarioCampanaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'campania', 'campana', 'contactos', 'ventas', 'ventas_perdidas', 'valor_ventas']
+    list_filter = ['fecha']
+    list_select_related = ['campania', 'campana']
+    date_hierarchy = 'fecha'
+
+    def has_add_permission(self, request):
+        # Las filas las genera el comando actualizar_rendimiento_campanas
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OportunidadVenta)
+class OportunidadVentaAdmin(admin.ModelAdmin):
+    list_display = ['cliente', 'tipo', 'segmento', 'puntaje', 'estado', 'ultimo_servicio', 'fecha_actualizacion']
+    list_filter = ['tipo', 'segmento', 'estado']
+    search_fields = ['cliente__razon_social']
+    list_select_related = ['cliente']
+    raw_id_fields = ['cliente', 'embudo']
+    readonly_fields = ['fecha_deteccion', 'fecha_actualizacion']
+
+class CambioEtapaEmbudoInline(admin.TabularInline):
+    model = CambioEtapaEmbudo
+    extra = 0
+    can_delete = False
+    fields = ['fecha', 'etapa_anterior', 'etapa_nueva', 'duracion_segundos', 'usuario']
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(EmbudoVentas)
 class EmbudoVentasAdmin(admin.ModelAdmin):
     list_display = [
@@ -65,8 +101,13 @@ class EmbudoVentasAdmin(admin.ModelAdmin):
         'fecha_creacion', 'fecha_modificacion', 'fecha_ingreso', 'fecha_ultima_actividad'
     ]
     
+    inlines = [CambioEtapaEmbudoInline]
     actions = ['mover_a_etapa']
     
+    def save_model(self, request, obj, form, change):
+        obj._usuario_cambio = request.user
+        super().save_model(request, obj, form, change)
+    
     def etapa_badge(self, obj):
         colors = {
             'CONTACTO_INICIAL': 'primary',
@@ -106,7 +147,13 @@ class EmbudoVentasAdmin(admin.ModelAdmin):
     valor_estimado_display.short_description = 'Valor Estimado'
     
     def mover_a_etapa(self, request, queryset):
-        updated = queryset.update(etapa='CALIFICACION')
+        # Uno por uno, para que quede registrado cada cambio de etapa
+        updated = 0
+        for embudo in queryset.exclude(etapa='CALIFICACION'):
+            embudo.etapa = 'CALIFICACION'
+            embudo._usuario_cambio = request.user
+            embudo.save()
+            updated += 1
         self.message_user(request, f'{updated} embudos movidos a Calificación.')
     mover_a_etapa.short_description = "Mover a Calificación"
 
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from crm.services import RendimientoCampanasService
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el rendimiento diario de las campañas (pensado para ejecutarse cada hora o una vez por día)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Recalcular desde esta fecha (AAAA-MM-DD); por defecto, los últimos días'
+        )
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Recalcular todo el historial'
+        )
+
+    def handle(self, *args, **options):
+        if options['reconstruir']:
+            filas = RendimientoCampanasService().actualizar()
+        elif options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('La fecha debe tener el formato AAAA-MM-DD')
+            filas = RendimientoCampanasService(desde=desde).actualizar()
+        else:
+            filas = RendimientoCampanasService.actualizar_recientes()
+
+        self.stdout.write(self.style.SUCCESS(f'Filas de rendimiento diario actualizadas: {filas}'))
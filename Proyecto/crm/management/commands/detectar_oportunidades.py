@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from crm.services import DeteccionOportunidadesService
+from recursosHumanos.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Detecta clientes inactivos, bajistas o sin paquete y actualiza las oportunidades de venta (pensado para ejecutarse una vez por día)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--crear-embudos',
+            action='store_true',
+            help='Crear un embudo de ventas para las oportunidades con puntaje alto'
+        )
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que figura como creador de los embudos'
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+            if not usuario:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        resultado = DeteccionOportunidadesService(usuario=usuario).detectar(crear_embudos=options['crear_embudos'])
+
+        self.stdout.write(f"Oportunidades nuevas: {resultado['nuevas']}")
+        self.stdout.write(f"Oportunidades actualizadas: {resultado['actualizadas']}")
+        self.stdout.write(f"Oportunidades cerradas: {resultado['cerradas']}")
+        if options['crear_embudos']:
+            self.stdout.write(f"Embudos creados: {resultado['embudos']}")
+        self.stdout.write(self.style.SUCCESS('Detección de oportunidades finalizada'))
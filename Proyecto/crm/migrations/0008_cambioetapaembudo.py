@@ -0,0 +1,57 @@
+# Generated by Django 4.2.2 on 2026-10-19 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def registrar_etapa_actual(apps, schema_editor):
+    """
+    Los embudos existentes no tienen historial: se registra solo su ingreso,
+    directamente en la etapa en que están hoy.
+    """
+    EmbudoVentas = apps.get_model('crm', 'EmbudoVentas')
+    CambioEtapaEmbudo = apps.get_model('crm', 'CambioEtapaEmbudo')
+    embudos = EmbudoVentas.objects.values_list('id', 'cliente__sucursal_id', 'etapa', 'fecha_ingreso')
+    CambioEtapaEmbudo.objects.bulk_create(
+        [
+            CambioEtapaEmbudo(
+                embudo_id=embudo_id, sucursal_id=sucursal_id, etapa_anterior='', etapa_nueva=etapa, fecha=fecha_ingreso
+            )
+            for embudo_id, sucursal_id, etapa, fecha_ingreso in embudos.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursosHumanos', '0014_sucursal_ubicacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('crm', '0007_remove_probabilidad_cierre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioEtapaEmbudo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etapa_anterior', models.CharField(blank=True, choices=[('CONTACTO_INICIAL', 'Contacto Inicial'), ('CALIFICACION', 'Calificación'), ('PROPUESTA', 'Propuesta'), ('NEGOCIACION', 'Negociación'), ('CIERRE', 'Cierre'), ('PERDIDO', 'Perdido')], max_length=20, verbose_name='Etapa Anterior')),
+                ('etapa_nueva', models.CharField(choices=[('CONTACTO_INICIAL', 'Contacto Inicial'), ('CALIFICACION', 'Calificación'), ('PROPUESTA', 'Propuesta'), ('NEGOCIACION', 'Negociación'), ('CIERRE', 'Cierre'), ('PERDIDO', 'Perdido')], max_length=20, verbose_name='Etapa Nueva')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('duracion_segundos', models.BigIntegerField(blank=True, null=True, verbose_name='Duración en la Etapa Anterior (segundos)')),
+                ('embudo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios_etapa', to='crm.embudoventas', verbose_name='Embudo')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recursosHumanos.sucursal', verbose_name='Sucursal')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Etapa de Embudo',
+                'verbose_name_plural': 'Cambios de Etapa de Embudos',
+                'ordering': ['embudo', 'fecha'],
+                'indexes': [models.Index(fields=['sucursal', 'etapa_nueva', 'fecha'], name='crm_cambioe_sucursa_22baff_idx'), models.Index(fields=['sucursal', 'etapa_anterior', 'fecha'], name='crm_cambioe_sucursa_ef686c_idx'), models.Index(fields=['embudo', 'fecha'], name='crm_cambioe_embudo__eb55d5_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_etapa_actual, migrations.RunPython.noop),
+    ]
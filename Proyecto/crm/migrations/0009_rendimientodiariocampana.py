@@ -0,0 +1,41 @@
+# Generated by Django 4.2.2 on 2026-10-19 17:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0008_cambioetapaembudo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RendimientoDiarioCampana',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('contactos', models.PositiveIntegerField(default=0, verbose_name='Contactos')),
+                ('ventas', models.PositiveIntegerField(default=0, verbose_name='Ventas')),
+                ('ventas_perdidas', models.PositiveIntegerField(default=0, verbose_name='Ventas Perdidas')),
+                ('valor_ventas', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valor Vendido')),
+                ('campana', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rendimiento_diario', to='crm.campana', verbose_name='Campaña de Ventas')),
+                ('campania', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rendimiento_diario', to='crm.campania', verbose_name='Campaña de Marketing')),
+            ],
+            options={
+                'verbose_name': 'Rendimiento Diario de Campaña',
+                'verbose_name_plural': 'Rendimiento Diario de Campañas',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='crm_rendimi_fecha_5b64c8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rendimientodiariocampana',
+            constraint=models.UniqueConstraint(fields=('campania', 'fecha'), name='rendimiento_campania_fecha_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='rendimientodiariocampana',
+            constraint=models.UniqueConstraint(fields=('campana', 'fecha'), name='rendimiento_campana_fecha_unico'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.2 on 2026-10-19 17:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0012_cliente_clientes_cl_razon_s_eb90c9_idx_and_more'),
+        ('crm', '0009_rendimientodiariocampana'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OportunidadVenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INACTIVO', 'Cliente Inactivo'), ('BAJISTA', 'Comportamiento Bajista'), ('SIN_PAQUETE', 'Sin Paquete Activo')], max_length=20, verbose_name='Tipo')),
+                ('estado', models.CharField(choices=[('ABIERTA', 'Abierta'), ('EN_EMBUDO', 'En Embudo de Ventas'), ('CERRADA', 'Cerrada')], default='ABIERTA', max_length=20, verbose_name='Estado')),
+                ('segmento', models.CharField(choices=[('A', 'Segmento A'), ('B', 'Segmento B'), ('C', 'Segmento C'), ('NUEVO', 'Nuevo')], default='NUEVO', max_length=10, verbose_name='Segmento')),
+                ('puntaje', models.DecimalField(decimal_places=1, default=0, max_digits=5, verbose_name='Puntaje')),
+                ('ultimo_servicio', models.DateField(blank=True, null=True, verbose_name='Último Servicio')),
+                ('equipos_activos', models.PositiveIntegerField(default=0, verbose_name='Equipos Activos')),
+                ('facturacion', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Facturación Últimos 2 Años')),
+                ('fecha_deteccion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Detección')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='oportunidades', to='clientes.cliente', verbose_name='Cliente')),
+                ('embudo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='oportunidades', to='crm.embudoventas', verbose_name='Embudo de Ventas')),
+            ],
+            options={
+                'verbose_name': 'Oportunidad de Venta',
+                'verbose_name_plural': 'Oportunidades de Venta',
+                'ordering': ['-puntaje'],
+                'indexes': [models.Index(fields=['estado', '-puntaje'], name='crm_oportun_estado_2c51bb_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='oportunidadventa',
+            constraint=models.UniqueConstraint(fields=('cliente', 'tipo'), name='oportunidad_cliente_tipo_unica'),
+        ),
+    ]
@@ -2,13 +2,31 @@ from django.db import models
 from gestionDeTaller.models import Servicio
 from clientes.models import Cliente, ModeloEquipo
 from recursosHumanos.models import Usuario, Sucursal
-from django.db.models import Sum, F, DecimalField
+from django.db.models import Sum, F, DecimalField, Count, Q, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
 from django.core.exceptions import ValidationError
 
 
 # Create your models here.
+class CampaniaQuerySet(models.QuerySet):
+    def con_metricas(self):
+        """Anota contactos, resultados y valor vendido de cada campaña en la misma consulta"""
+        return self.annotate(
+            contactos_count=Count('contactos'),
+            ventas_exitosas=Count('contactos', filter=Q(contactos__resultado='VENTA_EXITOSA')),
+            ventas_perdidas=Count('contactos', filter=Q(contactos__resultado='VENTA_PERDIDA')),
+            pendientes=Count('contactos', filter=Q(contactos__resultado='PENDIENTE')),
+            reprogramados=Count('contactos', filter=Q(contactos__resultado='REPROGRAMADO')),
+            valor_ventas=Coalesce(
+                Sum('contactos__valor_venta', filter=Q(contactos__resultado='VENTA_EXITOSA')),
+                Value(0),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+
+
 class Campania(models.Model):
     ESTADO_CHOICES = [
         ('PLANIFICADA', 'Planificada'),
@@ -24,6 +42,8 @@ class Campania(models.Model):
     objetivo_paquetes = models.IntegerField()
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES)
 
+    objects = CampaniaQuerySet.as_manager()
+
     def clean(self):
         if self.fecha_fin < self.fecha_inicio:
             raise ValidationError('La fecha de fin no puede ser anterior a la fecha de inicio')
@@ -35,9 +55,19 @@ class Campania(models.Model):
     def get_objetivo_usd(self):
         return self.valor_paquete * self.objetivo_paquetes
     
+    # Los get_* usan los valores de con_metricas() si la campaña viene anotada
+    def get_ventas_exitosas(self):
+        if hasattr(self, 'ventas_exitosas'):
+            return self.ventas_exitosas
+        return self.contactos.filter(resultado='VENTA_EXITOSA').count()
+
     def get_cumplimiento(self):
-        ventas = self.contactos.filter(resultado='VENTA_EXITOSA').count()
+        ventas = self.get_ventas_exitosas()
         return (ventas / self.objetivo_paquetes) * 100 if self.objetivo_paquetes else 0
+
+    def get_tasa_conversion(self):
+        contactos = self.contactos_count if hasattr(self, 'contactos_count') else self.contactos.count()
+        return (self.get_ventas_exitosas() / contactos * 100) if contactos else 0
     
 
 class Contacto(models.Model):
@@ -164,6 +194,20 @@ class ClientePaquete(models.Model):
 
 
 # Nuevos modelos para el Embudo de Ventas
+class CampanaQuerySet(models.QuerySet):
+    def con_metricas(self):
+        """Anota embudos, cierres y valor cerrado de cada campaña en la misma consulta"""
+        return self.annotate(
+            total_contactos=Count('embudos_ventas'),
+            total_ventas=Count('embudos_ventas', filter=Q(embudos_ventas__etapa='CIERRE')),
+            valor_ventas=Coalesce(
+                Sum('embudos_ventas__valor_estimado', filter=Q(embudos_ventas__etapa='CIERRE')),
+                Value(0),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+
+
 class Campana(models.Model):
     """Modelo para campañas de marketing y ventas"""
     
@@ -197,6 +241,8 @@ class Campana(models.Model):
         verbose_name="Creado por"
     )
     
+    objects = CampanaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Campaña"
         verbose_name_plural = "Campañas"
@@ -205,16 +251,23 @@ class Campana(models.Model):
     def __str__(self):
         return f"{self.nombre} - {self.sucursal.nombre}"
     
+    # Los get_* usan los valores de con_metricas() si la campaña viene anotada
     def get_contactos_count(self):
         """Retorna el número total de contactos de esta campaña"""
+        if hasattr(self, 'total_contactos'):
+            return self.total_contactos
         return self.embudos_ventas.count()
     
     def get_ventas_count(self):
         """Retorna el número de ventas convertidas"""
+        if hasattr(self, 'total_ventas'):
+            return self.total_ventas
         return self.embudos_ventas.filter(etapa='CIERRE').count()
     
     def get_valor_total_ventas(self):
         """Retorna el valor total de las ventas convertidas"""
+        if hasattr(self, 'valor_ventas'):
+            return self.valor_ventas
         return self.embudos_ventas.filter(etapa='CIERRE').aggregate(
             total=models.Sum('valor_estimado')
         )['total'] or 0
@@ -342,6 +395,142 @@ class EmbudoVentas(models.Model):
         return Decimal('0')
 
 
+class CambioEtapaEmbudo(models.Model):
+    """
+    Historial de etapas de cada embudo de ventas: una fila al crearse (sin
+    etapa anterior) y otra por cada cambio de etapa. La duración es el tiempo
+    que el embudo pasó en la etapa anterior. Lo registran las señales de
+    EmbudoVentas.
+    """
+
+    embudo = models.ForeignKey(EmbudoVentas, on_delete=models.CASCADE, related_name='cambios_etapa', verbose_name="Embudo")
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='+', verbose_name="Sucursal")
+    etapa_anterior = models.CharField(
+        max_length=20, choices=EmbudoVentas.ETAPA_CHOICES, blank=True, verbose_name="Etapa Anterior"
+    )
+    etapa_nueva = models.CharField(max_length=20, choices=EmbudoVentas.ETAPA_CHOICES, verbose_name="Etapa Nueva")
+    fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+    duracion_segundos = models.BigIntegerField(
+        null=True, blank=True, verbose_name="Duración en la Etapa Anterior (segundos)"
+    )
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Usuario"
+    )
+
+    class Meta:
+        verbose_name = "Cambio de Etapa de Embudo"
+        verbose_name_plural = "Cambios de Etapa de Embudos"
+        ordering = ['embudo', 'fecha']
+        indexes = [
+            models.Index(fields=['sucursal', 'etapa_nueva', 'fecha']),
+            models.Index(fields=['sucursal', 'etapa_anterior', 'fecha']),
+            models.Index(fields=['embudo', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"Embudo {self.embudo_id}: {self.etapa_anterior or 'Ingreso'} → {self.etapa_nueva}"
+
+
+class RendimientoDiarioCampana(models.Model):
+    """
+    Resumen diario de cada campaña para los gráficos históricos. Cada fila
+    es de una Campania (contactos de marketing) o de una Campana (embudos de
+    ventas). La mantiene RendimientoCampanasService.
+    """
+
+    fecha = models.DateField(verbose_name="Fecha")
+    campania = models.ForeignKey(
+        Campania, on_delete=models.CASCADE, null=True, blank=True, related_name='rendimiento_diario',
+        verbose_name="Campaña de Marketing"
+    )
+    campana = models.ForeignKey(
+        Campana, on_delete=models.CASCADE, null=True, blank=True, related_name='rendimiento_diario',
+        verbose_name="Campaña de Ventas"
+    )
+    contactos = models.PositiveIntegerField(default=0, verbose_name="Contactos")
+    ventas = models.PositiveIntegerField(default=0, verbose_name="Ventas")
+    ventas_perdidas = models.PositiveIntegerField(default=0, verbose_name="Ventas Perdidas")
+    valor_ventas = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Valor Vendido")
+
+    class Meta:
+        verbose_name = "Rendimiento Diario de Campaña"
+        verbose_name_plural = "Rendimiento Diario de Campañas"
+        ordering = ['fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['campania', 'fecha'], name='rendimiento_campania_fecha_unico'),
+            models.UniqueConstraint(fields=['campana', 'fecha'], name='rendimiento_campana_fecha_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.campania or self.campana} - {self.fecha:%d/%m/%Y}"
+
+
+class OportunidadVenta(models.Model):
+    """
+    Oportunidad de venta detectada sobre la actividad del cliente: inactivo,
+    con comportamiento bajista o sin paquete activo. Hay una fila por
+    cliente y tipo; la mantiene DeteccionOportunidadesService.
+    """
+
+    TIPO_CHOICES = [
+        ('INACTIVO', 'Cliente Inactivo'),
+        ('BAJISTA', 'Comportamiento Bajista'),
+        ('SIN_PAQUETE', 'Sin Paquete Activo'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('ABIERTA', 'Abierta'),
+        ('EN_EMBUDO', 'En Embudo de Ventas'),
+        ('CERRADA', 'Cerrada'),
+    ]
+
+    SEGMENTO_CHOICES = [
+        ('A', 'Segmento A'),
+        ('B', 'Segmento B'),
+        ('C', 'Segmento C'),
+        ('NUEVO', 'Nuevo'),
+    ]
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='oportunidades', verbose_name="Cliente")
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='ABIERTA', verbose_name="Estado")
+    segmento = models.CharField(max_length=10, choices=SEGMENTO_CHOICES, default='NUEVO', verbose_name="Segmento")
+    puntaje = models.DecimalField(max_digits=5, decimal_places=1, default=0, verbose_name="Puntaje")
+    ultimo_servicio = models.DateField(null=True, blank=True, verbose_name="Último Servicio")
+    equipos_activos = models.PositiveIntegerField(default=0, verbose_name="Equipos Activos")
+    facturacion = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Facturación Últimos 2 Años"
+    )
+    embudo = models.ForeignKey(
+        EmbudoVentas, on_delete=models.SET_NULL, null=True, blank=True, related_name='oportunidades',
+        verbose_name="Embudo de Ventas"
+    )
+    fecha_deteccion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Detección")
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+
+    class Meta:
+        verbose_name = "Oportunidad de Venta"
+        verbose_name_plural = "Oportunidades de Venta"
+        ordering = ['-puntaje']
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'tipo'], name='oportunidad_cliente_tipo_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', '-puntaje']),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente.razon_social} - {self.get_tipo_display()} ({self.puntaje})"
+
+
 class ContactoCliente(models.Model):
     """Modelo para registrar contactos con clientes"""
     
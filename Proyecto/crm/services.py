@@ -0,0 +1,915 @@
+"""
+Servicios de análisis comercial del CRM
+"""
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from clientes.models import Cliente, Equipo
+from gestionDeTaller.models import GastoAsistencia, Servicio, VentaRepuesto
+from .models import (
+    CambioEtapaEmbudo, ClientePaquete, Contacto, EmbudoVentas, OportunidadVenta, RendimientoDiarioCampana
+)
+
+
+class EmbudoAnaliticaService:
+    """
+    Conversión y velocidad del embudo de ventas, calculadas sobre el
+    historial de etapas (CambioEtapaEmbudo) con consultas agrupadas:
+
+    - Conversión etapa a etapa: un embudo alcanzó una etapa si pasó por ella
+      o por alguna posterior (las etapas salteadas cuentan como alcanzadas).
+    - Tasa de cierre: ganados sobre decididos (ganados + perdidos); los
+      negocios abiertos no entran en el denominador.
+    - Días por etapa: mediana y promedio del tiempo en cada etapa, y ciclo de
+      venta desde el ingreso hasta el cierre.
+    - Cohortes por mes de ingreso: cuántos embudos de cada mes se ganaron,
+      perdieron o siguen abiertos.
+
+    El tablero se cachea por sucursal; cada cambio de etapa invalida el de su
+    sucursal. El período se limita a MESES_MAX meses.
+    """
+
+    ETAPAS_AVANCE = ['CONTACTO_INICIAL', 'CALIFICACION', 'PROPUESTA', 'NEGOCIACION', 'CIERRE']
+    MESES = 12
+    MESES_MAX = 120
+    CACHE_TTL = 600
+    CACHE_KEY = 'crm:embudo:{}:{}:{}'
+    CACHE_KEY_VERSION = 'crm:embudo:version:{}'
+
+    def __init__(self, sucursal=None, meses=None):
+        self.sucursal = sucursal
+        self.meses = min(meses or self.MESES, self.MESES_MAX)
+        self.desde = timezone.now() - timedelta(days=30 * self.meses)
+
+    @staticmethod
+    def registrar_cambio(embudo, etapa_anterior, usuario=None):
+        """Registrar el ingreso (etapa_anterior vacía) o un cambio de etapa del embudo"""
+        ahora = timezone.now()
+        duracion = None
+        if etapa_anterior:
+            inicio = CambioEtapaEmbudo.objects.filter(embudo=embudo).order_by('-fecha').values_list(
+                'fecha', flat=True
+            ).first() or embudo.fecha_ingreso
+            duracion = int((ahora - inicio).total_seconds())
+        return CambioEtapaEmbudo.objects.create(
+            embudo=embudo,
+            sucursal_id=Cliente.objects.filter(pk=embudo.cliente_id).values_list('sucursal_id', flat=True).first(),
+            etapa_anterior=etapa_anterior or '',
+            etapa_nueva=embudo.etapa,
+            fecha=ahora,
+            duracion_segundos=duracion,
+            usuario=usuario,
+        )
+
+    @classmethod
+    def version(cls, sucursal_id):
+        clave = cls.CACHE_KEY_VERSION.format(sucursal_id or 'todas')
+        version = cache.get(clave)
+        if version is None:
+            cache.add(clave, time.time_ns(), None)
+            version = cache.get(clave)
+        return version
+
+    @classmethod
+    def invalidar(cls, sucursal_id):
+        """Invalidar el tablero de la sucursal y el consolidado de todas"""
+        for clave in (sucursal_id, 'todas'):
+            try:
+                cache.incr(cls.CACHE_KEY_VERSION.format(clave))
+            except ValueError:
+                cache.set(cls.CACHE_KEY_VERSION.format(clave), time.time_ns(), None)
+
+    def _embudos(self):
+        embudos = EmbudoVentas.objects.all()
+        if self.sucursal:
+            embudos = embudos.filter(cliente__sucursal=self.sucursal)
+        return embudos
+
+    def _cambios(self):
+        """Historial de los embudos que ingresaron en el período"""
+        cambios = CambioEtapaEmbudo.objects.filter(embudo__fecha_ingreso__gte=self.desde)
+        if self.sucursal:
+            cambios = cambios.filter(sucursal=self.sucursal)
+        return cambios
+
+    @staticmethod
+    def tasa_cierre(embudos):
+        """Porcentaje de embudos ganados sobre los ya decididos (ganados + perdidos)"""
+        totales = embudos.aggregate(
+            ganados=Count('id', filter=Q(etapa='CIERRE')),
+            perdidos=Count('id', filter=Q(etapa='PERDIDO')),
+        )
+        decididos = totales['ganados'] + totales['perdidos']
+        return round(totales['ganados'] / decididos * 100, 1) if decididos else 0
+
+    def conversion(self):
+        """Embudos que alcanzaron cada etapa y porcentaje que pasó a la siguiente"""
+        cambios = self._cambios()
+        agregados = {
+            etapa: Count('embudo', distinct=True, filter=Q(etapa_nueva__in=self.ETAPAS_AVANCE[indice:]))
+            for indice, etapa in enumerate(self.ETAPAS_AVANCE)
+        }
+        agregados['PERDIDO'] = Count('embudo', distinct=True, filter=Q(etapa_nueva='PERDIDO'))
+        alcanzaron = cambios.aggregate(**agregados)
+        perdidos_en = dict(
+            cambios.filter(etapa_nueva='PERDIDO').values('etapa_anterior').annotate(
+                total=Count('embudo', distinct=True)
+            ).values_list('etapa_anterior', 'total')
+        )
+
+        nombres = dict(EmbudoVentas.ETAPA_CHOICES)
+        etapas = []
+        for indice, etapa in enumerate(self.ETAPAS_AVANCE):
+            siguiente = self.ETAPAS_AVANCE[indice + 1] if indice + 1 < len(self.ETAPAS_AVANCE) else None
+            total = alcanzaron[etapa]
+            pasaron = alcanzaron[siguiente] if siguiente else None
+            etapas.append({
+                'etapa': etapa,
+                'nombre': nombres[etapa],
+                'alcanzaron': total,
+                'pasaron': pasaron,
+                'perdidos': perdidos_en.get(etapa, 0),
+                'tasa': round(pasaron / total * 100, 1) if siguiente and total else None,
+            })
+
+        ingresados = alcanzaron[self.ETAPAS_AVANCE[0]] + perdidos_en.get('', 0)
+        ganados = alcanzaron['CIERRE']
+        decididos = ganados + alcanzaron['PERDIDO']
+        return {
+            'etapas': etapas,
+            'ingresados': ingresados,
+            'ganados': ganados,
+            'perdidos': alcanzaron['PERDIDO'],
+            'tasa_cierre': round(ganados / decididos * 100, 1) if decididos else 0,
+            'tasa_global': round(ganados / ingresados * 100, 1) if ingresados else 0,
+        }
+
+    def velocidad(self):
+        """Mediana y promedio de días en cada etapa, y ciclo de venta hasta el cierre"""
+        duraciones = pd.DataFrame(
+            list(
+                self._cambios().exclude(etapa_anterior='').filter(duracion_segundos__isnull=False).values_list(
+                    'etapa_anterior', 'duracion_segundos'
+                )
+            ),
+            columns=['etapa', 'segundos'],
+        )
+        duraciones['dias'] = duraciones['segundos'] / 86400
+        por_etapa = duraciones.groupby('etapa')['dias'].agg(['count', 'median', 'mean'])
+
+        nombres = dict(EmbudoVentas.ETAPA_CHOICES)
+        etapas = []
+        for etapa in self.ETAPAS_AVANCE[:-1]:
+            fila = por_etapa.loc[etapa] if etapa in por_etapa.index else None
+            etapas.append({
+                'etapa': etapa,
+                'nombre': nombres[etapa],
+                'cantidad': int(fila['count']) if fila is not None else 0,
+                'mediana_dias': round(float(fila['median']), 1) if fila is not None else None,
+                'promedio_dias': round(float(fila['mean']), 1) if fila is not None else None,
+            })
+
+        cierres = pd.DataFrame(
+            list(self._cambios().filter(etapa_nueva='CIERRE').values_list('fecha', 'embudo__fecha_ingreso')),
+            columns=['fecha', 'ingreso'],
+        )
+        ciclo = (cierres['fecha'] - cierres['ingreso']).dt.total_seconds() / 86400 if not cierres.empty else None
+        return {
+            'etapas': etapas,
+            'ciclo_mediana_dias': round(float(ciclo.median()), 1) if ciclo is not None else None,
+            'ciclo_promedio_dias': round(float(ciclo.mean()), 1) if ciclo is not None else None,
+        }
+
+    def cohortes(self):
+        """Embudos por mes de ingreso con su resultado hasta hoy"""
+        importe = DecimalField(max_digits=14, decimal_places=2)
+        filas = list(
+            self._embudos().filter(fecha_ingreso__gte=self.desde).annotate(
+                mes=TruncMonth('fecha_ingreso')
+            ).values('mes').annotate(
+                total=Count('id'),
+                ganados=Count('id', filter=Q(etapa='CIERRE')),
+                perdidos=Count('id', filter=Q(etapa='PERDIDO')),
+                valor_ganado=Coalesce(Sum('valor_cierre', filter=Q(etapa='CIERRE')), Value(0), output_field=importe),
+            ).order_by('mes')
+        )
+        for fila in filas:
+            fila['abiertos'] = fila['total'] - fila['ganados'] - fila['perdidos']
+            decididos = fila['ganados'] + fila['perdidos']
+            fila['tasa_cierre'] = round(fila['ganados'] / decididos * 100, 1) if decididos else None
+        return filas
+
+    def resumen(self):
+        """Totales del embudo actual por etapa, origen y campaña"""
+        embudos = self._embudos()
+        importe = DecimalField(max_digits=14, decimal_places=2)
+        por_etapa = {
+            fila['etapa']: fila
+            for fila in embudos.values('etapa').annotate(total=Count('id'), valor_total=Sum('valor_estimado'))
+        }
+        totales = embudos.aggregate(
+            total=Count('id'),
+            valor_estimado=Coalesce(Sum('valor_estimado'), Value(0), output_field=importe),
+            valor_cierre=Coalesce(Sum('valor_cierre'), Value(0), output_field=importe),
+            ganados=Count('id', filter=Q(etapa='CIERRE')),
+            perdidos=Count('id', filter=Q(etapa='PERDIDO')),
+        )
+        decididos = totales['ganados'] + totales['perdidos']
+        totales['tasa_cierre'] = round(totales['ganados'] / decididos * 100, 1) if decididos else 0
+        return {
+            'totales': totales,
+            'por_etapa': por_etapa,
+            'origenes': list(
+                embudos.values('origen').annotate(total=Count('id'), valor_total=Sum('valor_estimado')).order_by('-total')
+            ),
+            'campanas': list(
+                embudos.filter(campana__isnull=False).values('campana__nombre', 'campana__id').annotate(
+                    total=Count('id'), valor_total=Sum('valor_estimado')
+                ).order_by('-total')
+            ),
+        }
+
+    def tablero(self):
+        """Resumen, conversión, velocidad y cohortes, cacheados por sucursal"""
+        sucursal_id = self.sucursal.pk if self.sucursal else None
+        clave = self.CACHE_KEY.format(sucursal_id or 'todas', self.version(sucursal_id), self.meses)
+        datos = cache.get(clave)
+        if datos is None:
+            datos = {
+                'resumen': self.resumen(),
+                'conversion': self.conversion(),
+                'velocidad': self.velocidad(),
+                'cohortes': self.cohortes(),
+                'calculado': timezone.now(),
+            }
+            cache.set(clave, datos, self.CACHE_TTL)
+        return datos
+
+
+class RendimientoCampanasService:
+    """
+    Mantiene RendimientoDiarioCampana, el resumen diario de cada campaña.
+
+    Campañas de marketing (Campania): contactos por fecha de contacto, y
+    ventas exitosas, perdidas y valor vendido.
+    Campañas de ventas (Campana): embudos por fecha de ingreso, y cierres y
+    pérdidas por la fecha en que el embudo llegó a esa etapa según el
+    historial de etapas.
+
+    Cada corrida recalcula los últimos días con consultas agrupadas y
+    reemplaza esas filas; los gráficos históricos leen solo la tabla.
+    """
+
+    DIAS_RECALCULO = 7
+
+    def __init__(self, desde=None):
+        self.desde = desde
+
+    def _filas_campanias(self):
+        contactos = Contacto.objects.filter(campania__isnull=False)
+        if self.desde:
+            contactos = contactos.filter(fecha_contacto__date__gte=self.desde)
+        return contactos.annotate(dia=TruncDate('fecha_contacto')).values('campania', 'dia').annotate(
+            contactos=Count('id'),
+            ventas=Count('id', filter=Q(resultado='VENTA_EXITOSA')),
+            ventas_perdidas=Count('id', filter=Q(resultado='VENTA_PERDIDA')),
+            valor_ventas=Sum('valor_venta', filter=Q(resultado='VENTA_EXITOSA')),
+        ).order_by()
+
+    def _filas_campanas(self):
+        embudos = EmbudoVentas.objects.filter(campana__isnull=False)
+        cambios = CambioEtapaEmbudo.objects.filter(
+            embudo__campana__isnull=False, etapa_nueva__in=['CIERRE', 'PERDIDO']
+        )
+        if self.desde:
+            embudos = embudos.filter(fecha_ingreso__date__gte=self.desde)
+            cambios = cambios.filter(fecha__date__gte=self.desde)
+
+        filas = {}
+        for fila in embudos.annotate(dia=TruncDate('fecha_ingreso')).values('campana', 'dia').annotate(
+            contactos=Count('id')
+        ).order_by():
+            filas[(fila['campana'], fila['dia'])] = {'contactos': fila['contactos']}
+        for fila in cambios.annotate(dia=TruncDate('fecha')).values('embudo__campana', 'dia').annotate(
+            ventas=Count('embudo', distinct=True, filter=Q(etapa_nueva='CIERRE')),
+            ventas_perdidas=Count('embudo', distinct=True, filter=Q(etapa_nueva='PERDIDO')),
+            valor_ventas=Sum('embudo__valor_estimado', filter=Q(etapa_nueva='CIERRE')),
+        ).order_by():
+            filas.setdefault((fila['embudo__campana'], fila['dia']), {}).update(
+                ventas=fila['ventas'], ventas_perdidas=fila['ventas_perdidas'], valor_ventas=fila['valor_ventas']
+            )
+        return filas
+
+    def actualizar(self):
+        """Recalcular las filas desde la fecha (todas si no hay fecha). Devuelve la cantidad de filas."""
+        nuevas = [
+            RendimientoDiarioCampana(
+                campania_id=fila['campania'],
+                fecha=fila['dia'],
+                contactos=fila['contactos'],
+                ventas=fila['ventas'],
+                ventas_perdidas=fila['ventas_perdidas'],
+                valor_ventas=fila['valor_ventas'] or 0,
+            )
+            for fila in self._filas_campanias()
+        ]
+        nuevas += [
+            RendimientoDiarioCampana(
+                campana_id=campana_id,
+                fecha=dia,
+                contactos=valores.get('contactos', 0),
+                ventas=valores.get('ventas', 0),
+                ventas_perdidas=valores.get('ventas_perdidas', 0),
+                valor_ventas=valores.get('valor_ventas') or 0,
+            )
+            for (campana_id, dia), valores in self._filas_campanas().items()
+        ]
+
+        with transaction.atomic():
+            anteriores = RendimientoDiarioCampana.objects.all()
+            if self.desde:
+                anteriores = anteriores.filter(fecha__gte=self.desde)
+            anteriores.delete()
+            RendimientoDiarioCampana.objects.bulk_create(nuevas, batch_size=1000)
+        return len(nuevas)
+
+    @classmethod
+    def actualizar_recientes(cls):
+        return cls(desde=timezone.localdate() - timedelta(days=cls.DIAS_RECALCULO)).actualizar()
+
+    @staticmethod
+    def serie(campania=None, campana=None):
+        """Serie diaria de la campaña con los acumulados, para los gráficos"""
+        filas = RendimientoDiarioCampana.objects.filter(campania=campania) if campania else \
+            RendimientoDiarioCampana.objects.filter(campana=campana)
+        serie = []
+        contactos = ventas = 0
+        valor = 0
+        for fila in filas.order_by('fecha').values('fecha', 'contactos', 'ventas', 'ventas_perdidas', 'valor_ventas'):
+            contactos += fila['contactos']
+            ventas += fila['ventas']
+            valor += fila['valor_ventas']
+            serie.append({
+                'fecha': fila['fecha'].strftime('%d/%m/%Y'),
+                'contactos': fila['contactos'],
+                'ventas': fila['ventas'],
+                'ventas_perdidas': fila['ventas_perdidas'],
+                'contactos_acumulados': contactos,
+                'ventas_acumuladas': ventas,
+                'valor_acumulado': float(valor),
+            })
+        return serie
+
+
+def _suma_por_servicio(queryset, expresion):
+    """Subconsulta con la suma de la expresión de las filas relacionadas con el servicio de la consulta externa"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(servicio=OuterRef('pk')).order_by().values('servicio').annotate(
+                total=Sum(expresion, output_field=DecimalField(max_digits=14, decimal_places=2))
+            ).values('total')
+        ),
+        Value(0),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+class ReporteFacturacionService:
+    """
+    Reporte de facturación (mano de obra + gastos + repuestos) de los
+    servicios completados en un período.
+
+    Los totales de cada servicio salen de una sola consulta con subconsultas
+    de gastos y repuestos, y se agrupan por cliente y por mes en una pasada;
+    los clientes con su análisis se traen en una segunda consulta. La misma
+    instancia alimenta la pantalla y la exportación.
+    """
+
+    MESES = [
+        'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+        'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+    ]
+
+    # (tipo de reporte, período específico) -> (mes inicial, mes final, título)
+    PERIODOS = {
+        ('semestral', 'S1'): (1, 6, 'Primer Semestre {año}'),
+        ('semestral', 'S2'): (7, 12, 'Segundo Semestre {año}'),
+        ('semestral', ''): (1, 12, 'Ambos Semestres {año}'),
+        ('trimestral', 'Q1'): (1, 3, 'Q1 {año} (Enero-Marzo)'),
+        ('trimestral', 'Q2'): (4, 6, 'Q2 {año} (Abril-Junio)'),
+        ('trimestral', 'Q3'): (7, 9, 'Q3 {año} (Julio-Septiembre)'),
+        ('trimestral', 'Q4'): (10, 12, 'Q4 {año} (Octubre-Diciembre)'),
+        ('trimestral', ''): (1, 12, 'Todos los Trimestres {año}'),
+        ('mensual', ''): (1, 12, 'Análisis Mensual {año}'),
+    }
+
+    def __init__(self, tipo_reporte='anual', año=None, periodo_especifico='', nivel_detalle='resumen', top_clientes=''):
+        self.tipo_reporte = tipo_reporte
+        self.año = año or timezone.now().year
+        self.periodo_especifico = periodo_especifico
+        self.nivel_detalle = nivel_detalle
+        self.top_clientes = top_clientes
+        self.fecha_inicio, self.fecha_fin, self.titulo_periodo = self.resolver_periodo(
+            tipo_reporte, self.año, periodo_especifico
+        )
+        self._datos = None
+
+    @classmethod
+    def desde_request(cls, request):
+        return cls(
+            tipo_reporte=request.GET.get('tipo_reporte', 'anual'),
+            año=int(request.GET.get('año', timezone.now().year)),
+            periodo_especifico=request.GET.get('periodo_especifico', ''),
+            nivel_detalle=request.GET.get('nivel_detalle', 'resumen'),
+            top_clientes=request.GET.get('top_clientes', ''),
+        )
+
+    @classmethod
+    def resolver_periodo(cls, tipo_reporte, año, periodo_especifico=''):
+        """Fecha de inicio, fecha de fin y título del período. Lo que no se reconoce es el año completo."""
+        if tipo_reporte == 'mensual':
+            periodo_especifico = ''
+        periodo = cls.PERIODOS.get((tipo_reporte, periodo_especifico)) or \
+            cls.PERIODOS.get((tipo_reporte, '')) or (1, 12, 'Año {año}')
+        mes_inicio, mes_fin, titulo = periodo
+        fin = date(año + 1, 1, 1) if mes_fin == 12 else date(año, mes_fin + 1, 1)
+        return date(año, mes_inicio, 1), fin - timedelta(days=1), titulo.format(año=año)
+
+    @property
+    def detallado(self):
+        return self.nivel_detalle in ['detallado', 'completo']
+
+    def _servicios(self):
+        return Servicio.objects.filter(
+            fecha_servicio__gte=self.fecha_inicio,
+            fecha_servicio__lte=self.fecha_fin,
+            estado='COMPLETADO'
+        ).annotate(
+            mano_obra=Coalesce('valor_mano_obra', Value(0), output_field=DecimalField(max_digits=10, decimal_places=2)),
+            gastos_total=_suma_por_servicio(GastoAsistencia.objects.all(), F('monto')),
+            repuestos_total=_suma_por_servicio(VentaRepuesto.objects.all(), F('precio_unitario') * F('cantidad')),
+            mes=TruncMonth('fecha_servicio'),
+        ).order_by('fecha_servicio').values(
+            'id', 'fecha_servicio', 'mes', 'preorden__cliente', 'preorden__solicitud_cliente',
+            'mano_obra', 'gastos_total', 'repuestos_total'
+        )
+
+    def calcular(self):
+        """Agrupa los servicios por cliente y por mes. Se calcula una vez por instancia."""
+        if self._datos is not None:
+            return self._datos
+
+        por_cliente = {}
+        por_mes = {}
+        total_facturacion = 0
+        total_servicios = 0
+        for fila in self._servicios():
+            total = fila['mano_obra'] + fila['gastos_total'] + fila['repuestos_total']
+            datos = por_cliente.setdefault(fila['preorden__cliente'], {
+                'cliente': None,
+                'facturacion_total': 0,
+                'servicios': [],
+                'cantidad_servicios': 0,
+                'mano_obra_total': 0,
+                'gastos_total': 0,
+                'repuestos_total': 0,
+                'promedio_por_servicio': 0
+            })
+            datos['facturacion_total'] += total
+            datos['cantidad_servicios'] += 1
+            datos['mano_obra_total'] += fila['mano_obra']
+            datos['gastos_total'] += fila['gastos_total']
+            datos['repuestos_total'] += fila['repuestos_total']
+            if self.detallado:
+                datos['servicios'].append({
+                    'id': fila['id'],
+                    'fecha': fila['fecha_servicio'],
+                    'descripcion': fila['preorden__solicitud_cliente'],
+                    'mano_obra': fila['mano_obra'],
+                    'gastos': fila['gastos_total'],
+                    'repuestos': fila['repuestos_total'],
+                    'total': total
+                })
+
+            mes = por_mes.setdefault(fila['mes'].month, {'facturacion': 0, 'servicios': 0})
+            mes['facturacion'] += total
+            mes['servicios'] += 1
+
+            total_facturacion += total
+            total_servicios += 1
+
+        clientes = Cliente.objects.select_related('analisiscliente').in_bulk(list(por_cliente))
+        for cliente_id, datos in por_cliente.items():
+            datos['cliente'] = clientes[cliente_id]
+            datos['promedio_por_servicio'] = datos['facturacion_total'] / datos['cantidad_servicios']
+
+        clientes_ordenados = sorted(por_cliente.values(), key=lambda x: x['facturacion_total'], reverse=True)
+        if self.top_clientes:
+            clientes_ordenados = clientes_ordenados[:int(self.top_clientes)]
+
+        estadisticas_mensuales = {}
+        if self.tipo_reporte in ['mensual', 'anual']:
+            estadisticas_mensuales = {
+                mes: {
+                    'nombre': self.MESES[mes - 1],
+                    'facturacion': por_mes.get(mes, {}).get('facturacion', 0),
+                    'servicios': por_mes.get(mes, {}).get('servicios', 0),
+                }
+                for mes in range(1, 13)
+            }
+
+        estadisticas_segmento = {'A': 0, 'B': 0, 'C': 0, 'NUEVO': 0}
+        for datos in clientes_ordenados:
+            segmento = self.segmento(datos['cliente'])
+            if segmento in estadisticas_segmento:
+                estadisticas_segmento[segmento] += datos['facturacion_total']
+
+        self._datos = {
+            'clientes_ordenados': clientes_ordenados,
+            'total_facturacion': total_facturacion,
+            'total_servicios': total_servicios,
+            'promedio_por_servicio': total_facturacion / total_servicios if total_servicios > 0 else 0,
+            'estadisticas_mensuales': estadisticas_mensuales,
+            'estadisticas_segmento': estadisticas_segmento,
+        }
+        return self._datos
+
+    @staticmethod
+    def segmento(cliente):
+        return cliente.analisiscliente.categoria if hasattr(cliente, 'analisiscliente') else 'NUEVO'
+
+    def contexto(self):
+        """Contexto de la plantilla del reporte"""
+        return {
+            'tipo_reporte': self.tipo_reporte,
+            'titulo_periodo': self.titulo_periodo,
+            'fecha_inicio': self.fecha_inicio,
+            'fecha_fin': self.fecha_fin,
+            'nivel_detalle': self.nivel_detalle,
+            'top_clientes': self.top_clientes,
+            'periodo_especifico': self.periodo_especifico,
+            'año': self.año,
+            'fecha_generacion': timezone.now(),
+            **self.calcular(),
+        }
+
+    def filas_exportacion(self):
+        """Filas de la exportación (CSV o Excel), generadas de a una"""
+        datos = self.calcular()
+        total_facturacion = datos['total_facturacion']
+        total_servicios = datos['total_servicios']
+
+        yield ['REPORTE DE FACTURACIÓN']
+        yield [f'Período: {self.titulo_periodo}']
+        yield [f'Fecha de Generación: {timezone.now().strftime("%d/%m/%Y %H:%M")}']
+        yield []
+
+        yield ['RESUMEN EJECUTIVO']
+        yield ['Facturación Total', f'${total_facturacion:,.0f}']
+        yield ['Total de Servicios', total_servicios]
+        yield ['Promedio por Servicio', f'${datos["promedio_por_servicio"]:,.0f}' if total_servicios > 0 else '$0']
+        yield ['Total de Clientes', len(datos['clientes_ordenados'])]
+        yield []
+
+        yield ['FACTURACIÓN POR CLIENTE']
+        yield ['#', 'Cliente', 'Email', 'Segmento', 'Facturación Total', 'Servicios', 'Mano de Obra', 'Gastos', 'Repuestos', 'Promedio/Servicio']
+        for i, cliente_data in enumerate(datos['clientes_ordenados'], 1):
+            cliente = cliente_data['cliente']
+            segmento = self.segmento(cliente)
+            yield [
+                i,
+                cliente.razon_social,
+                cliente.email or 'Sin email',
+                'Nuevo' if segmento == 'NUEVO' else f'Segmento {segmento}',
+                f'${cliente_data["facturacion_total"]:,.0f}',
+                cliente_data['cantidad_servicios'],
+                f'${cliente_data["mano_obra_total"]:,.0f}',
+                f'${cliente_data["gastos_total"]:,.0f}',
+                f'${cliente_data["repuestos_total"]:,.0f}',
+                f'${cliente_data["promedio_por_servicio"]:,.0f}'
+            ]
+
+        if self.detallado:
+            yield []
+            yield ['DETALLE DE SERVICIOS']
+            yield ['Cliente', 'Fecha', 'Descripción', 'Mano de Obra', 'Gastos', 'Repuestos', 'Total']
+            for cliente_data in datos['clientes_ordenados']:
+                for servicio_data in cliente_data['servicios']:
+                    yield [
+                        cliente_data['cliente'].razon_social,
+                        servicio_data['fecha'].strftime('%d/%m/%Y'),
+                        servicio_data['descripcion'][:50],
+                        f'${servicio_data["mano_obra"]:,.0f}',
+                        f'${servicio_data["gastos"]:,.0f}',
+                        f'${servicio_data["repuestos"]:,.0f}',
+                        f'${servicio_data["total"]:,.0f}'
+                    ]
+
+
+class ClienteResumenService:
+    """
+    Historial de servicios de un cliente para su dashboard: totales,
+    facturación de los últimos 12 meses y últimos servicios.
+
+    La facturación sale de tres consultas agrupadas por mes (mano de obra,
+    gastos y repuestos) en lugar de recorrer todos los servicios. El
+    resultado se cachea por cliente y por día; cualquier servicio, gasto o
+    repuesto nuevo o modificado del cliente lo invalida.
+    """
+
+    MESES_HISTORIAL = 12
+    ULTIMOS_SERVICIOS = 10
+    CACHE_TTL = 60 * 60 * 6
+    CACHE_KEY = 'crm:cliente:{}:{}:{}'
+    CACHE_KEY_VERSION = 'crm:cliente:version:{}'
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.hoy = timezone.localdate()
+
+    @classmethod
+    def version(cls, cliente_id):
+        clave = cls.CACHE_KEY_VERSION.format(cliente_id)
+        version = cache.get(clave)
+        if version is None:
+            cache.add(clave, time.time_ns(), None)
+            version = cache.get(clave)
+        return version
+
+    @classmethod
+    def invalidar(cls, cliente_id):
+        try:
+            cache.incr(cls.CACHE_KEY_VERSION.format(cliente_id))
+        except ValueError:
+            cache.set(cls.CACHE_KEY_VERSION.format(cliente_id), time.time_ns(), None)
+
+    def _meses(self):
+        """Primer día de cada uno de los últimos meses, del más viejo al actual"""
+        mes = self.hoy.replace(day=1)
+        meses = [mes]
+        for _ in range(self.MESES_HISTORIAL - 1):
+            mes = (mes - timedelta(days=1)).replace(day=1)
+            meses.append(mes)
+        return meses[::-1]
+
+    def _por_mes(self, queryset, campo_fecha, expresion, **extra):
+        return {
+            fila['mes']: fila
+            for fila in queryset.annotate(mes=TruncMonth(campo_fecha)).values('mes').annotate(
+                total=Coalesce(
+                    Sum(expresion, output_field=DecimalField(max_digits=14, decimal_places=2)),
+                    Value(0),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                ),
+                **extra
+            ).order_by()
+        }
+
+    def calcular(self):
+        servicios = Servicio.objects.filter(preorden__cliente=self.cliente)
+        hace_un_año = self.hoy - timedelta(days=365)
+        mano_obra = self._por_mes(
+            servicios, 'fecha_servicio', F('valor_mano_obra'),
+            cantidad=Count('id'),
+            ultimo_año=Count('id', filter=Q(fecha_servicio__gte=hace_un_año)),
+            ultimo=Max('fecha_servicio'),
+        )
+        gastos = self._por_mes(
+            GastoAsistencia.objects.filter(servicio__preorden__cliente=self.cliente),
+            'servicio__fecha_servicio', F('monto')
+        )
+        repuestos = self._por_mes(
+            VentaRepuesto.objects.filter(servicio__preorden__cliente=self.cliente),
+            'servicio__fecha_servicio', F('precio_unitario') * F('cantidad')
+        )
+
+        facturacion = {
+            mes: sum(origen[mes]['total'] for origen in (mano_obra, gastos, repuestos) if mes in origen)
+            for mes in {*mano_obra, *gastos, *repuestos}
+        }
+        historial = [
+            {
+                'mes': f'{ReporteFacturacionService.MESES[mes.month - 1][:3]} {mes.year}',
+                'facturacion': float(facturacion.get(mes, 0)),
+            }
+            for mes in self._meses()
+        ]
+
+        ultimos = Servicio.objects.filter(preorden__cliente=self.cliente).annotate(
+            total_gastos=_suma_por_servicio(GastoAsistencia.objects.all(), F('monto')),
+            total_repuestos=_suma_por_servicio(VentaRepuesto.objects.all(), F('precio_unitario') * F('cantidad')),
+        ).select_related('preorden').order_by('-fecha_servicio')[:self.ULTIMOS_SERVICIOS]
+
+        return {
+            'total_servicios': sum(fila['cantidad'] for fila in mano_obra.values()),
+            'servicios_ultimo_ano': sum(fila['ultimo_año'] for fila in mano_obra.values()),
+            'facturacion_total': sum(facturacion.values(), 0),
+            'ultimo_servicio': max((fila['ultimo'] for fila in mano_obra.values()), default=None),
+            'historial_facturacion': historial,
+            'servicios': [
+                {
+                    'servicio': servicio,
+                    'total': (servicio.valor_mano_obra or 0) + servicio.total_gastos + servicio.total_repuestos,
+                }
+                for servicio in ultimos
+            ],
+        }
+
+    def resumen(self):
+        """Historial del cliente, cacheado hasta que cambie su actividad o el día"""
+        clave = self.CACHE_KEY.format(self.cliente.pk, self.version(self.cliente.pk), self.hoy.isoformat())
+        datos = cache.get(clave)
+        if datos is None:
+            datos = self.calcular()
+            cache.set(clave, datos, self.CACHE_TTL)
+        return datos
+
+
+class DeteccionOportunidadesService:
+    """
+    Detecta las oportunidades de venta y las guarda en OportunidadVenta:
+
+    - INACTIVO: el último servicio fue hace más de un año.
+    - BAJISTA: el último servicio fue hace entre seis meses y un año.
+    - SIN_PAQUETE: cliente activo sin paquete de servicio activo.
+
+    Los clientes salen de una consulta anotada con el último servicio, los
+    equipos activos, si tienen paquete y su segmento; la facturación de los
+    últimos dos años, de tres consultas agrupadas. El puntaje (0 a 100) suma
+    el peso del segmento, del tipo, de los equipos activos y de la
+    facturación relativa. Opcionalmente crea un embudo de ventas para las
+    oportunidades con puntaje alto.
+
+    Las oportunidades que dejan de detectarse se cierran, estén abiertas o en
+    embudo. Una oportunidad en embudo cuyo embudo terminó (ganado, perdido o
+    eliminado) y que se sigue detectando vuelve a quedar abierta.
+    """
+
+    DIAS_BAJISTA = 180
+    DIAS_INACTIVO = 365
+    DIAS_FACTURACION = 730
+    PUNTOS_SEGMENTO = {'A': 40, 'B': 25, 'C': 10, 'NUEVO': 5}
+    PUNTOS_TIPO = {'INACTIVO': 30, 'BAJISTA': 25, 'SIN_PAQUETE': 15}
+    PUNTOS_POR_EQUIPO = 4
+    MAX_PUNTOS_EQUIPOS = 20
+    MAX_PUNTOS_FACTURACION = 10
+    PUNTAJE_EMBUDO = 60
+    ETAPAS_TERMINALES = ['CIERRE', 'PERDIDO']
+
+    def __init__(self, usuario=None):
+        self.usuario = usuario
+        self.hoy = timezone.localdate()
+
+    def _clientes(self):
+        return Cliente.objects.filter(activo=True).annotate(
+            ultimo_servicio=Max('preorden__servicio__fecha_servicio'),
+            equipos_activos=Coalesce(
+                Subquery(
+                    Equipo.objects.filter(cliente=OuterRef('pk'), activo=True).order_by().values('cliente').annotate(
+                        total=Count('pk')
+                    ).values('total')
+                ),
+                0,
+            ),
+            tiene_paquete=Exists(ClientePaquete.objects.filter(cliente=OuterRef('pk'), estado='ACTIVO')),
+            segmento=Coalesce('analisiscliente__categoria', Value('NUEVO')),
+        ).values('id', 'ultimo_servicio', 'equipos_activos', 'tiene_paquete', 'segmento')
+
+    def _facturacion(self):
+        """cliente_id -> mano de obra + gastos + repuestos de los servicios de los últimos dos años"""
+        desde = self.hoy - timedelta(days=self.DIAS_FACTURACION)
+        consultas = [
+            (Servicio.objects.filter(fecha_servicio__gte=desde), 'preorden__cliente', F('valor_mano_obra')),
+            (GastoAsistencia.objects.filter(servicio__fecha_servicio__gte=desde), 'servicio__preorden__cliente', F('monto')),
+            (
+                VentaRepuesto.objects.filter(servicio__fecha_servicio__gte=desde),
+                'servicio__preorden__cliente', F('precio_unitario') * F('cantidad')
+            ),
+        ]
+        facturacion = {}
+        for queryset, campo, expresion in consultas:
+            for cliente_id, total in queryset.values(campo).annotate(
+                total=Sum(expresion, output_field=DecimalField(max_digits=14, decimal_places=2))
+            ).values_list(campo, 'total').order_by():
+                facturacion[cliente_id] = facturacion.get(cliente_id, 0) + (total or 0)
+        return facturacion
+
+    def _tipos(self, cliente):
+        tipos = []
+        if cliente['ultimo_servicio']:
+            dias = (self.hoy - cliente['ultimo_servicio']).days
+            if dias > self.DIAS_INACTIVO:
+                tipos.append('INACTIVO')
+            elif dias > self.DIAS_BAJISTA:
+                tipos.append('BAJISTA')
+        if not cliente['tiene_paquete']:
+            tipos.append('SIN_PAQUETE')
+        return tipos
+
+    def puntaje(self, tipo, segmento, equipos_activos, facturacion, facturacion_maxima):
+        puntos = self.PUNTOS_SEGMENTO.get(segmento, 0) + self.PUNTOS_TIPO[tipo]
+        puntos += min(equipos_activos * self.PUNTOS_POR_EQUIPO, self.MAX_PUNTOS_EQUIPOS)
+        if facturacion_maxima:
+            puntos += float(facturacion) / float(facturacion_maxima) * self.MAX_PUNTOS_FACTURACION
+        return round(puntos, 1)
+
+    def detectar(self, crear_embudos=False):
+        """Recalcula las oportunidades. Devuelve la cantidad de nuevas, actualizadas, cerradas y embudos creados."""
+        facturacion = self._facturacion()
+        facturacion_maxima = max(facturacion.values(), default=0)
+
+        detectadas = {}
+        for cliente in self._clientes():
+            for tipo in self._tipos(cliente):
+                total = facturacion.get(cliente['id'], 0)
+                detectadas[(cliente['id'], tipo)] = {
+                    'segmento': cliente['segmento'],
+                    'puntaje': self.puntaje(
+                        tipo, cliente['segmento'], cliente['equipos_activos'], total, facturacion_maxima
+                    ),
+                    'ultimo_servicio': cliente['ultimo_servicio'],
+                    'equipos_activos': cliente['equipos_activos'],
+                    'facturacion': total,
+                }
+
+        campos = ['segmento', 'puntaje', 'ultimo_servicio', 'equipos_activos', 'facturacion', 'estado', 'fecha_actualizacion']
+        ahora = timezone.now()
+        with transaction.atomic():
+            existentes = {
+                (oportunidad.cliente_id, oportunidad.tipo): oportunidad
+                for oportunidad in OportunidadVenta.objects.select_for_update()
+            }
+            embudos_terminados = set(EmbudoVentas.objects.filter(
+                pk__in=[o.embudo_id for o in existentes.values() if o.estado == 'EN_EMBUDO' and o.embudo_id],
+                etapa__in=self.ETAPAS_TERMINALES,
+            ).values_list('pk', flat=True))
+            nuevas, actualizadas, cerradas = [], [], []
+            for clave, valores in detectadas.items():
+                oportunidad = existentes.get(clave)
+                if oportunidad is None:
+                    nuevas.append(OportunidadVenta(cliente_id=clave[0], tipo=clave[1], **valores))
+                    continue
+                for campo, valor in valores.items():
+                    setattr(oportunidad, campo, valor)
+                embudo_terminado = oportunidad.estado == 'EN_EMBUDO' and (
+                    oportunidad.embudo_id is None or oportunidad.embudo_id in embudos_terminados
+                )
+                if oportunidad.estado == 'CERRADA' or embudo_terminado:
+                    oportunidad.estado = 'ABIERTA'
+                    oportunidad.embudo = None
+                oportunidad.fecha_actualizacion = ahora
+                actualizadas.append(oportunidad)
+            for clave, oportunidad in existentes.items():
+                if clave not in detectadas and oportunidad.estado in ('ABIERTA', 'EN_EMBUDO'):
+                    oportunidad.estado = 'CERRADA'
+                    oportunidad.fecha_actualizacion = ahora
+                    cerradas.append(oportunidad)
+
+            OportunidadVenta.objects.bulk_create(nuevas, batch_size=1000)
+            OportunidadVenta.objects.bulk_update(actualizadas + cerradas, campos + ['embudo'], batch_size=1000)
+
+        embudos = self.crear_embudos() if crear_embudos else 0
+        return {
+            'nuevas': len(nuevas),
+            'actualizadas': len(actualizadas),
+            'cerradas': len(cerradas),
+            'embudos': embudos,
+        }
+
+    def crear_embudos(self):
+        """Crea un embudo de ventas para las oportunidades abiertas con puntaje alto de clientes sin embudo abierto"""
+        oportunidades = OportunidadVenta.objects.filter(
+            estado='ABIERTA', puntaje__gte=self.PUNTAJE_EMBUDO
+        ).exclude(
+            cliente__embudoventas__etapa__in=['CONTACTO_INICIAL', 'CALIFICACION', 'PROPUESTA', 'NEGOCIACION']
+        ).select_related('cliente').order_by('cliente', '-puntaje')
+
+        creados = 0
+        clientes = set()
+        for oportunidad in oportunidades:
+            # Un solo embudo por cliente, para la oportunidad de mayor puntaje
+            if oportunidad.cliente_id in clientes:
+                continue
+            clientes.add(oportunidad.cliente_id)
+            with transaction.atomic():
+                embudo = EmbudoVentas.objects.create(
+                    cliente=oportunidad.cliente,
+                    etapa='CONTACTO_INICIAL',
+                    origen='SERVICIO_EXISTENTE',
+                    descripcion_negocio=oportunidad.get_tipo_display(),
+                    observaciones=f'Detectada automáticamente con puntaje {oportunidad.puntaje} '
+                                  f'(segmento {oportunidad.get_segmento_display()})',
+                    creado_por=self.usuario,
+                )
+                OportunidadVenta.objects.filter(cliente=oportunidad.cliente, estado='ABIERTA').update(
+                    estado='EN_EMBUDO', embudo=embudo, fecha_actualizacion=timezone.now()
+                )
+            creados += 1
+        return creados
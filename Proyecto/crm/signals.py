@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from clientes.models import Cliente
+from gestionDeTaller.models import GastoAsistencia, Servicio, VentaRepuesto
+from .models import EmbudoVentas
+
+
+@receiver(pre_save, sender=EmbudoVentas)
+def recordar_etapa_anterior(sender, instance, **kwargs):
+    """Guarda la etapa previa para registrar el cambio solo si la etapa cambió"""
+    instance._etapa_anterior = None
+    if instance.pk:
+        instance._etapa_anterior = EmbudoVentas.objects.filter(pk=instance.pk).values_list('etapa', flat=True).first()
+
+
+@receiver(post_save, sender=EmbudoVentas)
+def registrar_cambio_etapa(sender, instance, created, **kwargs):
+    from .services import EmbudoAnaliticaService
+
+    anterior = getattr(instance, '_etapa_anterior', None)
+    if not created and anterior == instance.etapa:
+        return
+    # Las vistas indican quién hizo el cambio; al crear, es quien creó el embudo
+    usuario = getattr(instance, '_usuario_cambio', None) or (instance.creado_por if created else None)
+    EmbudoAnaliticaService.registrar_cambio(instance, '' if created else anterior, usuario=usuario)
+
+
+@receiver([post_save, post_delete], sender=EmbudoVentas)
+def invalidar_tablero_embudo(sender, instance, **kwargs):
+    """Invalida el tablero del embudo ante cualquier alta, edición o baja (valor, origen, campaña, etapa)"""
+    from .services import EmbudoAnaliticaService
+
+    sucursal_id = Cliente.objects.filter(pk=instance.cliente_id).values_list('sucursal_id', flat=True).first()
+    transaction.on_commit(lambda: EmbudoAnaliticaService.invalidar(sucursal_id))
+
+
+@receiver([post_save, post_delete], sender=Servicio)
+@receiver([post_save, post_delete], sender=GastoAsistencia)
+@receiver([post_save, post_delete], sender=VentaRepuesto)
+def invalidar_resumen_cliente(sender, instance, **kwargs):
+    """Invalida el dashboard del cliente cuando cambia un servicio suyo o sus gastos y repuestos"""
+    from .services import ClienteResumenService
+
+    if sender is Servicio:
+        cliente_id = instance.preorden.cliente_id
+    else:
+        cliente_id = Servicio.objects.filter(pk=instance.servicio_id).values_list('preorden__cliente', flat=True).first()
+    if cliente_id:
+        transaction.on_commit(lambda: ClienteResumenService.invalidar(cliente_id))
@@ -7,17 +7,24 @@ from datetime import timedelta
 from decimal import Decimal
 from clientes.models import Cliente
 from gestionDeTaller.models import Servicio
-from .models import AnalisisCliente, Campania, PaqueteServicio, ClientePaquete, Contacto, SugerenciaMejora, EmbudoVentas, Campana, ContactoCliente
+from .models import AnalisisCliente, Campania, PaqueteServicio, ClientePaquete, Contacto, SugerenciaMejora, EmbudoVentas, Campana, ContactoCliente, OportunidadVenta
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from recursosHumanos.models import Sucursal
+from .services import (
+    ClienteResumenService, EmbudoAnaliticaService, RendimientoCampanasService, ReporteFacturacionService
+)
 import csv
+import io
+import json
+
+import pandas as pd
 
 # Create your views here.
 @login_required
 def crm(request):
-    # Obtener campañas activas
-    campanias = Campania.objects.filter(estado='EN_CURSO')
+    # Obtener campañas activas con sus métricas en una sola consulta
+    campanias = Campania.objects.filter(estado='EN_CURSO').con_metricas()
     
     context = {
         'campanias': campanias,
@@ -406,13 +413,8 @@ def campanias_marketing(request):
     if estado:
         campanias = campanias.filter(estado=estado)
     
-    # Anotar con estadísticas
-    campanias = campanias.annotate(
-        contactos_count=Count('contactos'),
-        ventas_exitosas=Count('contactos', filter=Q(contactos__resultado='VENTA_EXITOSA')),
-        ventas_perdidas=Count('contactos', filter=Q(contactos__resultado='VENTA_PERDIDA')),
-        pendientes=Count('contactos', filter=Q(contactos__resultado='PENDIENTE'))
-    ).order_by('-fecha_inicio')
+    # Anotar con estadísticas (get_cumplimiento usa las anotaciones, sin consultas por fila)
+    campanias = campanias.con_metricas().order_by('-fecha_inicio')
     
     # Calcular estadísticas adicionales
     campanias_activas_count = campanias.filter(estado='EN_CURSO').count()
@@ -542,47 +544,33 @@ def gestionar_contactos(request, campania_id):
     responsables = Usuario.objects.filter(is_active=True).order_by('nombre')
     
     # Estadísticas de la campaña
-    total_contactos = contactos.count()
-    ventas_exitosas = contactos.filter(resultado='VENTA_EXITOSA').count()
-    ventas_perdidas = contactos.filter(resultado='VENTA_PERDIDA').count()
-    pendientes = contactos.filter(resultado='PENDIENTE').count()
-    valor_total_ventas = contactos.filter(resultado='VENTA_EXITOSA').aggregate(
-        total=Sum('valor_venta')
-    )['total'] or 0
+    metricas = Campania.objects.filter(pk=campania.pk).con_metricas().values(
+        'contactos_count', 'ventas_exitosas', 'ventas_perdidas', 'pendientes', 'valor_ventas'
+    ).get()
     
     context = {
         'campania': campania,
         'contactos': contactos,
         'clientes': clientes,
         'responsables': responsables,
-        'total_contactos': total_contactos,
-        'ventas_exitosas': ventas_exitosas,
-        'ventas_perdidas': ventas_perdidas,
-        'pendientes': pendientes,
-        'valor_total_ventas': valor_total_ventas,
+        'total_contactos': metricas['contactos_count'],
+        'ventas_exitosas': metricas['ventas_exitosas'],
+        'ventas_perdidas': metricas['ventas_perdidas'],
+        'pendientes': metricas['pendientes'],
+        'valor_total_ventas': metricas['valor_ventas'],
     }
     return render(request, 'crm/gestionar_contactos.html', context)
 
 @login_required
 def dashboard_campania(request, campania_id):
     """Vista para mostrar el dashboard de resultados de una campaña"""
-    campania = get_object_or_404(Campania, id=campania_id)
+    # Estadísticas detalladas, anotadas en la misma consulta que la campaña
+    campania = get_object_or_404(Campania.objects.con_metricas(), id=campania_id)
     contactos = Contacto.objects.filter(campania=campania).select_related('cliente', 'responsable')
     
-    # Estadísticas detalladas
-    total_contactos = contactos.count()
-    ventas_exitosas = contactos.filter(resultado='VENTA_EXITOSA').count()
-    ventas_perdidas = contactos.filter(resultado='VENTA_PERDIDA').count()
-    pendientes = contactos.filter(resultado='PENDIENTE').count()
-    reprogramados = contactos.filter(resultado='REPROGRAMADO').count()
-    
-    valor_total_ventas = contactos.filter(resultado='VENTA_EXITOSA').aggregate(
-        total=Sum('valor_venta')
-    )['total'] or 0
-    
     # Calcular métricas
-    tasa_conversion = (ventas_exitosas / total_contactos * 100) if total_contactos > 0 else 0
-    cumplimiento_objetivo = (ventas_exitosas / campania.objetivo_paquetes * 100) if campania.objetivo_paquetes > 0 else 0
+    tasa_conversion = campania.get_tasa_conversion()
+    cumplimiento_objetivo = campania.get_cumplimiento()
     
     # Contactos por responsable
     contactos_por_responsable = contactos.values('responsable__nombre').annotate(
@@ -598,16 +586,18 @@ def dashboard_campania(request, campania_id):
     
     context = {
         'campania': campania,
-        'total_contactos': total_contactos,
-        'ventas_exitosas': ventas_exitosas,
-        'ventas_perdidas': ventas_perdidas,
-        'pendientes': pendientes,
-        'reprogramados': reprogramados,
-        'valor_total_ventas': valor_total_ventas,
+        'total_contactos': campania.contactos_count,
+        'ventas_exitosas': campania.ventas_exitosas,
+        'ventas_perdidas': campania.ventas_perdidas,
+        'pendientes': campania.pendientes,
+        'reprogramados': campania.reprogramados,
+        'valor_total_ventas': campania.valor_ventas,
         'tasa_conversion': tasa_conversion,
         'cumplimiento_objetivo': cumplimiento_objetivo,
         'contactos_por_responsable': contactos_por_responsable,
         'contactos_por_resultado': contactos_por_resultado,
+        # Evolución diaria desde la tabla de rendimiento (comando actualizar_rendimiento_campanas)
+        'serie_diaria': json.dumps(RendimientoCampanasService.serie(campania=campania)),
     }
     return render(request, 'crm/dashboard_campania.html', context)
 
@@ -741,39 +731,12 @@ def dashboard_cliente(request, cliente_id):
     """Vista para el dashboard individual de un cliente"""
     cliente = get_object_or_404(Cliente, id=cliente_id)
     
-    # Obtener servicios del cliente a través de la relación correcta
-    servicios = Servicio.objects.filter(
-        preorden__cliente=cliente
-    ).select_related('preorden').prefetch_related('gastos', 'repuestos').order_by('-fecha_servicio')
-    
-    # Calcular total de cada servicio
-    servicios_con_total = []
-    for servicio in servicios:
-        total_gastos = sum(gasto.monto for gasto in servicio.gastos.all())
-        total_repuestos = sum(repuesto.precio_unitario * repuesto.cantidad for repuesto in servicio.repuestos.all())
-        valor_mano_obra = servicio.valor_mano_obra or 0  # Manejar None como 0
-        total_servicio = valor_mano_obra + total_gastos + total_repuestos
-        servicios_con_total.append({
-            'servicio': servicio,
-            'total': total_servicio
-        })
-    
-    # Estadísticas de servicios
-    total_servicios = len(servicios_con_total)
-    fecha_limite_ano = timezone.now().date() - timedelta(days=365)
-    servicios_ultimo_ano = len([s for s in servicios_con_total if s['servicio'].fecha_servicio >= fecha_limite_ano])
-    facturacion_total = sum(s['total'] for s in servicios_con_total)
+    resumen = ClienteResumenService(cliente).resumen()
     
     # Análisis de comportamiento
-    ultimo_servicio = servicios_con_total[0]['servicio'] if servicios_con_total else None
+    ultimo_servicio = resumen['ultimo_servicio']
     if ultimo_servicio:
-        # Asegurar que ambos sean date para la comparación
-        fecha_actual = timezone.now().date()
-        fecha_servicio = ultimo_servicio.fecha_servicio
-        if hasattr(fecha_servicio, 'date'):
-            fecha_servicio = fecha_servicio.date()
-        
-        dias_desde_ultimo = (fecha_actual - fecha_servicio).days
+        dias_desde_ultimo = (timezone.now().date() - ultimo_servicio).days
         if dias_desde_ultimo <= 90:
             comportamiento = 'ACTIVO'
         elif dias_desde_ultimo <= 365:
@@ -816,95 +779,61 @@ def dashboard_cliente(request, cliente_id):
             'prioridad': 'ALTA'
         })
     
-    # Historial de facturación por mes (últimos 12 meses)
-    historial_facturacion = []
-    for i in range(12):
-        fecha = timezone.now() - timedelta(days=30*i)
-        servicios_mes = [s for s in servicios_con_total if s['servicio'].fecha_servicio.year == fecha.year and s['servicio'].fecha_servicio.month == fecha.month]
-        facturacion_mes = sum(s['total'] for s in servicios_mes)
-        
-        historial_facturacion.append({
-            'mes': fecha.strftime('%b %Y'),
-            'facturacion': facturacion_mes
-        })
-    
-    historial_facturacion.reverse()
-    
     context = {
         'cliente': cliente,
-        'servicios': servicios_con_total[:10],  # Últimos 10 servicios con total
-        'total_servicios': total_servicios,
-        'servicios_ultimo_ano': servicios_ultimo_ano,
-        'facturacion_total': facturacion_total,
+        'servicios': resumen['servicios'],  # Últimos 10 servicios con total
+        'total_servicios': resumen['total_servicios'],
+        'servicios_ultimo_ano': resumen['servicios_ultimo_ano'],
+        'facturacion_total': resumen['facturacion_total'],
         'comportamiento': comportamiento,
         'dias_desde_ultimo': dias_desde_ultimo,
         'equipos': equipos,
         'paquetes_activos': paquetes_activos,
         'contactos': contactos[:5],  # Últimos 5 contactos
         'oportunidades': oportunidades,
-        'historial_facturacion': historial_facturacion,
+        'historial_facturacion': json.dumps(resumen['historial_facturacion']),
     }
     return render(request, 'crm/dashboard_cliente.html', context)
 
 @login_required
 def oportunidades_venta(request):
-    """Vista para mostrar oportunidades de venta"""
-    
-    # Clientes inactivos (sin servicios en más de 1 año)
-    fecha_limite_inactivos = timezone.now() - timedelta(days=365)
-    clientes_inactivos = Cliente.objects.filter(
-        activo=True,
-        preorden__servicio__fecha_servicio__lt=fecha_limite_inactivos
-    ).distinct().annotate(
-        ultimo_servicio=Max('preorden__servicio__fecha_servicio'),
-        equipos_activos=Count('equipos', filter=Q(equipos__activo=True))
-    )
-    
-    # Clientes sin paquetes activos
-    clientes_sin_paquetes = Cliente.objects.filter(
-        activo=True
-    ).exclude(
-        paquetes__estado='ACTIVO'
-    ).annotate(
-        equipos_activos=Count('equipos', filter=Q(equipos__activo=True)),
-        ultimo_servicio=Max('preorden__servicio__fecha_servicio')
-    )
-    
-    # Clientes con comportamiento bajista (sin servicios en 6-12 meses)
-    fecha_limite_bajista = timezone.now() - timedelta(days=180)
-    clientes_bajistas = Cliente.objects.filter(
-        activo=True,
-        preorden__servicio__fecha_servicio__lt=fecha_limite_bajista,
-        preorden__servicio__fecha_servicio__gte=fecha_limite_inactivos
-    ).distinct().annotate(
-        ultimo_servicio=Max('preorden__servicio__fecha_servicio'),
-        equipos_activos=Count('equipos', filter=Q(equipos__activo=True))
-    )
-    
-    # Oportunidades por segmento
-    oportunidades_segmento_a = []
-    oportunidades_segmento_b = []
-    oportunidades_segmento_c = []
-    
-    for cliente in clientes_inactivos:
-        try:
-            categoria = cliente.analisiscliente.categoria
-            if categoria == 'A':
-                oportunidades_segmento_a.append(cliente)
-            elif categoria == 'B':
-                oportunidades_segmento_b.append(cliente)
-            else:
-                oportunidades_segmento_c.append(cliente)
-        except:
-            oportunidades_segmento_c.append(cliente)
-    
+    """Vista para mostrar oportunidades de venta detectadas por el comando detectar_oportunidades"""
+    tipo = request.GET.get('tipo', '')
+    segmento = request.GET.get('segmento', '')
+
+    oportunidades = OportunidadVenta.objects.filter(
+        estado__in=['ABIERTA', 'EN_EMBUDO']
+    ).select_related('cliente', 'embudo')
+
+    # Totales por tipo y segmento, antes de aplicar los filtros de la pantalla
+    conteos = {
+        (fila['tipo'], fila['segmento']): fila['cantidad']
+        for fila in oportunidades.values('tipo', 'segmento').annotate(cantidad=Count('id')).order_by()
+    }
+    por_tipo = {
+        clave: sum(cantidad for (t, _), cantidad in conteos.items() if t == clave)
+        for clave, _ in OportunidadVenta.TIPO_CHOICES
+    }
+    por_segmento = {
+        clave: sum(cantidad for (_, seg), cantidad in conteos.items() if seg == clave)
+        for clave, _ in OportunidadVenta.SEGMENTO_CHOICES
+    }
+
+    if tipo:
+        oportunidades = oportunidades.filter(tipo=tipo)
+    if segmento:
+        oportunidades = oportunidades.filter(segmento=segmento)
+
     context = {
-        'clientes_inactivos': clientes_inactivos,
-        'clientes_sin_paquetes': clientes_sin_paquetes,
-        'clientes_bajistas': clientes_bajistas,
-        'oportunidades_segmento_a': oportunidades_segmento_a,
-        'oportunidades_segmento_b': oportunidades_segmento_b,
-        'oportunidades_segmento_c': oportunidades_segmento_c,
+        'oportunidades': oportunidades.order_by('-puntaje', 'cliente__razon_social')[:200],
+        'por_tipo': por_tipo,
+        'por_segmento': por_segmento,
+        'total_oportunidades': sum(conteos.values()),
+        'tipo_choices': OportunidadVenta.TIPO_CHOICES,
+        'segmento_choices': OportunidadVenta.SEGMENTO_CHOICES,
+        'tipo': tipo,
+        'segmento': segmento,
+        'ultima_deteccion': OportunidadVenta.objects.aggregate(ultima=Max('fecha_actualizacion'))['ultima'],
     }
     return render(request, 'crm/oportunidades_venta.html', context)
 
@@ -1113,61 +1042,42 @@ def detalle_embudo(request, embudo_id):
 
 @login_required
 def embudo_ventas_dashboard(request):
-    """Dashboard principal del embudo de ventas con gráficos"""
+    """Dashboard principal del embudo de ventas con gráficos, conversión y velocidad por sucursal"""
     
-    # Obtener estadísticas generales del embudo
-    embudos = EmbudoVentas.objects.all()
+    # Los gerentes pueden ver otra sucursal o todas; el resto, solo la propia
+    sucursales = None
+    sucursal = request.user.sucursal
+    if request.user.rol == 'GERENTE':
+        sucursales = Sucursal.objects.filter(activo=True).order_by('nombre')
+        sucursal_id = request.GET.get('sucursal', str(sucursal.id) if sucursal else '')
+        sucursal = sucursales.filter(id=sucursal_id).first() if sucursal_id else None
     
-    # Estadísticas por etapa
-    etapas_stats = embudos.values('etapa').annotate(
-        total=Count('id'),
-        valor_total=Sum('valor_estimado')
-    ).order_by('etapa')
+    meses = request.GET.get('meses', '')
+    meses = int(meses) if meses.isdigit() and int(meses) > 0 else EmbudoAnaliticaService.MESES
+    meses = min(meses, EmbudoAnaliticaService.MESES_MAX)
     
-    # Estadísticas por origen
-    origenes_stats = embudos.values('origen').annotate(
-        total=Count('id'),
-        valor_total=Sum('valor_estimado')
-    ).order_by('-total')
-    
-    # Estadísticas por campaña
-    campanas_stats = embudos.filter(
-        campana__isnull=False,
-        campana__sucursal=request.user.sucursal
-    ).values('campana__nombre', 'campana__id').annotate(
-        total=Count('id'),
-        valor_total=Sum('valor_estimado')
-    ).order_by('-total')
+    # Totales, conversión, velocidad y cohortes cacheados por sucursal
+    tablero = EmbudoAnaliticaService(sucursal=sucursal, meses=meses).tablero()
+    resumen = tablero['resumen']
     
     # Datos para el gráfico de embudo
     etapas_orden = ['CONTACTO_INICIAL', 'CALIFICACION', 'PROPUESTA', 'NEGOCIACION', 'CIERRE', 'PERDIDO']
     embudo_data = []
     
     for etapa in etapas_orden:
-        etapa_stats = next((s for s in etapas_stats if s['etapa'] == etapa), None)
-        if etapa_stats:
-            embudo_data.append({
-                'etapa': dict(EmbudoVentas.ETAPA_CHOICES)[etapa],
-                'total': etapa_stats['total'],
-                'valor_total': float(etapa_stats['valor_total'] or 0),
-                'color': get_etapa_color(etapa)
-            })
-        else:
-            embudo_data.append({
-                'etapa': dict(EmbudoVentas.ETAPA_CHOICES)[etapa],
-                'total': 0,
-                'valor_total': 0,
-                'color': get_etapa_color(etapa)
-            })
-    
-    # KPIs principales
-    total_embudos = embudos.count()
-    total_valor_estimado = embudos.aggregate(total=Sum('valor_estimado'))['total'] or 0
-    tasa_conversion = calcular_tasa_conversion(embudos)
-    total_valor_cierre = embudos.aggregate(total=Sum("valor_cierre"))["total"] or 0
+        etapa_stats = resumen['por_etapa'].get(etapa, {'total': 0, 'valor_total': 0})
+        embudo_data.append({
+            'etapa': dict(EmbudoVentas.ETAPA_CHOICES)[etapa],
+            'total': etapa_stats['total'],
+            'valor_total': float(etapa_stats['valor_total'] or 0),
+            'color': get_etapa_color(etapa)
+        })
     
     # Embudos recientes (últimos 10)
-    embudos_recientes = embudos.order_by('-fecha_ultima_actividad')[:10]
+    embudos_recientes = EmbudoVentas.objects.select_related('cliente')
+    if sucursal:
+        embudos_recientes = embudos_recientes.filter(cliente__sucursal=sucursal)
+    embudos_recientes = embudos_recientes.order_by('-fecha_ultima_actividad')[:10]
     
     # Asignar colores a los embudos recientes
     for embudo in embudos_recientes:
@@ -1175,14 +1085,21 @@ def embudo_ventas_dashboard(request):
     
     context = {
         'embudo_data': embudo_data,
-        'origenes_stats': origenes_stats,
-        'campanas_stats': campanas_stats,
-        'total_embudos': total_embudos,
-        'total_valor_estimado': total_valor_estimado,
-        "total_valor_cierre": total_valor_cierre,
-        'tasa_conversion': tasa_conversion,
+        'origenes_stats': resumen['origenes'],
+        'campanas_stats': resumen['campanas'],
+        'total_embudos': resumen['totales']['total'],
+        'total_valor_estimado': resumen['totales']['valor_estimado'],
+        "total_valor_cierre": resumen['totales']['valor_cierre'],
+        'tasa_conversion': resumen['totales']['tasa_cierre'],
         'etapas_orden': etapas_orden,
         'embudos_recientes': embudos_recientes,
+        'conversion': tablero['conversion'],
+        'velocidad': tablero['velocidad'],
+        'cohortes': tablero['cohortes'],
+        'calculado': tablero['calculado'],
+        'sucursal': sucursal,
+        'sucursales': sucursales,
+        'meses': meses,
     }
     
     return render(request, 'crm/embudo_ventas_dashboard.html', context)
@@ -1268,6 +1185,7 @@ def embudo_ventas_detalle(request, embudo_id):
             nueva_etapa = request.POST.get('etapa')
             if nueva_etapa and nueva_etapa != embudo.etapa:
                 embudo.etapa = nueva_etapa
+                embudo._usuario_cambio = request.user
                 embudo.save()
                 messages.success(request, f'Etapa actualizada a {embudo.get_etapa_display()}')
                 return redirect('crm:embudo_ventas_detalle', embudo_id=embudo.id)
@@ -1393,386 +1311,46 @@ def generar_datos_embudo(embudos):
     return embudo_data
 
 def calcular_tasa_conversion(embudos):
-    """Calcula la tasa de conversión del embudo"""
-    total_embudos = embudos.count()
-    if total_embudos == 0:
-        return 0
-    
-    embudos_cierre = embudos.filter(etapa='CIERRE').count()
-    return round((embudos_cierre / total_embudos) * 100, 1)
+    """Calcula la tasa de conversión del embudo: ganados sobre decididos, sin contar los abiertos"""
+    return EmbudoAnaliticaService.tasa_cierre(embudos)
 
 @login_required
 def reporte_facturacion(request):
     """Vista para generar reportes de facturación detallados"""
-    
-    # Obtener parámetros del reporte
-    tipo_reporte = request.GET.get('tipo_reporte', 'anual')
-    año = int(request.GET.get('año', timezone.now().year))
-    periodo_especifico = request.GET.get('periodo_especifico', '')
-    nivel_detalle = request.GET.get('nivel_detalle', 'resumen')
-    top_clientes = request.GET.get('top_clientes', '')
-    
-    # Definir rangos de fechas según el tipo de reporte
-    if tipo_reporte == 'anual':
-        fecha_inicio = timezone.datetime(año, 1, 1).date()
-        fecha_fin = timezone.datetime(año, 12, 31).date()
-        titulo_periodo = f"Año {año}"
-    elif tipo_reporte == 'semestral':
-        if periodo_especifico == 'S1':
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 6, 30).date()
-            titulo_periodo = f"Primer Semestre {año}"
-        elif periodo_especifico == 'S2':
-            fecha_inicio = timezone.datetime(año, 7, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Segundo Semestre {año}"
-        else:
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Ambos Semestres {año}"
-    elif tipo_reporte == 'trimestral':
-        if periodo_especifico == 'Q1':
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 3, 31).date()
-            titulo_periodo = f"Q1 {año} (Enero-Marzo)"
-        elif periodo_especifico == 'Q2':
-            fecha_inicio = timezone.datetime(año, 4, 1).date()
-            fecha_fin = timezone.datetime(año, 6, 30).date()
-            titulo_periodo = f"Q2 {año} (Abril-Junio)"
-        elif periodo_especifico == 'Q3':
-            fecha_inicio = timezone.datetime(año, 7, 1).date()
-            fecha_fin = timezone.datetime(año, 9, 30).date()
-            titulo_periodo = f"Q3 {año} (Julio-Septiembre)"
-        elif periodo_especifico == 'Q4':
-            fecha_inicio = timezone.datetime(año, 10, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Q4 {año} (Octubre-Diciembre)"
-        else:
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Todos los Trimestres {año}"
-    elif tipo_reporte == 'mensual':
-        fecha_inicio = timezone.datetime(año, 1, 1).date()
-        fecha_fin = timezone.datetime(año, 12, 31).date()
-        titulo_periodo = f"Análisis Mensual {año}"
-    else:
-        fecha_inicio = timezone.datetime(año, 1, 1).date()
-        fecha_fin = timezone.datetime(año, 12, 31).date()
-        titulo_periodo = f"Año {año}"
-    
-    # Obtener servicios en el período
-    servicios = Servicio.objects.filter(
-        fecha_servicio__gte=fecha_inicio,
-        fecha_servicio__lte=fecha_fin,
-        estado='COMPLETADO'
-    ).select_related('preorden__cliente')
-    
-    # Calcular facturación por cliente
-    facturacion_por_cliente = {}
-    total_facturacion = 0
-    total_servicios = 0
-    
-    for servicio in servicios:
-        cliente = servicio.preorden.cliente
-        
-        if cliente not in facturacion_por_cliente:
-                    facturacion_por_cliente[cliente] = {
-            'cliente': cliente,
-            'facturacion_total': 0,
-            'servicios': [],
-            'cantidad_servicios': 0,
-            'mano_obra_total': 0,
-            'gastos_total': 0,
-            'repuestos_total': 0,
-            'promedio_por_servicio': 0
-        }
-        
-        # Calcular facturación del servicio
-        mano_obra = servicio.valor_mano_obra or 0
-        gastos = sum(g.monto for g in servicio.gastos.all())
-        repuestos = sum(r.precio_unitario * r.cantidad for r in servicio.repuestos.all())
-        facturacion_servicio = mano_obra + gastos + repuestos
-        
-        facturacion_por_cliente[cliente]['facturacion_total'] += facturacion_servicio
-        facturacion_por_cliente[cliente]['cantidad_servicios'] += 1
-        facturacion_por_cliente[cliente]['mano_obra_total'] += mano_obra
-        facturacion_por_cliente[cliente]['gastos_total'] += gastos
-        facturacion_por_cliente[cliente]['repuestos_total'] += repuestos
-        
-        # Calcular promedio por servicio
-        if facturacion_por_cliente[cliente]['cantidad_servicios'] > 0:
-            facturacion_por_cliente[cliente]['promedio_por_servicio'] = facturacion_por_cliente[cliente]['facturacion_total'] / facturacion_por_cliente[cliente]['cantidad_servicios']
-        
-        if nivel_detalle in ['detallado', 'completo']:
-            facturacion_por_cliente[cliente]['servicios'].append({
-                'servicio': servicio,
-                'fecha': servicio.fecha_servicio,
-                'mano_obra': mano_obra,
-                'gastos': gastos,
-                'repuestos': repuestos,
-                'total': facturacion_servicio
-            })
-        
-        total_facturacion += facturacion_servicio
-        total_servicios += 1
-    
-    # Ordenar por facturación y aplicar límite de top clientes
-    clientes_ordenados = sorted(
-        facturacion_por_cliente.values(),
-        key=lambda x: x['facturacion_total'],
-        reverse=True
-    )
-    
-    if top_clientes:
-        clientes_ordenados = clientes_ordenados[:int(top_clientes)]
-    
-    # Calcular estadísticas mensuales para reportes anuales y mensuales
-    estadisticas_mensuales = {}
-    if tipo_reporte in ['mensual', 'anual']:
-        for mes in range(1, 13):
-            fecha_mes_inicio = timezone.datetime(año, mes, 1).date()
-            if mes == 12:
-                fecha_mes_fin = timezone.datetime(año, mes, 31).date()
-            else:
-                fecha_mes_fin = timezone.datetime(año, mes + 1, 1).date() - timedelta(days=1)
-            
-            servicios_mes = servicios.filter(
-                fecha_servicio__gte=fecha_mes_inicio,
-                fecha_servicio__lte=fecha_mes_fin
-            )
-            
-            facturacion_mes = 0
-            for servicio in servicios_mes:
-                mano_obra = servicio.valor_mano_obra or 0
-                gastos = sum(g.monto for g in servicio.gastos.all())
-                repuestos = sum(r.precio_unitario * r.cantidad for r in servicio.repuestos.all())
-                facturacion_mes += mano_obra + gastos + repuestos
-            
-            estadisticas_mensuales[mes] = {
-                'nombre': timezone.datetime(año, mes, 1).strftime('%B'),
-                'facturacion': facturacion_mes,
-                'servicios': servicios_mes.count()
-            }
-    
-    # Calcular estadísticas por segmento
-    estadisticas_segmento = {'A': 0, 'B': 0, 'C': 0, 'NUEVO': 0}
-    for cliente_data in clientes_ordenados:
-        cliente = cliente_data['cliente']
-        if hasattr(cliente, 'analisiscliente') and cliente.analisiscliente:
-            segmento = cliente.analisiscliente.categoria
-        else:
-            segmento = 'NUEVO'
-        
-        if segmento in estadisticas_segmento:
-            estadisticas_segmento[segmento] += cliente_data['facturacion_total']
-    
-    # Calcular promedio por servicio
-    promedio_por_servicio = total_facturacion / total_servicios if total_servicios > 0 else 0
-    
-    context = {
-        'tipo_reporte': tipo_reporte,
-        'titulo_periodo': titulo_periodo,
-        'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin,
-        'clientes_ordenados': clientes_ordenados,
-        'total_facturacion': total_facturacion,
-        'total_servicios': total_servicios,
-        'promedio_por_servicio': promedio_por_servicio,
-        'nivel_detalle': nivel_detalle,
-        'estadisticas_mensuales': estadisticas_mensuales,
-        'estadisticas_segmento': estadisticas_segmento,
-        'top_clientes': top_clientes,
-        'periodo_especifico': periodo_especifico,
-        'año': año,
-        'fecha_generacion': timezone.now()
-    }
-    
-    return render(request, 'crm/reporte_facturacion.html', context)
+    reporte = ReporteFacturacionService.desde_request(request)
+    return render(request, 'crm/reporte_facturacion.html', reporte.contexto())
+
+
+class _Eco:
+    """Buffer mínimo para que csv.writer devuelva cada fila en lugar de escribirla"""
+
+    def write(self, valor):
+        return valor
+
 
 @login_required
 def exportar_reporte_excel(request):
-    """Exportar reporte de facturación a Excel (CSV)"""
-    
-    # Obtener parámetros del reporte
-    tipo_reporte = request.GET.get('tipo_reporte', 'anual')
-    año = int(request.GET.get('año', timezone.now().year))
-    periodo_especifico = request.GET.get('periodo_especifico', '')
-    nivel_detalle = request.GET.get('nivel_detalle', 'resumen')
-    top_clientes = request.GET.get('top_clientes', '')
-    
-    # Definir rangos de fechas según el tipo de reporte
-    if tipo_reporte == 'anual':
-        fecha_inicio = timezone.datetime(año, 1, 1).date()
-        fecha_fin = timezone.datetime(año, 12, 31).date()
-        titulo_periodo = f"Año {año}"
-    elif tipo_reporte == 'semestral':
-        if periodo_especifico == 'S1':
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 6, 30).date()
-            titulo_periodo = f"Primer Semestre {año}"
-        elif periodo_especifico == 'S2':
-            fecha_inicio = timezone.datetime(año, 7, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Segundo Semestre {año}"
-        else:
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Ambos Semestres {año}"
-    elif tipo_reporte == 'trimestral':
-        if periodo_especifico == 'Q1':
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 3, 31).date()
-            titulo_periodo = f"Q1 {año} (Enero-Marzo)"
-        elif periodo_especifico == 'Q2':
-            fecha_inicio = timezone.datetime(año, 4, 1).date()
-            fecha_fin = timezone.datetime(año, 6, 30).date()
-            titulo_periodo = f"Q2 {año} (Abril-Junio)"
-        elif periodo_especifico == 'Q3':
-            fecha_inicio = timezone.datetime(año, 7, 1).date()
-            fecha_fin = timezone.datetime(año, 9, 30).date()
-            titulo_periodo = f"Q3 {año} (Julio-Septiembre)"
-        elif periodo_especifico == 'Q4':
-            fecha_inicio = timezone.datetime(año, 10, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Q4 {año} (Octubre-Diciembre)"
-        else:
-            fecha_inicio = timezone.datetime(año, 1, 1).date()
-            fecha_fin = timezone.datetime(año, 12, 31).date()
-            titulo_periodo = f"Todos los Trimestres {año}"
-    elif tipo_reporte == 'mensual':
-        fecha_inicio = timezone.datetime(año, 1, 1).date()
-        fecha_fin = timezone.datetime(año, 12, 31).date()
-        titulo_periodo = f"Análisis Mensual {año}"
-    else:
-        fecha_inicio = timezone.datetime(año, 1, 1).date()
-        fecha_fin = timezone.datetime(año, 12, 31).date()
-        titulo_periodo = f"Año {año}"
-    
-    # Obtener servicios en el período
-    servicios = Servicio.objects.filter(
-        fecha_servicio__gte=fecha_inicio,
-        fecha_servicio__lte=fecha_fin,
-        estado='COMPLETADO'
-    ).select_related('preorden__cliente')
-    
-    # Calcular facturación por cliente
-    facturacion_por_cliente = {}
-    total_facturacion = 0
-    total_servicios = 0
-    
-    for servicio in servicios:
-        cliente = servicio.preorden.cliente
-        
-        if cliente not in facturacion_por_cliente:
-            facturacion_por_cliente[cliente] = {
-                'cliente': cliente,
-                'facturacion_total': 0,
-                'servicios': [],
-                'cantidad_servicios': 0,
-                'mano_obra_total': 0,
-                'gastos_total': 0,
-                'repuestos_total': 0,
-                'promedio_por_servicio': 0
-            }
-        
-        # Calcular facturación del servicio
-        mano_obra = servicio.valor_mano_obra or 0
-        gastos = sum(g.monto for g in servicio.gastos.all())
-        repuestos = sum(r.precio_unitario * r.cantidad for r in servicio.repuestos.all())
-        facturacion_servicio = mano_obra + gastos + repuestos
-        
-        facturacion_por_cliente[cliente]['facturacion_total'] += facturacion_servicio
-        facturacion_por_cliente[cliente]['cantidad_servicios'] += 1
-        facturacion_por_cliente[cliente]['mano_obra_total'] += mano_obra
-        facturacion_por_cliente[cliente]['gastos_total'] += gastos
-        facturacion_por_cliente[cliente]['repuestos_total'] += repuestos
-        
-        # Calcular promedio por servicio
-        if facturacion_por_cliente[cliente]['cantidad_servicios'] > 0:
-            facturacion_por_cliente[cliente]['promedio_por_servicio'] = facturacion_por_cliente[cliente]['facturacion_total'] / facturacion_por_cliente[cliente]['cantidad_servicios']
-        
-        if nivel_detalle in ['detallado', 'completo']:
-            facturacion_por_cliente[cliente]['servicios'].append({
-                'servicio': servicio,
-                'fecha': servicio.fecha_servicio,
-                'mano_obra': mano_obra,
-                'gastos': gastos,
-                'repuestos': repuestos,
-                'total': facturacion_servicio
-            })
-        
-        total_facturacion += facturacion_servicio
-        total_servicios += 1
-    
-    # Ordenar por facturación y aplicar límite de top clientes
-    clientes_ordenados = sorted(
-        facturacion_por_cliente.values(),
-        key=lambda x: x['facturacion_total'],
-        reverse=True
+    """Exportar reporte de facturación a CSV (por defecto, en streaming) o a Excel con formato=xlsx"""
+    reporte = ReporteFacturacionService.desde_request(request)
+    nombre = f'reporte_facturacion_{reporte.tipo_reporte}_{reporte.año}'
+
+    if request.GET.get('formato') == 'xlsx':
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            pd.DataFrame(list(reporte.filas_exportacion())).to_excel(
+                writer, sheet_name='Facturación', index=False, header=False
+            )
+        response = HttpResponse(
+            output.getvalue(),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{nombre}.xlsx"'
+        return response
+
+    writer = csv.writer(_Eco())
+    response = StreamingHttpResponse(
+        (writer.writerow(fila) for fila in reporte.filas_exportacion()),
+        content_type='text/csv'
     )
-    
-    if top_clientes:
-        clientes_ordenados = clientes_ordenados[:int(top_clientes)]
-    
-    # Crear respuesta CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="reporte_facturacion_{tipo_reporte}_{año}.csv"'
-    
-    # Crear writer CSV
-    writer = csv.writer(response)
-    writer.writerow(['REPORTE DE FACTURACIÓN'])
-    writer.writerow([f'Período: {titulo_periodo}'])
-    writer.writerow([f'Fecha de Generación: {timezone.now().strftime("%d/%m/%Y %H:%M")}'])
-    writer.writerow([])
-    
-    # Resumen ejecutivo
-    writer.writerow(['RESUMEN EJECUTIVO'])
-    writer.writerow(['Facturación Total', f'${total_facturacion:,.0f}'])
-    writer.writerow(['Total de Servicios', total_servicios])
-    writer.writerow(['Promedio por Servicio', f'${total_facturacion/total_servicios:,.0f}' if total_servicios > 0 else '$0'])
-    writer.writerow(['Total de Clientes', len(clientes_ordenados)])
-    writer.writerow([])
-    
-    # Tabla de clientes
-    writer.writerow(['FACTURACIÓN POR CLIENTE'])
-    writer.writerow(['#', 'Cliente', 'Email', 'Segmento', 'Facturación Total', 'Servicios', 'Mano de Obra', 'Gastos', 'Repuestos', 'Promedio/Servicio'])
-    
-    for i, cliente_data in enumerate(clientes_ordenados, 1):
-        cliente = cliente_data['cliente']
-        segmento = 'Nuevo'
-        if hasattr(cliente, 'analisiscliente') and cliente.analisiscliente:
-            segmento = f'Segmento {cliente.analisiscliente.categoria}'
-        
-        writer.writerow([
-            i,
-            cliente.razon_social,
-            cliente.email or 'Sin email',
-            segmento,
-            f'${cliente_data["facturacion_total"]:,.0f}',
-            cliente_data['cantidad_servicios'],
-            f'${cliente_data["mano_obra_total"]:,.0f}',
-            f'${cliente_data["gastos_total"]:,.0f}',
-            f'${cliente_data["repuestos_total"]:,.0f}',
-            f'${cliente_data["promedio_por_servicio"]:,.0f}'
-        ])
-    
-    # Si es detallado, agregar servicios
-    if nivel_detalle in ['detallado', 'completo']:
-        writer.writerow([])
-        writer.writerow(['DETALLE DE SERVICIOS'])
-        writer.writerow(['Cliente', 'Fecha', 'Descripción', 'Mano de Obra', 'Gastos', 'Repuestos', 'Total'])
-        
-        for cliente_data in clientes_ordenados:
-            cliente = cliente_data['cliente']
-            for servicio_data in cliente_data['servicios']:
-                writer.writerow([
-                    cliente.razon_social,
-                    servicio_data['fecha'].strftime('%d/%m/%Y'),
-                    servicio_data['servicio'].descripcion[:50],
-                    f'${servicio_data["mano_obra"]:,.0f}',
-                    f'${servicio_data["gastos"]:,.0f}',
-                    f'${servicio_data["repuestos"]:,.0f}',
-                    f'${servicio_data["total"]:,.0f}'
-                ])
-    
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
     return response
\ No newline at end of file
@@ -1,10 +1,11 @@
 from django.contrib import admin
+from buscador.admin import BusquedaAdminMixin
 from .models import (
     PreOrden, Servicio, PedidoRepuestosTerceros, GastoAsistencia,
     VentaRepuesto, Revision5S, PlanAccion5S, EvidenciaPlanAccion5S, CostoPersonalTaller,
     AnalisisTaller, Evidencia, ChecklistSalidaCampo, EncuestaServicio,
-    RespuestaEncuesta, InsatisfaccionCliente, LogCambioServicio, ObservacionServicio,
-    EvidenciaRevision5S, Repuesto, HerramientaEspecial, ReservaHerramienta, LogHerramienta,
+    RespuestaEncuesta, InsatisfaccionCliente, LogCambioServicio, IntervaloEstadoServicio, ObservacionServicio,
+    EvidenciaRevision5S, Repuesto, MovimientoStockRepuesto, HerramientaEspecial, ReservaHerramienta, LogHerramienta,
     HerramientaPersonal, AsignacionHerramientaPersonal, AuditoriaHerramientaPersonal, DetalleAuditoriaHerramienta, ItemHerramientaPersonal, LogCambioItemHerramienta
 )
 
@@ -23,10 +24,10 @@ class PreOrdenAdmin(admin.ModelAdmin):
 
 
 @admin.register(Servicio)
-class ServicioAdmin(admin.ModelAdmin):
+class ServicioAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = [ 'get_cliente', 'fecha_servicio', 'orden_servicio', 'estado']
     list_filter = ['estado', 'fecha_servicio']
-    search_fields = [ 'preorden__cliente__nombre', 'orden_servicio']
+    search_fields = [ 'preorden__cliente__razon_social', 'orden_servicio']
     fieldsets = (
         ('Información Básica', {
             'fields': ('preorden', 'fecha_servicio', 'horometro_servicio', 'orden_servicio', 'estado', 'trabajo', 'prioridad')
@@ -55,8 +56,9 @@ class PedidoRepuestosTercerosAdmin(admin.ModelAdmin):
 
 @admin.register(VentaRepuesto)
 class VentaRepuestoAdmin(admin.ModelAdmin):
-    list_display = ['codigo', 'descripcion', 'cantidad', 'precio_unitario']
+    list_display = ['codigo', 'descripcion', 'cantidad', 'precio_unitario', 'costo_unitario', 'repuesto']
     search_fields = ['codigo', 'descripcion']
+    raw_id_fields = ['repuesto']
 
 @admin.register(Revision5S)
 class Revision5SAdmin(admin.ModelAdmin):
@@ -140,6 +142,21 @@ class LogCambioServicioAdmin(admin.ModelAdmin):
         return request.user.is_superuser  # Solo superusuarios pueden eliminar logs
 
 
+@admin.register(IntervaloEstadoServicio)
+class IntervaloEstadoServicioAdmin(admin.ModelAdmin):
+    list_display = ['servicio', 'estado', 'sucursal', 'inicio', 'fin', 'duracion_segundos']
+    list_filter = ['estado', 'sucursal', 'mes']
+    search_fields = ['servicio__id']
+    raw_id_fields = ['servicio', 'log']
+
+    # Tabla derivada del log de cambios: se regenera con actualizar_duracion_estados
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ObservacionServicio)
 class ObservacionServicioAdmin(admin.ModelAdmin):
     list_display = ['servicio', 'usuario', 'fecha_creacion', 'observacion_corta']
@@ -154,13 +171,14 @@ class ObservacionServicioAdmin(admin.ModelAdmin):
 
 
 @admin.register(Repuesto)
-class RepuestoAdmin(admin.ModelAdmin):
+class RepuestoAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = [
         'codigo', 
         'descripcion_corta', 
         'costo', 
         'precio_venta', 
         'margen_ganancia_display',
+        'stock_actual',
         'categoria',
         'proveedor',
         'activo_badge'
@@ -189,7 +207,7 @@ class RepuestoAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Inventario', {
-            'fields': ('stock_minimo', 'ubicacion_almacen'),
+            'fields': ('stock_actual', 'stock_minimo', 'ubicacion_almacen'),
             'classes': ('collapse',)
         }),
         ('Información de Auditoría', {
@@ -198,7 +216,7 @@ class RepuestoAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ['fecha_creacion', 'fecha_modificacion']
+    readonly_fields = ['stock_actual', 'fecha_creacion', 'fecha_modificacion']
     
     actions = ['activar_repuestos', 'desactivar_repuestos']
     
@@ -238,6 +256,22 @@ class RepuestoAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(MovimientoStockRepuesto)
+class MovimientoStockRepuestoAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'repuesto', 'tipo', 'cantidad', 'saldo', 'venta', 'pedido', 'usuario']
+    list_filter = ['tipo', 'fecha']
+    search_fields = ['repuesto__codigo', 'observaciones']
+    date_hierarchy = 'fecha'
+    raw_id_fields = ['repuesto', 'venta', 'pedido']
+
+    # El libro solo se escribe desde StockRepuestosService: las correcciones se registran como ajustes
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(HerramientaEspecial)
 class HerramientaEspecialAdmin(admin.ModelAdmin):
     list_display = [
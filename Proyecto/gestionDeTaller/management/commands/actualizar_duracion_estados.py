@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from gestionDeTaller.services import DuracionEstadosService
+
+
+class Command(BaseCommand):
+    help = 'Actualiza la tabla de intervalos de estado de los servicios a partir del log de cambios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruir',
+            action='store_true',
+            help='Descartar la tabla y reconstruirla con todo el historial'
+        )
+
+    def handle(self, *args, **options):
+        resultado = DuracionEstadosService.actualizar(reconstruir=options['reconstruir'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Servicios procesados: {resultado['servicios']} | intervalos escritos: {resultado['intervalos']}"
+        ))
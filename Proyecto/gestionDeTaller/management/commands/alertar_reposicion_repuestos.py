@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+from gestionDeTaller.services import StockRepuestosService
+from recursosHumanos.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Envía por email los repuestos en o por debajo del punto de pedido (pensado para ejecutarse a diario)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar los repuestos a reponer sin enviar el email'
+        )
+
+    def handle(self, *args, **options):
+        repuestos = StockRepuestosService.reposicion()
+
+        if not repuestos:
+            self.stdout.write('No hay repuestos por debajo del punto de pedido')
+            return
+
+        for repuesto in repuestos:
+            self.stdout.write(
+                f"  {repuesto.codigo:<20} stock {repuesto.stock_actual:>5} | mín {repuesto.stock_minimo:>5} | "
+                f"en espera {repuesto.servicios_en_espera} | sugerido {repuesto.cantidad_sugerida}"
+            )
+
+        if options['dry_run']:
+            return
+
+        destinatarios = list(
+            Usuario.objects.filter(rol__in=['GERENTE', 'ADMINISTRATIVO'], is_active=True)
+            .exclude(email='').values_list('email', flat=True)
+        )
+        if not destinatarios:
+            self.stdout.write(self.style.WARNING('No hay destinatarios para la alerta'))
+            return
+
+        context = {
+            'repuestos': repuestos,
+            'total_en_espera': sum(1 for repuesto in repuestos if repuesto.servicios_en_espera),
+            'fecha_alerta': timezone.localtime().strftime('%d/%m/%Y %H:%M'),
+        }
+        mensaje_html = render_to_string('gestionDeTaller/email_alerta_reposicion_repuestos.html', context)
+
+        email = EmailMultiAlternatives(
+            f"⚠️ Repuestos a reponer: {len(repuestos)}",
+            strip_tags(mensaje_html),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=destinatarios,
+        )
+        email.attach_alternative(mensaje_html, "text/html")
+        email.send()
+        self.stdout.write(self.style.SUCCESS(f'Alerta enviada a {len(destinatarios)} destinatarios'))
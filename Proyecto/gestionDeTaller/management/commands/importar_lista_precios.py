@@ -0,0 +1,75 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from gestionDeTaller.services import ImportacionRepuestosService
+from recursosHumanos.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Importa una lista de precios de repuestos (Excel o CSV): altas y actualizaciones masivas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta al archivo .xlsx, .xls o .csv')
+        parser.add_argument(
+            '--proveedor',
+            type=str,
+            help='Proveedor a asignar a todos los repuestos de la lista'
+        )
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que figura como creador de los repuestos nuevos'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar el informe de cambios, sin guardar'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.exists(ruta):
+            raise CommandError(f'El archivo {ruta} no existe')
+
+        usuario = None
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+            if not usuario:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        with open(ruta, 'rb') as archivo:
+            servicio = ImportacionRepuestosService(
+                archivo, os.path.basename(ruta), proveedor=options['proveedor'], usuario=usuario
+            )
+            try:
+                informe = servicio.comparar() if options['dry_run'] else servicio.aplicar()
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        resumen = informe['resumen']
+        self.stdout.write(f"Filas leídas: {informe['filas']}")
+        self.stdout.write(f"Repuestos nuevos: {len(informe['nuevos'])}")
+        self.stdout.write(f"Repuestos actualizados: {len(informe['actualizados'])} "
+                          f"({resumen['cambios_precio']} con cambio de precio: "
+                          f"{resumen['aumentos']} aumentos, {resumen['bajas']} bajas)")
+        self.stdout.write(f"Sin cambios: {informe['sin_cambios']}")
+        if resumen['variacion_promedio'] is not None:
+            self.stdout.write(f"Variación promedio de precio: {resumen['variacion_promedio']:.2f}%")
+        if resumen['margen_promedio_anterior'] is not None:
+            self.stdout.write(
+                f"Margen promedio: {resumen['margen_promedio_anterior']:.2f}% -> "
+                f"{resumen['margen_promedio_nuevo']:.2f}%"
+            )
+
+        for cambio in informe['actualizados'][:20]:
+            if 'precio_venta' in cambio['campos']:
+                self.stdout.write(
+                    f"  {cambio['codigo']}: ${cambio['precio_anterior']} -> ${cambio['precio_nuevo']}"
+                )
+        for error in informe['errores']:
+            self.stdout.write(self.style.WARNING(error))
+
+        if informe['aplicado']:
+            self.stdout.write(self.style.SUCCESS('Lista de precios importada'))
+        else:
+            self.stdout.write(self.style.WARNING('Simulación: no se guardó ningún cambio'))
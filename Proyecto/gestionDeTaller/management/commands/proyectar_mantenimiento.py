@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from gestionDeTaller.services import PlanificacionMantenimientoService
+from recursosHumanos.models import Sucursal, Usuario
+
+
+class Command(BaseCommand):
+    help = 'Proyecta los servicios programados que vencen por sucursal según la velocidad de uso de cada equipo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=60,
+            help='Horizonte de la proyección en días'
+        )
+        parser.add_argument(
+            '--sucursal',
+            type=int,
+            help='ID de la sucursal (por defecto todas)'
+        )
+        parser.add_argument(
+            '--crear-preordenes',
+            action='store_true',
+            help='Crear preórdenes PROGRAMADO para los equipos que vencen'
+        )
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que figura como creador de las preórdenes'
+        )
+
+    def handle(self, *args, **options):
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(pk=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"La sucursal {options['sucursal']} no existe")
+
+        usuario = None
+        if options['crear_preordenes']:
+            if not options['usuario']:
+                raise CommandError('Debe indicar --usuario para crear preórdenes')
+            try:
+                usuario = Usuario.objects.get(email=options['usuario'])
+            except Usuario.DoesNotExist:
+                raise CommandError(f"El usuario {options['usuario']} no existe")
+
+        service = PlanificacionMantenimientoService(sucursal=sucursal)
+        por_sucursal = service.proyectar_por_sucursal(options['dias'])
+
+        if not por_sucursal:
+            self.stdout.write('No hay servicios proyectados dentro del horizonte')
+            return
+
+        for sucursal_vencimientos, vencimientos in por_sucursal.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{sucursal_vencimientos.nombre} ({len(vencimientos)} equipos)'))
+            for v in vencimientos:
+                estado = 'VENCIDO' if v['vencido'] else v['fecha_proyectada'].strftime('%d/%m/%Y')
+                self.stdout.write(
+                    f"  {estado:>10} | {v['equipo'].numero_serie} | {v['equipo'].cliente.razon_social} | "
+                    f"servicio {v['proximo_servicio']} h | actual ~{v['horas_estimadas']} h | {v['horas_por_dia']} h/día"
+                )
+
+            if usuario:
+                creadas = service.crear_preordenes(vencimientos, usuario)
+                self.stdout.write(self.style.SUCCESS(f'  Preórdenes creadas: {len(creadas)}'))
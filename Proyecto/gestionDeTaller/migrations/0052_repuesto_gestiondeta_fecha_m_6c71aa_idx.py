@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestionDeTaller', '0051_logcambioitemherramienta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(fields=['fecha_modificacion'], name='gestionDeTa_fecha_m_6c71aa_idx'),
+        ),
+    ]
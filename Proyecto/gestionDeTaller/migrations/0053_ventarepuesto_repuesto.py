@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def vincular_ventas_con_catalogo(apps, schema_editor):
+    """Vincular las ventas existentes con el repuesto del catálogo que tiene el mismo código"""
+    VentaRepuesto = apps.get_model('gestionDeTaller', 'VentaRepuesto')
+    Repuesto = apps.get_model('gestionDeTaller', 'Repuesto')
+
+    VentaRepuesto.objects.filter(repuesto__isnull=True).update(
+        repuesto=models.Subquery(
+            Repuesto.objects.filter(codigo=models.OuterRef('codigo')).values('pk')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestionDeTaller', '0052_repuesto_gestiondeta_fecha_m_6c71aa_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventarepuesto',
+            name='repuesto',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas', to='gestionDeTaller.repuesto', verbose_name='Repuesto del Catálogo'),
+        ),
+        migrations.RunPython(vincular_ventas_con_catalogo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gestionDeTaller', '0053_ventarepuesto_repuesto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStockRepuesto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('EGRESO', 'Egreso'), ('DEVOLUCION', 'Devolución'), ('AJUSTE', 'Ajuste de Inventario')], max_length=15, verbose_name='Tipo')),
+                ('cantidad', models.IntegerField(help_text='Positiva para ingresos, negativa para egresos', verbose_name='Cantidad')),
+                ('saldo', models.IntegerField(verbose_name='Saldo')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('observaciones', models.CharField(blank=True, max_length=255, verbose_name='Observaciones')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['-fecha', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='repuesto',
+            name='stock_actual',
+            field=models.IntegerField(default=0, editable=False, help_text='Saldo mantenido por los movimientos de stock', verbose_name='Stock Actual'),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(fields=['stock_minimo', 'stock_actual'], name='gestionDeTa_stock_m_4b2268_idx'),
+        ),
+        migrations.AddField(
+            model_name='movimientostockrepuesto',
+            name='pedido',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='gestionDeTaller.pedidorepuestosterceros', verbose_name='Pedido'),
+        ),
+        migrations.AddField(
+            model_name='movimientostockrepuesto',
+            name='repuesto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='gestionDeTaller.repuesto', verbose_name='Repuesto'),
+        ),
+        migrations.AddField(
+            model_name='movimientostockrepuesto',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddField(
+            model_name='movimientostockrepuesto',
+            name='venta',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='gestionDeTaller.ventarepuesto', verbose_name='Venta'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostockrepuesto',
+            index=models.Index(fields=['repuesto', 'fecha'], name='gestionDeTa_repuest_b516bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostockrepuesto',
+            index=models.Index(fields=['tipo', 'fecha'], name='gestionDeTa_tipo_3f58ea_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursosHumanos', '0013_remove_actividadtrabajo_categoria_facturacion_destinatario'),
+        ('gestionDeTaller', '0054_stock_repuestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntervaloEstadoServicio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(max_length=50, verbose_name='Estado')),
+                ('inicio', models.DateTimeField(verbose_name='Inicio')),
+                ('fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('duracion_segundos', models.BigIntegerField(blank=True, null=True, verbose_name='Duración (segundos)')),
+                ('mes', models.DateField(help_text='Primer día del mes en que comenzó el intervalo', verbose_name='Mes')),
+                ('log', models.ForeignKey(blank=True, help_text='Cambio que inició el intervalo (vacío para el estado inicial del servicio)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestionDeTaller.logcambioservicio')),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intervalos_estado', to='gestionDeTaller.servicio')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recursosHumanos.sucursal', verbose_name='Sucursal')),
+            ],
+            options={
+                'verbose_name': 'Intervalo de Estado de Servicio',
+                'verbose_name_plural': 'Intervalos de Estado de Servicios',
+                'ordering': ['servicio', 'inicio'],
+                'indexes': [models.Index(fields=['estado', 'mes', 'sucursal'], name='gestionDeTa_estado_515c0e_idx'), models.Index(fields=['servicio', 'inicio'], name='gestionDeTa_servici_24e74f_idx')],
+            },
+        ),
+    ]
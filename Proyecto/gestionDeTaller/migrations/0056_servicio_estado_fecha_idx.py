@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestionDeTaller', '0055_intervaloestadoservicio'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['estado', 'fecha_servicio'], name='gestionDeTa_estado_533a2e_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.2 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+def vaciar_stock_sin_inventario(apps, schema_editor):
+    """
+    El saldo de los repuestos arrancó en 0 al agregar el libro de stock. Sin un
+    ajuste de inventario ese saldo no refleja el stock real, así que queda vacío
+    hasta el primer ajuste y el repuesto no entra en la reposición.
+    """
+    Repuesto = apps.get_model('gestionDeTaller', 'Repuesto')
+    MovimientoStockRepuesto = apps.get_model('gestionDeTaller', 'MovimientoStockRepuesto')
+    inventariados = MovimientoStockRepuesto.objects.filter(tipo='AJUSTE').values('repuesto_id')
+    Repuesto.objects.exclude(pk__in=inventariados).update(stock_actual=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestionDeTaller', '0056_servicio_estado_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='repuesto',
+            name='stock_actual',
+            field=models.IntegerField(blank=True, editable=False, help_text='Saldo mantenido por los movimientos de stock; vacío hasta el primer ajuste de inventario', null=True, verbose_name='Stock Actual'),
+        ),
+        migrations.AlterField(
+            model_name='movimientostockrepuesto',
+            name='saldo',
+            field=models.IntegerField(blank=True, help_text='Vacío si el repuesto todavía no tenía inventario', null=True, verbose_name='Saldo'),
+        ),
+        migrations.RunPython(vaciar_stock_sin_inventario, migrations.RunPython.noop),
+    ]
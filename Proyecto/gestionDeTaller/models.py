@@ -173,6 +173,11 @@ class Servicio(models.Model):
     firma_cliente = models.ImageField(upload_to='firmas_clientes/', blank=True, null=True, verbose_name="Firma del Cliente")
     nombre_cliente = models.CharField(max_length=100, blank=True, verbose_name="Nombre del Cliente")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'fecha_servicio']),
+        ]
+
     @classmethod
     def get_tiempo_promedio_cierre(cls):
         """
@@ -190,7 +195,7 @@ class Servicio(models.Model):
         return total_dias.days if total_dias else 0
 
     
-    
+    @classmethod
     def get_facturacion_por_tipo(cls, tipo):
         """
         Retorna la facturación total de servicios completados según la clasificación de la preorden.
@@ -268,7 +273,8 @@ class Servicio(models.Model):
 
         # Actualiza el registro de horas del equipo después de guardar el servicio
         if self.horometro_servicio:
-            # Crea o actualiza el registro de horómetro del equipo con el valor del servicio
+            # Crea el registro de horómetro del equipo con el valor del servicio;
+            # la señal de RegistroHorometro actualiza la última hora del equipo
             RegistroHorometro.objects.create(
                 equipo=self.preorden.equipo,
                 horas=self.horometro_servicio,
@@ -276,10 +282,6 @@ class Servicio(models.Model):
                 usuario=self.preorden.creado_por,
                 observaciones="Registro automático desde servicio"
             )
-
-            # Actualiza la última hora registrada en el equipo (esto puede ser un campo en el equipo)
-            self.preorden.equipo.ultima_hora_registrada = self.horometro_servicio
-            self.preorden.equipo.save()
     
     @property
     def esta_firmado(self):
@@ -396,19 +398,39 @@ class GastoAsistencia(models.Model):
 
 class VentaRepuesto(models.Model):
     servicio = models.ForeignKey(Servicio, on_delete=models.PROTECT, related_name='repuestos')
+    repuesto = models.ForeignKey(
+        'Repuesto',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ventas',
+        verbose_name="Repuesto del Catálogo"
+    )
     codigo = models.CharField(max_length=50, verbose_name="Código Repuesto")
     descripcion = models.CharField(max_length=200)
     cantidad = models.PositiveIntegerField()
     costo_unitario = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Costo Unitario", null=True, blank=True)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio Unitario")
 
+    def save(self, *args, **kwargs):
+        # Vincular con el catálogo por código y tomar el costo vigente si no se cargó
+        if self.repuesto_id is None and self.codigo:
+            self.repuesto = Repuesto.objects.filter(codigo=self.codigo.strip()).first()
+        if self.costo_unitario is None and self.repuesto and self.repuesto.costo is not None:
+            self.costo_unitario = self.repuesto.costo
+        super().save(*args, **kwargs)
+
     def get_subtotal(self):
         return self.cantidad * self.precio_unitario
 
     def get_costo_total(self):
+        if self.costo_unitario is None:
+            return None
         return self.cantidad * self.costo_unitario
 
     def get_margen(self):
+        if not self.costo_unitario:
+            return None
         return ((self.precio_unitario - self.costo_unitario) / self.costo_unitario) * 100
 
 
@@ -847,6 +869,42 @@ class LogCambioServicio(models.Model):
         return timezone.now() - self.fecha_cambio
     
 
+class IntervaloEstadoServicio(models.Model):
+    """
+    Tabla de hechos con el tiempo que cada servicio permaneció en cada estado,
+    reconstruida a partir de LogCambioServicio. El intervalo abierto (fin nulo)
+    es el estado actual del servicio.
+    """
+
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='intervalos_estado')
+    sucursal = models.ForeignKey('recursosHumanos.Sucursal', on_delete=models.CASCADE, related_name='+', verbose_name="Sucursal")
+    log = models.ForeignKey(
+        LogCambioServicio,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Cambio que inició el intervalo (vacío para el estado inicial del servicio)"
+    )
+    estado = models.CharField(max_length=50, verbose_name="Estado")
+    inicio = models.DateTimeField(verbose_name="Inicio")
+    fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    duracion_segundos = models.BigIntegerField(null=True, blank=True, verbose_name="Duración (segundos)")
+    mes = models.DateField(verbose_name="Mes", help_text="Primer día del mes en que comenzó el intervalo")
+
+    class Meta:
+        verbose_name = "Intervalo de Estado de Servicio"
+        verbose_name_plural = "Intervalos de Estado de Servicios"
+        ordering = ['servicio', 'inicio']
+        indexes = [
+            models.Index(fields=['estado', 'mes', 'sucursal']),
+            models.Index(fields=['servicio', 'inicio']),
+        ]
+
+    def __str__(self):
+        return f"Servicio {self.servicio_id}: {self.estado} desde {self.inicio:%d/%m/%Y %H:%M}"
+
+
 class LogCambioInforme(models.Model):
     """Modelo para registrar cambios en informes de servicios"""
     
@@ -940,6 +998,13 @@ class Repuesto(models.Model):
         blank=True, 
         verbose_name="Ubicación en Almacén"
     )
+    stock_actual = models.IntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Stock Actual",
+        help_text="Saldo mantenido por los movimientos de stock; vacío hasta el primer ajuste de inventario"
+    )
     
     # Campos de auditoría
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
@@ -962,6 +1027,8 @@ class Repuesto(models.Model):
             models.Index(fields=['categoria']),
             models.Index(fields=['proveedor']),
             models.Index(fields=['activo']),
+            models.Index(fields=['fecha_modificacion']),
+            models.Index(fields=['stock_minimo', 'stock_actual']),
         ]
     
     def __str__(self):
@@ -980,6 +1047,65 @@ class Repuesto(models.Model):
         if self.costo and self.precio_venta:
             return self.precio_venta - self.costo
         return 0 
+
+    @property
+    def bajo_punto_pedido(self):
+        """Indica si el stock llegó al mínimo configurado (sin inventario cargado no se sabe)"""
+        return self.stock_minimo > 0 and self.stock_actual is not None and self.stock_actual <= self.stock_minimo
+
+
+class MovimientoStockRepuesto(models.Model):
+    """Libro de movimientos de stock de un repuesto, con el saldo resultante"""
+
+    TIPO_CHOICES = [
+        ('INGRESO', 'Ingreso'),
+        ('EGRESO', 'Egreso'),
+        ('DEVOLUCION', 'Devolución'),
+        ('AJUSTE', 'Ajuste de Inventario'),
+    ]
+
+    repuesto = models.ForeignKey(Repuesto, on_delete=models.PROTECT, related_name='movimientos', verbose_name="Repuesto")
+    tipo = models.CharField(max_length=15, choices=TIPO_CHOICES, verbose_name="Tipo")
+    cantidad = models.IntegerField(verbose_name="Cantidad", help_text="Positiva para ingresos, negativa para egresos")
+    saldo = models.IntegerField(null=True, blank=True, verbose_name="Saldo", help_text="Vacío si el repuesto todavía no tenía inventario")
+    fecha = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    venta = models.ForeignKey(
+        VentaRepuesto,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_stock',
+        verbose_name="Venta"
+    )
+    pedido = models.ForeignKey(
+        PedidoRepuestosTerceros,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_stock',
+        verbose_name="Pedido"
+    )
+    usuario = models.ForeignKey(
+        'recursosHumanos.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_stock',
+        verbose_name="Usuario"
+    )
+    observaciones = models.CharField(max_length=255, blank=True, verbose_name="Observaciones")
+
+    class Meta:
+        verbose_name = "Movimiento de Stock"
+        verbose_name_plural = "Movimientos de Stock"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['repuesto', 'fecha']),
+            models.Index(fields=['tipo', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} - {self.repuesto.codigo} (saldo {self.saldo})"
     
 
 class HerramientaEspecial(models.Model):
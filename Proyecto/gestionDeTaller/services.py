@@ -0,0 +1,965 @@
+"""
+Servicios de planificación del taller
+"""
+import gzip
+import hashlib
+import io
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import (
+    Avg, Case, Count, DateField, DecimalField, DurationField, ExpressionWrapper, F, IntegerField, Max, OuterRef, Q,
+    Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Cast, Coalesce, Lead, RowNumber, TruncMonth
+from django.utils import timezone
+
+from buscador.services import BuscadorService
+from clientes.models import Equipo, RegistroHorometro
+from .models import (
+    IntervaloEstadoServicio, LogCambioServicio, MovimientoStockRepuesto, PreOrden, Repuesto, Servicio, VentaRepuesto,
+)
+
+
+class PlanificacionMantenimientoService:
+    """
+    Proyecta cuándo cada equipo alcanza su próximo servicio programado.
+
+    La velocidad de uso (horas de motor por día) de cada equipo se ajusta por
+    mínimos cuadrados sobre su historial de RegistroHorometro. El cálculo se
+    hace para toda la flota a la vez con pandas (una consulta para las
+    lecturas y otra para los equipos), no equipo por equipo.
+    """
+
+    DIAS_HISTORIAL = 365
+    MIN_LECTURAS = 2
+    MIN_DIAS_OBSERVADOS = 7  # Evita velocidades absurdas con lecturas del mismo día
+
+    def __init__(self, sucursal=None, dias_historial=None):
+        self.sucursal = sucursal
+        self.dias_historial = dias_historial or self.DIAS_HISTORIAL
+
+    def _equipos(self):
+        equipos = Equipo.objects.filter(activo=True, cliente__activo=True)
+        if self.sucursal:
+            equipos = equipos.filter(cliente__sucursal=self.sucursal)
+        return equipos
+
+    def calcular_velocidades(self):
+        """
+        DataFrame indexado por equipo_id con la velocidad de uso ajustada.
+
+        Columnas: horas_por_dia, ultima_lectura (horas), fecha_ultima_lectura, lecturas.
+        """
+        desde = timezone.now() - timedelta(days=self.dias_historial)
+        lecturas = pd.DataFrame.from_records(
+            RegistroHorometro.objects.filter(
+                equipo__in=self._equipos(),
+                fecha_registro__gte=desde,
+            ).values_list('equipo_id', 'fecha_registro', 'horas'),
+            columns=['equipo_id', 'fecha_registro', 'horas'],
+        )
+        columnas = ['horas_por_dia', 'ultima_lectura', 'fecha_ultima_lectura', 'lecturas']
+        if lecturas.empty:
+            return pd.DataFrame(columns=columnas)
+
+        lecturas['horas'] = lecturas['horas'].astype(float)
+        lecturas['fecha_registro'] = pd.to_datetime(lecturas['fecha_registro'], utc=True)
+        # Días transcurridos desde una referencia común, para la regresión
+        referencia = lecturas['fecha_registro'].min()
+        lecturas['dia'] = (lecturas['fecha_registro'] - referencia).dt.total_seconds() / 86400
+
+        # Pendiente de mínimos cuadrados por equipo: cov(dia, horas) / var(dia)
+        grupos = lecturas.groupby('equipo_id')
+        lecturas['dia_c'] = lecturas['dia'] - grupos['dia'].transform('mean')
+        lecturas['horas_c'] = lecturas['horas'] - grupos['horas'].transform('mean')
+        lecturas['cov'] = lecturas['dia_c'] * lecturas['horas_c']
+        lecturas['var'] = lecturas['dia_c'] ** 2
+        lecturas = lecturas.sort_values('fecha_registro')
+        grupos = lecturas.groupby('equipo_id')
+
+        resumen = pd.DataFrame({
+            'cov': grupos['cov'].sum(),
+            'var': grupos['var'].sum(),
+            'lecturas': grupos.size(),
+            'rango_dias': grupos['dia'].max() - grupos['dia'].min(),
+            'ultima_lectura': grupos['horas'].last(),
+            'fecha_ultima_lectura': grupos['fecha_registro'].last(),
+        })
+        resumen = resumen[
+            (resumen['lecturas'] >= self.MIN_LECTURAS)
+            & (resumen['rango_dias'] >= self.MIN_DIAS_OBSERVADOS)
+            & (resumen['var'] > 0)
+        ]
+        resumen['horas_por_dia'] = resumen['cov'] / resumen['var']
+        resumen = resumen[resumen['horas_por_dia'] > 0]
+        return resumen[columnas]
+
+    def proyectar(self, horizonte_dias=60):
+        """
+        Lista de servicios que vencen dentro del horizonte, ordenada por fecha proyectada.
+
+        Cada elemento es un dict con equipo, sucursal, horómetro estimado actual,
+        horómetro del próximo servicio, horas por día y fecha proyectada.
+        """
+        velocidades = self.calcular_velocidades()
+        if velocidades.empty:
+            return []
+
+        equipos = {
+            equipo.pk: equipo
+            for equipo in self._equipos().filter(
+                pk__in=velocidades.index.tolist()
+            ).select_related('modelo', 'cliente__sucursal')
+        }
+        velocidades = velocidades[velocidades.index.isin(list(equipos))].copy()
+        velocidades['intervalo'] = [equipos[pk].modelo.intervalo_servicio for pk in velocidades.index]
+        velocidades = velocidades[velocidades['intervalo'] > 0]
+
+        ahora = pd.Timestamp(timezone.now())
+        dias_desde_lectura = (ahora - velocidades['fecha_ultima_lectura']).dt.total_seconds() / 86400
+        velocidades['horas_estimadas'] = velocidades['ultima_lectura'] + velocidades['horas_por_dia'] * dias_desde_lectura
+        velocidades['proximo_servicio'] = (
+            (velocidades['ultima_lectura'] // velocidades['intervalo']) + 1
+        ) * velocidades['intervalo']
+        velocidades['dias_restantes'] = (
+            (velocidades['proximo_servicio'] - velocidades['ultima_lectura']) / velocidades['horas_por_dia']
+        ) - dias_desde_lectura
+        velocidades = velocidades[velocidades['dias_restantes'] <= horizonte_dias]
+        velocidades = velocidades.sort_values('dias_restantes')
+
+        hoy = timezone.localdate()
+        vencimientos = []
+        for equipo_id, fila in velocidades.iterrows():
+            equipo = equipos[equipo_id]
+            dias_restantes = max(int(fila['dias_restantes']), 0)
+            vencimientos.append({
+                'equipo': equipo,
+                'sucursal': equipo.cliente.sucursal,
+                'horas_estimadas': round(fila['horas_estimadas'], 1),
+                'proximo_servicio': int(fila['proximo_servicio']),
+                'horas_por_dia': round(fila['horas_por_dia'], 2),
+                'dias_restantes': dias_restantes,
+                'vencido': fila['dias_restantes'] < 0,
+                'fecha_proyectada': hoy + timedelta(days=dias_restantes),
+            })
+        return vencimientos
+
+    def proyectar_por_sucursal(self, horizonte_dias=60):
+        """Vencimientos agrupados por sucursal, cada grupo ordenado por fecha proyectada"""
+        por_sucursal = {}
+        for vencimiento in self.proyectar(horizonte_dias):
+            por_sucursal.setdefault(vencimiento['sucursal'], []).append(vencimiento)
+        return por_sucursal
+
+    def crear_preordenes(self, vencimientos, usuario):
+        """
+        Crear preórdenes PROGRAMADO para los vencimientos que aún no tienen una.
+
+        Se omiten los equipos que ya tienen una preorden programada activa sin
+        servicio asociado. Devuelve la lista de preórdenes creadas.
+        """
+        equipos_ids = [v['equipo'].pk for v in vencimientos]
+        ya_programados = set(PreOrden.objects.filter(
+            equipo_id__in=equipos_ids,
+            clasificacion='PROGRAMADO',
+            activo=True,
+            servicio__isnull=True,
+        ).values_list('equipo_id', flat=True))
+
+        creadas = []
+        with transaction.atomic():
+            for vencimiento in vencimientos:
+                equipo = vencimiento['equipo']
+                if equipo.pk in ya_programados:
+                    continue
+                creadas.append(PreOrden.objects.create(
+                    sucursal=vencimiento['sucursal'],
+                    cliente=equipo.cliente,
+                    equipo=equipo,
+                    solicitud_cliente=f"Servicio de {vencimiento['proximo_servicio']} horas",
+                    detalles_adicionales=(
+                        f"Generada automáticamente por proyección de uso: "
+                        f"{vencimiento['horas_por_dia']} h/día, "
+                        f"horómetro estimado {vencimiento['horas_estimadas']} h."
+                    ),
+                    tipo_trabajo='PRESENCIAL_CAMPO',
+                    clasificacion='PROGRAMADO',
+                    fecha_estimada=vencimiento['fecha_proyectada'],
+                    creado_por=usuario,
+                ))
+                ya_programados.add(equipo.pk)
+        return creadas
+
+
+class CatalogoRepuestosService:
+    """
+    Catálogo de repuestos para los formularios de venta y las tablets sin conexión.
+
+    El catálogo completo se sirve como un snapshot JSON comprimido con gzip y
+    con ETag, cacheado por versión: la versión es la cantidad de repuestos y
+    la última fecha_modificacion, así que cualquier alta, baja o edición genera
+    un snapshot nuevo sin depender de invalidaciones entre procesos.
+    """
+
+    CACHE_KEY = 'gestionDeTaller:catalogo_repuestos:{}'
+    CACHE_TTL = 60 * 60 * 24
+    CAMPOS = ['codigo', 'descripcion', 'costo', 'precio_venta', 'categoria', 'proveedor']
+    POR_PAGINA = 20
+
+    @classmethod
+    def version(cls):
+        estado = Repuesto.objects.aggregate(total=Count('id'), ultima=Max('fecha_modificacion'))
+        ultima = estado['ultima'].timestamp() if estado['ultima'] else 0
+        return f"{estado['total']}-{ultima}"
+
+    @classmethod
+    def snapshot(cls):
+        """Tupla (etag, contenido gzip) del catálogo activo completo"""
+        version = cls.version()
+        snapshot = cache.get(cls.CACHE_KEY.format(version))
+        if snapshot is None:
+            repuestos = list(
+                Repuesto.objects.filter(activo=True).order_by('codigo').values(*cls.CAMPOS)
+            )
+            contenido = json.dumps(
+                {'success': True, 'repuestos': repuestos}, cls=DjangoJSONEncoder
+            ).encode()
+            snapshot = (hashlib.md5(contenido).hexdigest(), gzip.compress(contenido))
+            cache.set(cls.CACHE_KEY.format(version), snapshot, cls.CACHE_TTL)
+        return snapshot
+
+    @classmethod
+    def buscar(cls, texto, pagina=1):
+        """
+        Página de repuestos activos que coinciden con el texto.
+
+        Primero los que empiezan con el código buscado (índice único de codigo)
+        y después los que coinciden por palabras de la descripción, categoría o
+        proveedor (índice FULLTEXT del buscador). Devuelve (repuestos, hay_mas).
+        """
+        texto = (texto or '').strip()
+        if not texto:
+            return [], False
+        repuestos = Repuesto.objects.filter(activo=True).filter(
+            Q(codigo__istartswith=texto) |
+            Q(pk__in=BuscadorService.ids('REPUESTO', texto))
+        ).annotate(
+            orden=Case(
+                When(codigo__istartswith=texto, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('orden', 'codigo')
+
+        inicio = (pagina - 1) * cls.POR_PAGINA
+        # Se pide uno de más para saber si hay otra página sin hacer un COUNT
+        resultados = list(repuestos.values(*cls.CAMPOS)[inicio:inicio + cls.POR_PAGINA + 1])
+        return resultados[:cls.POR_PAGINA], len(resultados) > cls.POR_PAGINA
+
+
+def _normalizar_columna(nombre):
+    """Encabezado en minúsculas, sin acentos ni guiones bajos, para reconocer columnas"""
+    nombre = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[\s_]+', ' ', nombre).strip().lower()
+
+
+# Primer valor que no entra en DecimalField(max_digits=10, decimal_places=2)
+PRECIO_MAXIMO = Decimal('100000000')
+
+
+def _decimal(valor):
+    """
+    Convertir un precio de la planilla a Decimal.
+
+    Acepta "1234.5", "1.234,50", "$ 1,234.50", "1.234" (mil doscientos treinta
+    y cuatro) y números ya convertidos por pandas. Con un único separador
+    seguido de exactamente tres dígitos, el separador es de miles (salvo "0.125").
+    Devuelve None si la celda está vacía, no es un número, es negativa o no
+    entra en los precios de Repuesto (10 dígitos con 2 decimales).
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float, Decimal)):
+        texto = str(valor)
+    else:
+        texto = re.sub(r'[^\d,.\-]', '', str(valor))
+        if not texto:
+            return None
+        if ',' in texto and '.' in texto:
+            # El separador que aparece último es el decimal
+            if texto.rfind(',') > texto.rfind('.'):
+                texto = texto.replace('.', '').replace(',', '.')
+            else:
+                texto = texto.replace(',', '')
+        elif ',' in texto or '.' in texto:
+            separador = ',' if ',' in texto else '.'
+            entero, _, decimales = texto.rpartition(separador)
+            if texto.count(separador) > 1 or (len(decimales) == 3 and entero.lstrip('-') not in ('', '0')):
+                texto = texto.replace(separador, '')
+            else:
+                texto = texto.replace(separador, '.')
+    try:
+        numero = Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+    if not numero.is_finite() or numero < 0 or numero >= PRECIO_MAXIMO:
+        return None
+    return numero
+
+
+def _separador_ambiguo(valor):
+    """True si la celda de texto tiene un solo separador seguido de tres dígitos ("1.234" o "1,234")"""
+    if valor is None or isinstance(valor, (int, float, Decimal)):
+        return False
+    return re.fullmatch(r'[^\d,.]*-?[1-9]\d{0,2}[.,]\d{3}[^\d,.]*', str(valor).strip()) is not None
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _margen(costo, precio):
+    """Margen sobre el costo en porcentaje, igual que Repuesto.margen_ganancia"""
+    if costo and precio:
+        return float((precio - costo) / costo * 100)
+    return None
+
+
+class ImportacionRepuestosService:
+    """
+    Importa una lista de precios de proveedor (Excel o CSV) sobre Repuesto.
+
+    El archivo se compara en memoria contra todos los repuestos existentes,
+    traídos en una sola consulta. Los altas y cambios se aplican con
+    bulk_create/bulk_update por lotes dentro de una transacción. comparar()
+    solo arma el informe (simulación); aplicar() además guarda.
+    """
+
+    # Encabezados aceptados para cada campo (ya normalizados)
+    COLUMNAS = {
+        'codigo': ['codigo', 'cod', 'codigo repuesto', 'numero de parte', 'nro parte', 'part number'],
+        'descripcion': ['descripcion', 'detalle', 'description'],
+        'costo': ['costo', 'precio costo', 'precio de costo', 'cost'],
+        'precio_venta': ['precio venta', 'precio de venta', 'precio', 'precio lista', 'precio de lista', 'price'],
+        'categoria': ['categoria', 'rubro'],
+        'proveedor': ['proveedor'],
+    }
+    CAMPOS_ACTUALIZABLES = ['descripcion', 'costo', 'precio_venta', 'categoria', 'proveedor']
+    TAMANO_LOTE = 1000
+
+    def __init__(self, archivo, nombre_archivo, proveedor=None, usuario=None):
+        self.archivo = archivo
+        self.nombre_archivo = nombre_archivo
+        self.proveedor = proveedor
+        self.usuario = usuario
+
+    def leer(self):
+        """DataFrame con las columnas renombradas a los campos de Repuesto (todo como texto)"""
+        contenido = self.archivo.read()
+        if self.nombre_archivo.lower().endswith(('.xlsx', '.xls')):
+            # Las celdas numéricas llegan como números para no reinterpretar sus separadores
+            df = pd.read_excel(io.BytesIO(contenido), dtype=object)
+        else:
+            try:
+                texto = contenido.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                texto = contenido.decode('latin-1')
+            # sep=None detecta ; o , según el archivo
+            df = pd.read_csv(io.StringIO(texto), dtype=str, sep=None, engine='python')
+
+        alias = {nombre: campo for campo, nombres in self.COLUMNAS.items() for nombre in nombres}
+        renombres = {}
+        for columna in df.columns:
+            campo = alias.get(_normalizar_columna(columna))
+            if campo and campo not in renombres.values():
+                renombres[columna] = campo
+        df = df.rename(columns=renombres)[list(renombres.values())]
+
+        faltantes = [campo for campo in ('codigo', 'precio_venta') if campo not in df.columns]
+        if faltantes:
+            raise ValueError(f"El archivo debe tener las columnas: {', '.join(faltantes)}")
+        return df.astype(object).where(df.notna(), None)
+
+    def comparar(self):
+        """Informe de la importación sin guardar nada"""
+        df = self.leer()
+        existentes = {
+            repuesto['codigo'].upper(): repuesto
+            for repuesto in Repuesto.objects.values('id', 'codigo', *self.CAMPOS_ACTUALIZABLES)
+        }
+        largos = {
+            campo: Repuesto._meta.get_field(campo).max_length for campo in ('codigo', 'categoria', 'proveedor')
+        }
+
+        filas = {}
+        errores = []
+        for numero, fila in enumerate(df.to_dict('records'), start=2):
+            codigo = _texto(fila.get('codigo'))
+            if not codigo:
+                continue
+            valores = {
+                'codigo': codigo,
+                'descripcion': _texto(fila.get('descripcion')),
+                'costo': _decimal(fila.get('costo')),
+                'precio_venta': _decimal(fila.get('precio_venta')),
+                'categoria': _texto(fila.get('categoria')),
+                'proveedor': self.proveedor or _texto(fila.get('proveedor')),
+            }
+            if valores['precio_venta'] is None:
+                errores.append(f'Fila {numero} ({codigo}): precio de venta inválido')
+                continue
+            if valores['costo'] is None and _texto(fila.get('costo')):
+                errores.append(f'Fila {numero} ({codigo}): costo inválido')
+                continue
+            excedidos = [campo for campo, largo in largos.items() if len(valores[campo]) > largo]
+            if excedidos:
+                errores.append(
+                    f"Fila {numero} ({codigo}): supera el largo máximo en "
+                    + ', '.join(f'{campo} ({largos[campo]} caracteres)' for campo in excedidos)
+                )
+                continue
+            for campo in ('costo', 'precio_venta'):
+                if _separador_ambiguo(fila.get(campo)):
+                    errores.append(
+                        f'Fila {numero} ({codigo}): {campo} "{_texto(fila.get(campo))}" se leyó como '
+                        f'{valores[campo]} (separador de miles); revisar si era decimal'
+                    )
+            if codigo.upper() in filas:
+                errores.append(f'Fila {numero} ({codigo}): código repetido en el archivo, se usa esta fila')
+            filas[codigo.upper()] = valores
+
+        nuevos, actualizados = [], []
+        sin_cambios = 0
+        for clave, valores in filas.items():
+            actual = existentes.get(clave)
+            if actual is None:
+                nuevos.append(valores)
+                continue
+            # Las celdas vacías no pisan los datos existentes; el precio siempre viene
+            final = {
+                campo: valores[campo] if valores[campo] not in (None, '') else actual[campo]
+                for campo in self.CAMPOS_ACTUALIZABLES
+            }
+            campos = [campo for campo in self.CAMPOS_ACTUALIZABLES if final[campo] != actual[campo]]
+            if not campos:
+                sin_cambios += 1
+                continue
+            actualizados.append({
+                'id': actual['id'],
+                'codigo': actual['codigo'],
+                'valores': final,
+                'campos': campos,
+                'precio_anterior': actual['precio_venta'],
+                'precio_nuevo': final['precio_venta'],
+                'variacion': (
+                    float((final['precio_venta'] - actual['precio_venta']) / actual['precio_venta'] * 100)
+                    if actual['precio_venta'] else None
+                ),
+                'margen_anterior': _margen(actual['costo'], actual['precio_venta']),
+                'margen_nuevo': _margen(final['costo'], final['precio_venta']),
+            })
+
+        return {
+            'filas': len(df),
+            'nuevos': nuevos,
+            'actualizados': actualizados,
+            'sin_cambios': sin_cambios,
+            'errores': errores,
+            'resumen': self._resumen(actualizados),
+            'aplicado': False,
+        }
+
+    def _resumen(self, actualizados):
+        cambios_precio = [a for a in actualizados if 'precio_venta' in a['campos']]
+        variaciones = [a['variacion'] for a in cambios_precio if a['variacion'] is not None]
+        margenes = [a for a in actualizados if a['margen_anterior'] is not None and a['margen_nuevo'] is not None]
+        return {
+            'cambios_precio': len(cambios_precio),
+            'aumentos': sum(1 for a in cambios_precio if a['precio_nuevo'] > a['precio_anterior']),
+            'bajas': sum(1 for a in cambios_precio if a['precio_nuevo'] < a['precio_anterior']),
+            'variacion_promedio': sum(variaciones) / len(variaciones) if variaciones else None,
+            'margen_promedio_anterior': (
+                sum(a['margen_anterior'] for a in margenes) / len(margenes) if margenes else None
+            ),
+            'margen_promedio_nuevo': (
+                sum(a['margen_nuevo'] for a in margenes) / len(margenes) if margenes else None
+            ),
+        }
+
+    def aplicar(self):
+        """Comparar y guardar las altas y los cambios. Devuelve el mismo informe que comparar()."""
+        informe = self.comparar()
+        ahora = timezone.now()
+        with transaction.atomic():
+            Repuesto.objects.bulk_create(
+                [Repuesto(creado_por=self.usuario, **valores) for valores in informe['nuevos']],
+                batch_size=self.TAMANO_LOTE,
+            )
+            # bulk_update no actualiza los campos auto_now: fecha_modificacion se fija a mano
+            # porque de ella dependen la versión del catálogo y el reindexado de abajo
+            Repuesto.objects.bulk_update(
+                [
+                    Repuesto(id=cambio['id'], fecha_modificacion=ahora, **cambio['valores'])
+                    for cambio in informe['actualizados']
+                ],
+                self.CAMPOS_ACTUALIZABLES + ['fecha_modificacion'],
+                batch_size=self.TAMANO_LOTE,
+            )
+        # Las operaciones masivas no disparan señales: se reindexa el buscador en lote
+        BuscadorService.indexar_queryset('REPUESTO', Repuesto.objects.filter(fecha_modificacion__gte=ahora))
+        informe['aplicado'] = True
+        return informe
+
+
+class RentabilidadRepuestosService:
+    """
+    Rentabilidad de la venta de repuestos, calculada con agregados en la base.
+
+    El costo de cada línea es el cargado en la venta o, para las ventas que no
+    lo tienen, el costo actual del repuesto vinculado del catálogo. El margen
+    es sobre el costo (como Repuesto.margen_ganancia) y solo considera las
+    líneas con costo conocido; las demás se informan aparte.
+    """
+
+    def __init__(self, desde=None, hasta=None, sucursal=None):
+        self.desde = desde
+        self.hasta = hasta
+        self.sucursal = sucursal
+
+    def _ventas(self):
+        ventas = VentaRepuesto.objects.all()
+        if self.desde:
+            ventas = ventas.filter(servicio__fecha_servicio__gte=self.desde)
+        if self.hasta:
+            ventas = ventas.filter(servicio__fecha_servicio__lte=self.hasta)
+        if self.sucursal:
+            ventas = ventas.filter(servicio__preorden__sucursal=self.sucursal)
+        importe = DecimalField(max_digits=14, decimal_places=2)
+        return ventas.annotate(
+            ingreso_linea=ExpressionWrapper(F('cantidad') * F('precio_unitario'), output_field=importe),
+            costo_linea=ExpressionWrapper(
+                F('cantidad') * Coalesce('costo_unitario', 'repuesto__costo'), output_field=importe
+            ),
+        )
+
+    @staticmethod
+    def _agregados():
+        con_costo = Q(costo_unitario__isnull=False) | Q(repuesto__costo__isnull=False)
+        return {
+            'ingresos': Sum('ingreso_linea'),
+            'ingresos_costeados': Sum('ingreso_linea', filter=con_costo),
+            'costos': Sum('costo_linea', filter=con_costo),
+            'lineas': Count('id'),
+            'lineas_sin_costo': Count('id', filter=~con_costo),
+        }
+
+    @staticmethod
+    def _con_margen(queryset):
+        importe = DecimalField(max_digits=14, decimal_places=2)
+        return queryset.annotate(
+            ganancia=ExpressionWrapper(F('ingresos_costeados') - F('costos'), output_field=importe),
+            margen=Case(
+                When(costos__gt=0, then=ExpressionWrapper(
+                    (F('ingresos_costeados') - F('costos')) * 100 / F('costos'), output_field=importe
+                )),
+                default=None,
+                output_field=importe,
+            ),
+        )
+
+    def totales(self):
+        totales = self._ventas().aggregate(**self._agregados())
+        costeados = totales['ingresos_costeados'] or 0
+        costos = totales['costos'] or 0
+        totales['ganancia'] = costeados - costos
+        totales['margen'] = (costeados - costos) * 100 / costos if costos else None
+        return totales
+
+    def por_mes(self):
+        return self._con_margen(
+            self._ventas().annotate(mes=TruncMonth('servicio__fecha_servicio'))
+            .values('mes').annotate(**self._agregados()).order_by('mes')
+        )
+
+    def por_cliente(self, limite=50):
+        return self._con_margen(
+            self._ventas().values(
+                'servicio__preorden__cliente_id',
+                'servicio__preorden__cliente__razon_social',
+            ).annotate(**self._agregados()).order_by('-ingresos')
+        )[:limite]
+
+    def por_servicio(self, limite=50):
+        return self._con_margen(
+            self._ventas().values(
+                'servicio_id',
+                'servicio__fecha_servicio',
+                'servicio__preorden__cliente__razon_social',
+            ).annotate(**self._agregados()).order_by('-servicio__fecha_servicio', '-servicio_id')
+        )[:limite]
+
+
+class StockRepuestosService:
+    """
+    Libro de stock de repuestos.
+
+    Cada movimiento suma su cantidad al saldo del repuesto con un UPDATE
+    incremental (que además bloquea la fila hasta el fin de la transacción) y
+    guarda el saldo resultante, de modo que el stock actual nunca se recalcula
+    recorriendo el historial.
+
+    Un repuesto sin inventario cargado tiene stock_actual vacío: sus
+    movimientos se registran sin saldo y no entra en la reposición hasta que
+    un ajuste de inventario fija el stock contado.
+    """
+
+    DIAS_CONSUMO = 90  # ventana para estimar el consumo diario
+    DIAS_COBERTURA = 30  # días de consumo que se suman a la reposición sugerida
+
+    @classmethod
+    def registrar(cls, repuesto, cantidad, tipo, usuario=None, venta=None, pedido=None, observaciones=''):
+        """Registrar un movimiento y actualizar el saldo. Devuelve el movimiento (None si la cantidad es 0)."""
+        if not cantidad:
+            return None
+        with transaction.atomic():
+            Repuesto.objects.filter(pk=repuesto.pk).update(stock_actual=F('stock_actual') + cantidad)
+            saldo = Repuesto.objects.values_list('stock_actual', flat=True).get(pk=repuesto.pk)
+            repuesto.stock_actual = saldo
+            return MovimientoStockRepuesto.objects.create(
+                repuesto=repuesto,
+                tipo=tipo,
+                cantidad=cantidad,
+                saldo=saldo,
+                venta=venta,
+                pedido=pedido,
+                usuario=usuario,
+                observaciones=observaciones[:255],
+            )
+
+    @classmethod
+    def ingresar(cls, repuesto, cantidad, usuario=None, pedido=None, observaciones=''):
+        if cantidad <= 0:
+            raise ValueError('La cantidad a ingresar debe ser mayor a cero')
+        return cls.registrar(repuesto, cantidad, 'INGRESO', usuario=usuario, pedido=pedido, observaciones=observaciones)
+
+    @classmethod
+    def ajustar(cls, repuesto, stock_contado, usuario=None, observaciones=''):
+        """Ajustar el saldo al stock contado en un inventario físico"""
+        with transaction.atomic():
+            actual = Repuesto.objects.select_for_update().values_list('stock_actual', flat=True).get(pk=repuesto.pk)
+            if actual is None:
+                # Primer inventario: el saldo parte de cero y el ajuste suma lo contado
+                Repuesto.objects.filter(pk=repuesto.pk).update(stock_actual=0)
+                repuesto.stock_actual = actual = 0
+            return cls.registrar(
+                repuesto, stock_contado - actual, 'AJUSTE', usuario=usuario,
+                observaciones=observaciones or f'Inventario: {stock_contado} unidades'
+            )
+
+    @classmethod
+    def sincronizar_venta(cls, venta, cantidad_anterior=0, repuesto_anterior_id=None):
+        """
+        Reflejar en el stock el alta o la modificación de una venta de repuesto.
+
+        Si cambió el repuesto vinculado, se devuelve la cantidad anterior al
+        repuesto original y se descuenta la nueva del actual.
+        """
+        observaciones = f'Servicio #{venta.servicio_id}'
+        if repuesto_anterior_id != venta.repuesto_id:
+            anterior = Repuesto.objects.filter(pk=repuesto_anterior_id).first() if repuesto_anterior_id else None
+            if anterior:
+                cls.registrar(anterior, cantidad_anterior, 'DEVOLUCION', venta=venta, observaciones=observaciones)
+            cantidad_anterior = 0
+        if not venta.repuesto_id:
+            return
+        diferencia = venta.cantidad - cantidad_anterior
+        tipo = 'EGRESO' if diferencia > 0 else 'DEVOLUCION'
+        cls.registrar(venta.repuesto, -diferencia, tipo, venta=venta, observaciones=observaciones)
+
+    @classmethod
+    def anular_venta(cls, venta):
+        """Devolver al stock la cantidad de una venta eliminada"""
+        if venta.repuesto_id:
+            repuesto = Repuesto.objects.filter(pk=venta.repuesto_id).first()
+            if repuesto:
+                cls.registrar(
+                    repuesto, venta.cantidad, 'DEVOLUCION',
+                    observaciones=f'Anulación de venta del servicio #{venta.servicio_id}'
+                )
+
+    @classmethod
+    def reposicion(cls, categoria=None, proveedor=None):
+        """
+        Repuestos activos en o por debajo del punto de pedido, en una sola
+        consulta agrupada: consumo de la ventana, faltante y servicios en
+        espera de repuestos que los usan.
+        """
+        desde = timezone.now() - timedelta(days=cls.DIAS_CONSUMO)
+        en_espera = VentaRepuesto.objects.filter(
+            repuesto=OuterRef('pk'),
+            servicio__estado='ESPERA_REPUESTOS',
+        ).order_by().values('repuesto').annotate(total=Count('servicio', distinct=True)).values('total')
+
+        repuestos = Repuesto.objects.filter(
+            activo=True,
+            stock_minimo__gt=0,
+            stock_actual__lte=F('stock_minimo'),
+        )
+        if categoria:
+            repuestos = repuestos.filter(categoria=categoria)
+        if proveedor:
+            repuestos = repuestos.filter(proveedor=proveedor)
+
+        repuestos = repuestos.annotate(
+            consumo=Coalesce(
+                -Sum('movimientos__cantidad', filter=Q(
+                    movimientos__tipo__in=['EGRESO', 'DEVOLUCION'], movimientos__fecha__gte=desde
+                )),
+                0,
+            ),
+            faltante=ExpressionWrapper(F('stock_minimo') - F('stock_actual'), output_field=IntegerField()),
+            servicios_en_espera=Coalesce(Subquery(en_espera, output_field=IntegerField()), 0),
+        ).order_by('-servicios_en_espera', '-faltante', 'codigo')
+
+        resultado = list(repuestos)
+        for repuesto in resultado:
+            consumo = max(repuesto.consumo, 0)  # las devoluciones netean las ventas anuladas
+            consumo_cobertura = -(-consumo * cls.DIAS_COBERTURA // cls.DIAS_CONSUMO)  # redondeo hacia arriba
+            repuesto.cantidad_sugerida = max(repuesto.faltante + consumo_cobertura, 1)
+        return resultado
+
+
+def _percentil(valores, percentil):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores:
+        return None
+    indice = max(0, -(-percentil * len(valores) // 100) - 1)
+    return valores[indice]
+
+
+class DuracionEstadosService:
+    """
+    Tiempo que los servicios permanecen en cada estado.
+
+    Los intervalos se reconstruyen desde LogCambioServicio con LEAD sobre
+    fecha_cambio, particionado por servicio: cada estado termina con el cambio
+    siguiente del mismo servicio. Antes del primer cambio, el servicio estuvo
+    en el estado_anterior de ese cambio desde su creación. La tabla de hechos
+    se actualiza por servicio: solo se recalculan los servicios con cambios
+    posteriores al último log procesado.
+    """
+
+    TAMANO_LOTE = 500
+    PERCENTILES = (50, 90)
+
+    @classmethod
+    def ultimo_log_procesado(cls):
+        return IntervaloEstadoServicio.objects.aggregate(ultimo=Max('log_id'))['ultimo'] or 0
+
+    @classmethod
+    def actualizar(cls, reconstruir=False):
+        """Procesar los cambios pendientes (o todo el historial). Devuelve servicios e intervalos escritos."""
+        logs = LogCambioServicio.objects.all()
+        if reconstruir:
+            IntervaloEstadoServicio.objects.all().delete()
+        else:
+            logs = logs.filter(id__gt=cls.ultimo_log_procesado())
+        servicio_ids = sorted(set(logs.order_by().values_list('servicio_id', flat=True).distinct()))
+
+        intervalos = 0
+        for i in range(0, len(servicio_ids), cls.TAMANO_LOTE):
+            intervalos += cls.reconstruir_servicios(servicio_ids[i:i + cls.TAMANO_LOTE])
+        return {'servicios': len(servicio_ids), 'intervalos': intervalos}
+
+    @classmethod
+    def reconstruir_servicios(cls, servicio_ids):
+        """Reemplazar los intervalos de los servicios indicados"""
+        orden = [F('fecha_cambio').asc(), F('id').asc()]
+        logs = LogCambioServicio.objects.filter(servicio_id__in=servicio_ids).annotate(
+            fin=Window(Lead('fecha_cambio'), partition_by=[F('servicio_id')], order_by=orden),
+            posicion=Window(RowNumber(), partition_by=[F('servicio_id')], order_by=orden),
+        ).values(
+            'id', 'servicio_id', 'estado_anterior', 'estado_nuevo', 'fecha_cambio', 'fin', 'posicion',
+            'servicio__fecha_creacion', 'servicio__preorden__sucursal_id',
+        ).order_by('servicio_id', 'fecha_cambio', 'id')
+
+        intervalos = []
+        for log in logs:
+            comun = {'servicio_id': log['servicio_id'], 'sucursal_id': log['servicio__preorden__sucursal_id']}
+            creacion = log['servicio__fecha_creacion']
+            if log['posicion'] == 1 and creacion and creacion < log['fecha_cambio']:
+                intervalos.append(cls._intervalo(log['estado_anterior'], creacion, log['fecha_cambio'], **comun))
+            intervalos.append(cls._intervalo(log['estado_nuevo'], log['fecha_cambio'], log['fin'], log_id=log['id'], **comun))
+
+        with transaction.atomic():
+            IntervaloEstadoServicio.objects.filter(servicio_id__in=servicio_ids).delete()
+            IntervaloEstadoServicio.objects.bulk_create(intervalos, batch_size=cls.TAMANO_LOTE)
+        return len(intervalos)
+
+    @staticmethod
+    def _intervalo(estado, inicio, fin, **campos):
+        return IntervaloEstadoServicio(
+            estado=estado,
+            inicio=inicio,
+            fin=fin,
+            duracion_segundos=int((fin - inicio).total_seconds()) if fin else None,
+            mes=timezone.localtime(inicio).date().replace(day=1),
+            **campos
+        )
+
+    # Reportes
+
+    @classmethod
+    def resumen(cls, desde=None, hasta=None, sucursal=None, estado=None, agrupar=('estado',)):
+        """
+        Cantidad, promedio, percentiles y máximo (en horas) de los intervalos
+        cerrados, agrupados por los campos indicados (estado, sucursal, mes).
+
+        Promedio y máximo se agregan en la base; MySQL no tiene PERCENTILE_CONT,
+        así que los percentiles se toman de las duraciones ordenadas de cada grupo.
+        """
+        intervalos = IntervaloEstadoServicio.objects.filter(fin__isnull=False)
+        if desde:
+            intervalos = intervalos.filter(mes__gte=desde.replace(day=1))
+        if hasta:
+            intervalos = intervalos.filter(mes__lte=hasta)
+        if sucursal:
+            intervalos = intervalos.filter(sucursal=sucursal)
+        if estado:
+            intervalos = intervalos.filter(estado=estado)
+
+        campos = [{'sucursal': 'sucursal_id'}.get(campo, campo) for campo in agrupar]
+        filas = list(
+            intervalos.values(*campos).annotate(
+                cantidad=Count('id'),
+                promedio=Avg('duracion_segundos'),
+                maximo=Max('duracion_segundos'),
+            ).order_by(*campos)
+        )
+
+        duraciones = defaultdict(list)
+        for *clave, duracion in intervalos.order_by('duracion_segundos').values_list(*campos, 'duracion_segundos').iterator():
+            duraciones[tuple(clave)].append(duracion)
+
+        for fila in filas:
+            valores = duraciones[tuple(fila[campo] for campo in campos)]
+            fila['promedio_horas'] = fila['promedio'] / 3600 if fila['promedio'] is not None else None
+            fila['maximo_horas'] = fila['maximo'] / 3600 if fila['maximo'] is not None else None
+            for p in cls.PERCENTILES:
+                valor = _percentil(valores, p)
+                fila[f'p{p}_horas'] = valor / 3600 if valor is not None else None
+            if 'estado' in fila:
+                fila['estado_display'] = dict(Servicio.ESTADO_CHOICES).get(fila['estado'], fila['estado'])
+        return filas
+
+    @classmethod
+    def en_curso(cls, estado, sucursal=None, limite=50):
+        """Servicios que están hoy en el estado, del que lleva más tiempo al que menos"""
+        intervalos = IntervaloEstadoServicio.objects.filter(
+            estado=estado, fin__isnull=True, servicio__estado=estado
+        ).select_related('servicio__preorden__cliente', 'servicio__preorden__equipo__modelo', 'sucursal')
+        if sucursal:
+            intervalos = intervalos.filter(sucursal=sucursal)
+        ahora = timezone.now()
+        resultado = list(intervalos.order_by('inicio')[:limite])
+        for intervalo in resultado:
+            intervalo.horas_transcurridas = (ahora - intervalo.inicio).total_seconds() / 3600
+        return resultado
+
+
+class KpiTallerService:
+    """
+    Indicadores del taller para una sucursal y un período, en una sola
+    consulta con agregados condicionales sobre Servicio:
+
+    - Facturación de mano de obra de los servicios completados, por
+      clasificación de la preorden.
+    - Tiempo promedio de cierre (creación a fecha de servicio) de esos servicios.
+    - Trabajo en curso (en proceso o en espera de repuestos) y servicios a
+      facturar: cantidad y valor, al momento de la consulta.
+
+    El resultado se cachea unos minutos por sucursal y período.
+    """
+
+    CACHE_TTL = 300
+    ESTADOS_EN_CURSO = ['EN_PROCESO', 'ESPERA_REPUESTOS']
+
+    def __init__(self, sucursal=None, desde=None, hasta=None):
+        self.sucursal = sucursal
+        self.desde = desde
+        self.hasta = hasta
+
+    def _cache_key(self):
+        return 'taller:kpi:{}:{}:{}'.format(
+            self.sucursal.pk if self.sucursal else 'todas', self.desde or '', self.hasta or ''
+        )
+
+    def calcular(self):
+        kpis = cache.get(self._cache_key())
+        if kpis is None:
+            kpis = self._calcular()
+            cache.set(self._cache_key(), kpis, self.CACHE_TTL)
+        return kpis
+
+    def _calcular(self):
+        completados = Q(estado='COMPLETADO')
+        if self.desde:
+            completados &= Q(fecha_servicio__gte=self.desde)
+        if self.hasta:
+            completados &= Q(fecha_servicio__lte=self.hasta)
+        en_curso = Q(estado__in=self.ESTADOS_EN_CURSO)
+        a_facturar = Q(estado='A_FACTURAR')
+
+        servicios = Servicio.objects.filter(completados | en_curso | a_facturar)
+        if self.sucursal:
+            servicios = servicios.filter(preorden__sucursal=self.sucursal)
+
+        importe = DecimalField(max_digits=14, decimal_places=2)
+        mano_obra = Coalesce('valor_mano_obra', Value(Decimal('0')), output_field=importe)
+        agregados = {
+            f'facturacion_{clave}': Sum(mano_obra, filter=completados & Q(preorden__clasificacion=clasificacion))
+            for clasificacion, _, clave in self._clasificaciones()
+        }
+        agregados.update(
+            completados=Count('id', filter=completados),
+            facturacion_total=Sum(mano_obra, filter=completados),
+            tiempo_promedio_cierre=Avg(
+                ExpressionWrapper(
+                    F('fecha_servicio') - Cast('fecha_creacion', DateField()), output_field=DurationField()
+                ),
+                filter=completados,
+            ),
+            en_curso=Count('id', filter=en_curso),
+            en_curso_valor=Sum(mano_obra, filter=en_curso),
+            espera_repuestos=Count('id', filter=Q(estado='ESPERA_REPUESTOS')),
+            a_facturar=Count('id', filter=a_facturar),
+            a_facturar_valor=Sum(mano_obra, filter=a_facturar),
+        )
+        kpis = servicios.aggregate(**agregados)
+
+        for clave, valor in kpis.items():
+            if valor is None and clave != 'tiempo_promedio_cierre':
+                kpis[clave] = Decimal('0')
+        promedio = kpis['tiempo_promedio_cierre']
+        kpis['tiempo_promedio_cierre'] = round(promedio.total_seconds() / 86400, 1) if promedio is not None else None
+        kpis['facturacion_por_clasificacion'] = [
+            (nombre, kpis[f'facturacion_{clave}']) for _, nombre, clave in self._clasificaciones()
+        ]
+        return kpis
+
+    @staticmethod
+    def _clasificaciones():
+        """(clasificación, nombre, clave del KPI) para cada clasificación de preorden"""
+        return [
+            (clasificacion, nombre, unicodedata.normalize('NFKD', clasificacion).encode('ascii', 'ignore').decode().lower())
+            for clasificacion, nombre in PreOrden.CLASIFICACION_CHOICES
+        ]
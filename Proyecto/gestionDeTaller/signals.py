@@ -1,6 +1,6 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import PreOrden
+from .models import LogCambioServicio, PreOrden, VentaRepuesto
 from clientes.models import RegistroHorometro
 
 @receiver(post_save, sender=PreOrden)
@@ -12,4 +12,46 @@ def registrar_horometro_preorden(sender, instance, created, **kwargs):
             origen='PRE_ORDER',
             usuario=instance.creado_por,
             observaciones="Registro automático desde preorden"
-        )
\ No newline at end of file
+        )
+
+
+@receiver(pre_save, sender=VentaRepuesto)
+def recordar_venta_repuesto_anterior(sender, instance, **kwargs):
+    """Guarda cantidad y repuesto previos para mover el stock solo por la diferencia"""
+    anterior = None
+    if instance.pk and not kwargs.get('raw'):
+        anterior = VentaRepuesto.objects.filter(pk=instance.pk).values('cantidad', 'repuesto_id').first()
+    instance._stock_anterior = anterior or {'cantidad': 0, 'repuesto_id': None}
+
+
+@receiver(post_save, sender=VentaRepuesto)
+def descontar_stock_venta_repuesto(sender, instance, **kwargs):
+    from .services import StockRepuestosService
+
+    # Las cargas de fixtures (loaddata) no mueven stock
+    if kwargs.get('raw'):
+        return
+    anterior = getattr(instance, '_stock_anterior', {'cantidad': 0, 'repuesto_id': None})
+    StockRepuestosService.sincronizar_venta(
+        instance,
+        cantidad_anterior=anterior['cantidad'],
+        repuesto_anterior_id=anterior['repuesto_id'],
+    )
+
+
+@receiver(post_delete, sender=VentaRepuesto)
+def devolver_stock_venta_repuesto(sender, instance, **kwargs):
+    from .services import StockRepuestosService
+
+    if kwargs.get('raw'):
+        return
+    StockRepuestosService.anular_venta(instance)
+
+
+@receiver(post_save, sender=LogCambioServicio)
+def actualizar_intervalos_estado(sender, instance, created, **kwargs):
+    """Cierra el intervalo del estado anterior y abre el del nuevo"""
+    if created:
+        from .services import DuracionEstadosService
+
+        DuracionEstadosService.reconstruir_servicios([instance.servicio_id])
@@ -72,6 +72,13 @@ urlpatterns = [
         path('repuestos/crear/', views.crear_repuesto, name='crear_repuesto'),
         path('repuestos/obtener/', views.obtener_repuesto, name='obtener_repuesto'),
         path('repuestos/lista/', views.obtener_lista_repuestos, name='obtener_lista_repuestos'),
+        path('repuestos/buscar/', views.buscar_repuestos, name='buscar_repuestos'),
+        path('repuestos/importar/', views.importar_repuestos, name='importar_repuestos'),
+        path('repuestos/rentabilidad/', views.reporte_rentabilidad_repuestos, name='reporte_rentabilidad_repuestos'),
+        path('repuestos/stock/movimiento/', views.registrar_movimiento_stock, name='registrar_movimiento_stock'),
+        path('repuestos/reposicion/', views.reposicion_repuestos, name='reposicion_repuestos'),
+        path('reportes/tiempos-estado/', views.reporte_tiempos_estado, name='reporte_tiempos_estado'),
+        path('reportes/kpi/', views.dashboard_kpi, name='dashboard_kpi'),
 
         # URLs para Herramientas Especiales
         path('herramientas-especiales/', views.herramientas_especiales_list, name='herramientas_especiales_list'),
@@ -47,6 +47,14 @@ from .models import (
 )
 from recursosHumanos.models import Usuario
 from .models import EvidenciaPlanAccion5S
+from buscador.services import BuscadorService
+from .services import (
+    CatalogoRepuestosService, DuracionEstadosService, ImportacionRepuestosService, KpiTallerService,
+    RentabilidadRepuestosService, StockRepuestosService,
+)
+from django.views.decorators.http import condition
+from django.utils.cache import patch_vary_headers
+import gzip
 from recursosHumanos.models import Usuario
 
 @login_required
@@ -1451,16 +1459,38 @@ def detalle_tecnico(request, tecnico_id):
     return render(request, 'gestionDeTaller/tecnicos/detalle_tecnico.html', context)
 
 
+@login_required
 def dashboard_kpi(request):
+    """Indicadores del taller por sucursal y período"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para ver los indicadores del taller.')
+        return redirect('gestionDeTaller:gestion_de_taller')
+
+    hoy = timezone.localdate()
+    try:
+        fecha_desde = datetime.strptime(request.GET.get('fecha_desde', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_desde = hoy.replace(day=1)
+    try:
+        fecha_hasta = datetime.strptime(request.GET.get('fecha_hasta', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_hasta = hoy
+
+    sucursales = Sucursal.objects.filter(activo=True).order_by('nombre')
+    if request.user.rol == 'GERENTE':
+        sucursal_id = request.GET.get('sucursal')
+        sucursal = sucursales.filter(id=sucursal_id).first() if sucursal_id else None
+    else:
+        sucursal = request.user.sucursal
+
     context = {
-        'facturacion_spot': Servicio.get_facturacion_spot(),
-        'facturacion_programados': Servicio.get_facturacion_programados(),
-        'facturacion_campania': Servicio.get_facturacion_campania(),
-        'facturacion_adicional': Servicio.get_facturacion_adicional(),
-        'tiempo_promedio_cierre': Servicio.get_tiempo_promedio_cierre(),
-        'trabajo_en_curso': Servicio.get_trabajo_en_curso(),
+        'kpis': KpiTallerService(sucursal=sucursal, desde=fecha_desde, hasta=fecha_hasta).calcular(),
+        'sucursales': sucursales,
+        'sucursal': sucursal,
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta,
     }
-    return render(request, 'dashboard.html', context)
+    return render(request, 'gestionDeTaller/dashboard_kpi.html', context)
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
@@ -2323,18 +2353,14 @@ def gestionar_repuestos(request):
     activo = request.GET.get('activo')
     
     if search:
-        repuestos = repuestos.filter(
-            Q(codigo__icontains=search) |
-            Q(descripcion__icontains=search) |
-            Q(categoria__icontains=search) |
-            Q(proveedor__icontains=search)
-        )
+        repuestos = repuestos.filter(pk__in=BuscadorService.ids('REPUESTO', search))
     
+    # Categoría y proveedor vienen de los valores del desplegable: comparación exacta (usa los índices)
     if categoria:
-        repuestos = repuestos.filter(categoria__icontains=categoria)
+        repuestos = repuestos.filter(categoria=categoria)
     
     if proveedor:
-        repuestos = repuestos.filter(proveedor__icontains=proveedor)
+        repuestos = repuestos.filter(proveedor=proveedor)
     
     if activo is not None:
         repuestos = repuestos.filter(activo=activo == 'true')
@@ -2351,6 +2377,12 @@ def gestionar_repuestos(request):
     categorias_unicas = Repuesto.objects.values_list('categoria', flat=True).distinct().exclude(categoria='').order_by('categoria')
     proveedores_unicos = Repuesto.objects.values_list('proveedor', flat=True).distinct().exclude(proveedor='').order_by('proveedor')
     
+    # Pedidos recientes a los que se puede imputar un ingreso de stock
+    pedidos_ingreso = PedidoRepuestosTerceros.objects.filter(
+        estado__in=['EN_TRANSITO', 'RECIBIDO'],
+        fecha_pedido__gte=timezone.localdate() - timedelta(days=90),
+    ).order_by('-fecha_pedido')[:100]
+    
     context = {
         'page_obj': page_obj,
         'search_filtro': search,
@@ -2359,6 +2391,7 @@ def gestionar_repuestos(request):
         'activo_filtro': activo,
         'categorias_unicas': categorias_unicas,
         'proveedores_unicos': proveedores_unicos,
+        'pedidos_ingreso': pedidos_ingreso,
     }
     
     return render(request, 'gestionDeTaller/gestionar_repuestos.html', context)
@@ -2447,20 +2480,257 @@ def obtener_repuesto(request):
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error al buscar repuesto: {str(e)}'})
 
+def _etag_catalogo_repuestos(request):
+    # Se guarda en el request para no armar el snapshot dos veces
+    request.catalogo_repuestos = CatalogoRepuestosService.snapshot()
+    return request.catalogo_repuestos[0]
+
+
 @login_required
+@condition(etag_func=_etag_catalogo_repuestos)
 def obtener_lista_repuestos(request):
-    """Vista API para obtener lista de repuestos (AJAX)"""
+    """
+    Catálogo completo de repuestos activos (snapshot para uso sin conexión).
+
+    Se sirve ya comprimido con gzip y con ETag: si el cliente envía
+    If-None-Match con la versión que tiene, recibe un 304 sin cuerpo.
+    """
+    etag, comprimido = request.catalogo_repuestos
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(comprimido, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(comprimido), content_type='application/json')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@login_required
+def buscar_repuestos(request):
+    """Autocompletado de repuestos por prefijo de código o palabras de la descripción (AJAX, paginado)"""
     try:
-        repuestos = Repuesto.objects.filter(activo=True).values(
-            'codigo', 'descripcion', 'costo', 'precio_venta', 'categoria', 'proveedor'
-        ).order_by('codigo')
-        
-        return JsonResponse({
-            'success': True,
-            'repuestos': list(repuestos)
-        })
-    except Exception as e:
-        return JsonResponse({'success': False, 'message': f'Error al obtener repuestos: {str(e)}'})
+        pagina = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        pagina = 1
+    repuestos, hay_mas = CatalogoRepuestosService.buscar(request.GET.get('q', ''), pagina)
+    return JsonResponse({
+        'success': True,
+        'repuestos': repuestos,
+        'pagina': pagina,
+        'hay_mas': hay_mas,
+    })
+
+@login_required
+def importar_repuestos(request):
+    """Importar una lista de precios de repuestos (Excel o CSV), con simulación previa"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para importar repuestos.')
+        return redirect('gestionDeTaller:gestionar_repuestos')
+
+    informe = None
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo_lista')
+        if not archivo:
+            messages.error(request, 'Por favor seleccione un archivo.')
+        elif not archivo.name.lower().endswith(('.xlsx', '.xls', '.csv')):
+            messages.error(request, 'Por favor seleccione un archivo Excel (.xlsx, .xls) o CSV.')
+        else:
+            servicio = ImportacionRepuestosService(
+                archivo,
+                archivo.name,
+                proveedor=request.POST.get('proveedor', '').strip() or None,
+                usuario=request.user,
+            )
+            try:
+                if request.POST.get('simular'):
+                    informe = servicio.comparar()
+                else:
+                    informe = servicio.aplicar()
+                    messages.success(
+                        request,
+                        f"Lista importada: {len(informe['nuevos'])} repuestos nuevos y "
+                        f"{len(informe['actualizados'])} actualizados."
+                    )
+            except ValueError as e:
+                messages.error(request, str(e))
+            except Exception as e:
+                messages.error(request, f'Error al procesar el archivo: {str(e)}')
+
+    return render(request, 'gestionDeTaller/importar_repuestos.html', {'informe': informe})
+
+@login_required
+def reporte_rentabilidad_repuestos(request):
+    """Rentabilidad de la venta de repuestos por mes, cliente y servicio"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para ver este reporte.')
+        return redirect('gestionDeTaller:gestionar_repuestos')
+
+    hoy = timezone.localdate()
+    try:
+        fecha_desde = datetime.strptime(request.GET.get('fecha_desde', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_desde = hoy.replace(month=1, day=1)
+    try:
+        fecha_hasta = datetime.strptime(request.GET.get('fecha_hasta', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_hasta = hoy
+
+    sucursales = Sucursal.objects.filter(activo=True).order_by('nombre')
+    if request.user.rol == 'GERENTE':
+        sucursal_id = request.GET.get('sucursal')
+        sucursal = sucursales.filter(id=sucursal_id).first() if sucursal_id else None
+    else:
+        sucursal = request.user.sucursal
+
+    rentabilidad = RentabilidadRepuestosService(desde=fecha_desde, hasta=fecha_hasta, sucursal=sucursal)
+
+    context = {
+        'totales': rentabilidad.totales(),
+        'por_mes': rentabilidad.por_mes(),
+        'por_cliente': rentabilidad.por_cliente(),
+        'por_servicio': rentabilidad.por_servicio(),
+        'sucursales': sucursales,
+        'sucursal': sucursal,
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta,
+    }
+    return render(request, 'gestionDeTaller/reporte_rentabilidad_repuestos.html', context)
+
+
+@login_required
+def registrar_movimiento_stock(request):
+    """Registrar un ingreso o un ajuste de inventario de un repuesto"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        return JsonResponse({'success': False, 'message': 'No tienes permisos para modificar el stock.'})
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido.'})
+
+    repuesto = Repuesto.objects.filter(pk=request.POST.get('repuesto_id')).first()
+    if not repuesto:
+        return JsonResponse({'success': False, 'message': 'Repuesto no encontrado.'})
+
+    try:
+        cantidad = int(request.POST.get('cantidad', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'La cantidad debe ser un número entero.'})
+
+    tipo = request.POST.get('tipo')
+    observaciones = request.POST.get('observaciones', '').strip()
+    try:
+        if tipo == 'INGRESO':
+            pedido = None
+            if request.POST.get('pedido_id'):
+                pedido = PedidoRepuestosTerceros.objects.filter(pk=request.POST['pedido_id']).first()
+            StockRepuestosService.ingresar(
+                repuesto, cantidad, usuario=request.user, pedido=pedido, observaciones=observaciones
+            )
+        elif tipo == 'AJUSTE':
+            if cantidad < 0:
+                return JsonResponse({'success': False, 'message': 'El stock contado no puede ser negativo.'})
+            StockRepuestosService.ajustar(repuesto, cantidad, usuario=request.user, observaciones=observaciones)
+        else:
+            return JsonResponse({'success': False, 'message': 'Tipo de movimiento inválido.'})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+    if repuesto.stock_actual is None:
+        mensaje = f'Movimiento de {repuesto.codigo} registrado. El stock se calculará desde el primer ajuste de inventario.'
+    else:
+        mensaje = f'Stock de {repuesto.codigo} actualizado: {repuesto.stock_actual} unidades.'
+    return JsonResponse({
+        'success': True,
+        'message': mensaje,
+        'stock_actual': repuesto.stock_actual,
+    })
+
+
+@login_required
+def reposicion_repuestos(request):
+    """Repuestos en o por debajo del punto de pedido, con la cantidad sugerida a reponer"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para ver este reporte.')
+        return redirect('gestionDeTaller:gestionar_repuestos')
+
+    categoria = request.GET.get('categoria')
+    proveedor = request.GET.get('proveedor')
+    repuestos = StockRepuestosService.reposicion(categoria=categoria, proveedor=proveedor)
+
+    if request.GET.get('formato') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="reposicion_repuestos_{timezone.localdate():%Y%m%d}.csv"'
+        response.write('\ufeff')
+        writer = csv.writer(response)
+        writer.writerow([
+            'Código', 'Descripción', 'Proveedor', 'Stock Actual', 'Stock Mínimo',
+            f'Consumo {StockRepuestosService.DIAS_CONSUMO} días', 'Servicios en Espera', 'Cantidad Sugerida',
+        ])
+        for repuesto in repuestos:
+            writer.writerow([
+                repuesto.codigo, repuesto.descripcion, repuesto.proveedor, repuesto.stock_actual,
+                repuesto.stock_minimo, repuesto.consumo, repuesto.servicios_en_espera, repuesto.cantidad_sugerida,
+            ])
+        return response
+
+    context = {
+        'repuestos': repuestos,
+        'categoria_filtro': categoria,
+        'proveedor_filtro': proveedor,
+        'categorias_unicas': Repuesto.objects.values_list('categoria', flat=True).distinct().exclude(categoria='').order_by('categoria'),
+        'proveedores_unicos': Repuesto.objects.values_list('proveedor', flat=True).distinct().exclude(proveedor='').order_by('proveedor'),
+        'dias_consumo': StockRepuestosService.DIAS_CONSUMO,
+        'dias_cobertura': StockRepuestosService.DIAS_COBERTURA,
+    }
+    return render(request, 'gestionDeTaller/reposicion_repuestos.html', context)
+
+
+@login_required
+def reporte_tiempos_estado(request):
+    """Tiempo que los servicios permanecen en cada estado, por sucursal y mes"""
+    if request.user.rol not in ['GERENTE', 'ADMINISTRATIVO']:
+        messages.error(request, 'No tienes permisos para ver este reporte.')
+        return redirect('gestionDeTaller:gestion_de_taller')
+
+    hoy = timezone.localdate()
+    try:
+        fecha_desde = datetime.strptime(request.GET.get('fecha_desde', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_desde = (hoy - timedelta(days=180)).replace(day=1)
+    try:
+        fecha_hasta = datetime.strptime(request.GET.get('fecha_hasta', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha_hasta = hoy
+
+    estado = request.GET.get('estado') or 'ESPERA_REPUESTOS'
+    if estado not in dict(Servicio.ESTADO_CHOICES):
+        estado = 'ESPERA_REPUESTOS'
+
+    sucursales = Sucursal.objects.filter(activo=True).order_by('nombre')
+    if request.user.rol == 'GERENTE':
+        sucursal_id = request.GET.get('sucursal')
+        sucursal = sucursales.filter(id=sucursal_id).first() if sucursal_id else None
+    else:
+        sucursal = request.user.sucursal
+
+    filtros = {'desde': fecha_desde, 'hasta': fecha_hasta, 'sucursal': sucursal}
+    por_sucursal_mes = DuracionEstadosService.resumen(estado=estado, agrupar=('sucursal', 'mes'), **filtros)
+    nombres_sucursal = dict(Sucursal.objects.values_list('id', 'nombre'))
+    for fila in por_sucursal_mes:
+        fila['sucursal_nombre'] = nombres_sucursal.get(fila['sucursal_id'], '-')
+
+    context = {
+        'por_estado': DuracionEstadosService.resumen(**filtros),
+        'por_sucursal_mes': por_sucursal_mes,
+        'en_curso': DuracionEstadosService.en_curso(estado, sucursal=sucursal),
+        'estados': Servicio.ESTADO_CHOICES,
+        'estado': estado,
+        'estado_display': dict(Servicio.ESTADO_CHOICES)[estado],
+        'sucursales': sucursales,
+        'sucursal': sucursal,
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta,
+    }
+    return render(request, 'gestionDeTaller/reporte_tiempos_estado.html', context)
+
 
 # Vistas para Herramientas Especiales
 @login_required
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from buscador.admin import BusquedaAdminMixin
 from .models import (
     OperationsCenterConfig, Machine, MachineLocation, MachineEngineHours,
     MachineAlert, MachineHoursOfOperation, DeviceStateReport,
@@ -28,7 +29,7 @@ class OperationsCenterConfigAdmin(admin.ModelAdmin):
 
 
 @admin.register(Machine)
-class MachineAdmin(admin.ModelAdmin):
+class MachineAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = ['machine_id', 'serial_number', 'make_name', 'model_name', 'equipo_local', 'is_active', 'last_sync']
     list_filter = ['is_active', 'make_name', 'last_sync']
     search_fields = ['machine_id', 'serial_number', 'model_name', 'make_name']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OperationscenterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'operationsCenter'
+
+    def ready(self):
+        import operationsCenter.signals  # Importa las señales al iniciar la app
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operationsCenter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machinealert',
+            name='code',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Código'),
+        ),
+    ]
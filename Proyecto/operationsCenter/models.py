@@ -148,6 +148,7 @@ class MachineAlert(models.Model):
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, verbose_name="Severidad")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name="Estado")
     category = models.CharField(max_length=100, blank=True, null=True, verbose_name="Categoría")
+    code = models.CharField(max_length=50, blank=True, verbose_name="Código")
     description = models.TextField(verbose_name="Descripción")
     timestamp = models.DateTimeField(verbose_name="Timestamp")
     acknowledged_at = models.DateTimeField(blank=True, null=True, verbose_name="Reconocida en")
@@ -1,90 +1,287 @@
 import requests
+import hashlib
 import json
+import re
+import threading
+import time
 from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
+from django.db.models import F, Max, Window
+from clientes.models import Equipo, RegistroHorometro
 from .models import (
     OperationsCenterConfig, Machine, MachineLocation, MachineEngineHours,
     MachineAlert, MachineHoursOfOperation, DeviceStateReport
 )
 
 
+class DeereTokenManager:
+    """
+    Gestiona el token OAuth de Operations Center.
+
+    El token vigente se guarda en la caché de Django hasta poco antes de su
+    vencimiento. La renovación es única (single-flight): dentro del proceso se
+    serializa con un lock y entre procesos con un bloqueo de fila sobre
+    OperationsCenterConfig, de modo que varios workers de sincronización no
+    renuevan el mismo token en paralelo.
+    """
+
+    TOKEN_URL = "https://signin.johndeere.com/oauth2/aus78tnlaysMraFhC1t7/v1/token"
+    CONFIG_CACHE_KEY = 'operations_center:config'
+    TOKEN_CACHE_KEY = 'operations_center:token:{config_id}'
+    METRICS_CACHE_KEY = 'operations_center:token_metrics'
+    CONFIG_CACHE_TIMEOUT = 300  # 5 minutos
+    REFRESH_MARGIN = timedelta(minutes=5)  # Renovar antes de que venza
+
+    _lock = threading.Lock()
+
+    def __init__(self, config):
+        self.config = config
+
+    @classmethod
+    def get_active_config(cls):
+        """Configuración activa, cacheada para no consultarla en cada instancia"""
+        config = cache.get(cls.CONFIG_CACHE_KEY)
+        if config is None:
+            config = OperationsCenterConfig.objects.filter(is_active=True).first()
+            if config:
+                cache.set(cls.CONFIG_CACHE_KEY, config, cls.CONFIG_CACHE_TIMEOUT)
+        return config
+
+    @classmethod
+    def invalidate(cls, config_id=None):
+        """Descartar la configuración y el token cacheados"""
+        cache.delete(cls.CONFIG_CACHE_KEY)
+        if config_id:
+            cache.delete(cls.TOKEN_CACHE_KEY.format(config_id=config_id))
+
+    @classmethod
+    def get_metrics(cls):
+        """Métricas de renovación de token del proceso/caché actual"""
+        metrics = cache.get(cls.METRICS_CACHE_KEY) or {
+            'refresh_count': 0,
+            'refresh_failures': 0,
+            'total_seconds': 0.0,
+            'last_seconds': None,
+            'max_seconds': 0.0,
+            'last_refresh_at': None,
+        }
+        count = metrics['refresh_count'] + metrics['refresh_failures']
+        metrics['avg_seconds'] = metrics['total_seconds'] / count if count else None
+        return metrics
+
+    @classmethod
+    def _record_refresh(cls, elapsed, success):
+        metrics = cls.get_metrics()
+        metrics.pop('avg_seconds', None)
+        if success:
+            metrics['refresh_count'] += 1
+        else:
+            metrics['refresh_failures'] += 1
+        metrics['total_seconds'] += elapsed
+        metrics['last_seconds'] = elapsed
+        metrics['max_seconds'] = max(metrics['max_seconds'], elapsed)
+        metrics['last_refresh_at'] = timezone.now().isoformat()
+        cache.set(cls.METRICS_CACHE_KEY, metrics, None)
+
+    def _token_cache_key(self):
+        return self.TOKEN_CACHE_KEY.format(config_id=self.config.pk)
+
+    def _is_fresh(self, expires_at):
+        return expires_at is None or expires_at - self.REFRESH_MARGIN > timezone.now()
+
+    def _store(self, config):
+        """Guardar en caché el token de la configuración hasta su renovación"""
+        self.config = config
+        timeout = None
+        if config.token_expires_at:
+            timeout = max(int((config.token_expires_at - self.REFRESH_MARGIN - timezone.now()).total_seconds()), 1)
+        cache.set(self._token_cache_key(), {
+            'access_token': config.access_token,
+            'expires_at': config.token_expires_at,
+        }, timeout)
+
+    def get_access_token(self):
+        """Token vigente, renovándolo de forma proactiva si está por vencer"""
+        cached = cache.get(self._token_cache_key())
+        if cached and self._is_fresh(cached['expires_at']):
+            return cached['access_token']
+        return self.refresh()
+
+    def refresh(self, stale_token=None):
+        """
+        Renovar el token una sola vez aunque lo pidan varios hilos o procesos.
+
+        Si se indica stale_token (el token rechazado con 401), solo se renueva
+        cuando la base todavía tiene ese mismo token; si otro worker ya lo
+        renovó, se reutiliza el nuevo.
+        """
+        with self._lock:
+            if stale_token is None:
+                cached = cache.get(self._token_cache_key())
+                if cached and self._is_fresh(cached['expires_at']):
+                    return cached['access_token']
+
+            with transaction.atomic():
+                config = OperationsCenterConfig.objects.select_for_update().get(pk=self.config.pk)
+                if not config.access_token:
+                    raise ValueError("No hay token de acceso configurado")
+
+                if stale_token is not None:
+                    needs_refresh = config.access_token == stale_token
+                else:
+                    needs_refresh = not self._is_fresh(config.token_expires_at)
+
+                if needs_refresh:
+                    if not config.refresh_token:
+                        raise ValueError("Token expirado y no hay refresh token")
+                    self._request_new_token(config)
+
+            self._store(config)
+            return config.access_token
+
+    def _request_new_token(self, config):
+        """POST al endpoint de tokens; se llama con la fila de configuración bloqueada"""
+        data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': config.refresh_token,
+            'client_id': config.client_id,
+            'client_secret': config.client_secret,
+            'redirect_uri': config.redirect_uri,
+            'scope': 'eq1 ag1 org1 offline_access'
+        }
+
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json'
+        }
+
+        start = time.monotonic()
+        try:
+            response = requests.post(self.TOKEN_URL, data=data, headers=headers)
+        except requests.RequestException:
+            self._record_refresh(time.monotonic() - start, success=False)
+            raise
+        self._record_refresh(time.monotonic() - start, success=response.status_code == 200)
+
+        if response.status_code != 200:
+            raise Exception(f"Error al renovar token: {response.text}")
+
+        token_data = response.json()
+        config.access_token = token_data['access_token']
+        config.refresh_token = token_data.get('refresh_token', config.refresh_token)
+        config.token_expires_at = timezone.now() + timedelta(seconds=token_data.get('expires_in', 43200))
+        config.save(update_fields=['access_token', 'refresh_token', 'token_expires_at', 'updated_at'])
+
+
 class JohnDeereAPIService:
     """Servicio para interactuar con la API de John Deere Operations Center"""
     
-    BASE_URL = "https://sandboxapi.deere.com/platform"  # URL de sandbox
+    # URL de sandbox; OPERATIONS_CENTER_API_URL permite apuntar a otro servidor (p. ej. uno local de pruebas)
+    BASE_URL = "https://sandboxapi.deere.com/platform"
+    
+    # TTL (segundos) de la caché de respuestas por endpoint. Los endpoints que no
+    # figuran acá (historiales, alertas, horas) no se cachean.
+    RESPONSE_CACHE_TTLS = [
+        (re.compile(r'^/organizations$'), 6 * 3600),
+        (re.compile(r'^/organizations/[^/]+/machines$'), 3600),
+        (re.compile(r'^/machines/[^/]+$'), 6 * 3600),
+    ]
+    # Las respuestas se conservan más allá del TTL para poder revalidarlas con ETag/Last-Modified
+    RESPONSE_CACHE_RETENTION = 7 * 24 * 3600
+    RESPONSE_CACHE_PREFIX = 'operations_center:response:'
+    RESPONSE_STATS_CACHE_KEY = 'operations_center:response_cache_stats'
     
     def __init__(self):
-        self.config = OperationsCenterConfig.objects.filter(is_active=True).first()
+        self.config = DeereTokenManager.get_active_config()
         if not self.config:
             raise ValueError("No hay configuración activa para Operations Center")
+        self.token_manager = DeereTokenManager(self.config)
+        self.base_url = getattr(settings, 'OPERATIONS_CENTER_API_URL', self.BASE_URL)
+    
+    @classmethod
+    def get_cache_stats(cls):
+        """Contadores de la caché de respuestas (hits, revalidaciones 304 y misses)"""
+        return cache.get(cls.RESPONSE_STATS_CACHE_KEY) or {'hits': 0, 'revalidated': 0, 'misses': 0}
+    
+    @classmethod
+    def _count_cache(cls, key):
+        stats = cls.get_cache_stats()
+        stats[key] += 1
+        cache.set(cls.RESPONSE_STATS_CACHE_KEY, stats, None)
+    
+    def _get_cache_ttl(self, endpoint):
+        for pattern, ttl in self.RESPONSE_CACHE_TTLS:
+            if pattern.match(endpoint):
+                return ttl
+        return None
+    
+    def _response_cache_key(self, endpoint, params):
+        raw = json.dumps([self.config.pk, endpoint, sorted((params or {}).items())], default=str)
+        return self.RESPONSE_CACHE_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
     
     def _get_access_token(self):
         """Obtener o renovar el token de acceso"""
-        if not self.config.access_token:
-            raise ValueError("No hay token de acceso configurado")
-        
-        # Verificar si el token ha expirado
-        if self.config.token_expires_at and self.config.token_expires_at <= timezone.now():
-            if self.config.refresh_token:
-                self._refresh_token()
-            else:
-                raise ValueError("Token expirado y no hay refresh token")
-        
-        return self.config.access_token
+        return self.token_manager.get_access_token()
     
-    def _refresh_token(self):
+    def _refresh_token(self, stale_token=None):
         """Renovar el token usando el refresh token"""
-        url = "https://signin.johndeere.com/oauth2/aus78tnlaysMraFhC1t7/v1/token"
-        data = {
-            'grant_type': 'refresh_token',
-            'refresh_token': self.config.refresh_token,
-            'client_id': self.config.client_id,
-            'client_secret': self.config.client_secret,
-            'redirect_uri': self.config.redirect_uri,
-            'scope': 'eq1 ag1 org1 offline_access'
-        }
+        return self.token_manager.refresh(stale_token=stale_token)
+    
+    def _make_request(self, endpoint, params=None, use_cache=True):
+        """Realizar una petición a la API, usando la caché de respuestas si el endpoint tiene TTL"""
+        ttl = self._get_cache_ttl(endpoint) if use_cache else None
+        cache_key = self._response_cache_key(endpoint, params) if ttl else None
+        cached = cache.get(cache_key) if cache_key else None
         
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Accept': 'application/json'
-        }
+        if cached and cached['fresh_until'] > time.time():
+            self._count_cache('hits')
+            return cached['data']
         
-        response = requests.post(url, data=data, headers=headers)
-        if response.status_code == 200:
-            token_data = response.json()
-            self.config.access_token = token_data['access_token']
-            self.config.refresh_token = token_data.get('refresh_token', self.config.refresh_token)
-            self.config.token_expires_at = timezone.now() + timedelta(seconds=token_data.get('expires_in', 43200))
-            self.config.save()
-        else:
-            raise Exception(f"Error al renovar token: {response.text}")
-    
-    def _make_request(self, endpoint, params=None):
-        """Realizar una petición a la API"""
+        access_token = self._get_access_token()
         headers = {
-            'Authorization': f'Bearer {self._get_access_token()}',
+            'Authorization': f'Bearer {access_token}',
             'Accept': 'application/vnd.deere.axiom.v3+json',
             'Content-Type': 'application/vnd.deere.axiom.v3+json'
         }
+        # Petición condicional: si no cambió, la API responde 304 sin cuerpo
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
         
-        url = f"{self.BASE_URL}{endpoint}"
+        url = f"{self.base_url}{endpoint}"
         response = requests.get(url, headers=headers, params=params)
         
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 401:
-            # Token expirado, intentar renovar
-            self._refresh_token()
-            headers['Authorization'] = f'Bearer {self._get_access_token()}'
+        if response.status_code == 401:
+            # Token rechazado, renovar (una sola vez entre workers) y reintentar
+            headers['Authorization'] = f'Bearer {self._refresh_token(stale_token=access_token)}'
             response = requests.get(url, headers=headers, params=params)
-            if response.status_code == 200:
-                return response.json()
+        
+        if response.status_code == 304 and cached:
+            self._count_cache('revalidated')
+            cached['fresh_until'] = time.time() + ttl
+            cache.set(cache_key, cached, self.RESPONSE_CACHE_RETENTION)
+            return cached['data']
+        
+        if response.status_code == 200:
+            data = response.json()
+            if cache_key:
+                self._count_cache('misses')
+                cache.set(cache_key, {
+                    'data': data,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fresh_until': time.time() + ttl,
+                }, self.RESPONSE_CACHE_RETENTION)
+            return data
         
         raise Exception(f"Error en API: {response.status_code} - {response.text}")
     
-    def get_organizations(self):
-        """Obtener organizaciones disponibles"""
+    def get_organizations(self, use_cache=True):
+        """Obtener organizaciones disponibles (use_cache=False consulta siempre la API)"""
         all_organizations = []
         start = 0
         count = 100  # Aumentar el límite por página
@@ -97,7 +294,7 @@ class JohnDeereAPIService:
             
             print(f"Obteniendo organizaciones desde {start} con count {count}")  # Debug
             
-            response = self._make_request('/organizations', params=params)
+            response = self._make_request('/organizations', params=params, use_cache=use_cache)
             organizations = response.get('values', [])
             
             print(f"Organizaciones obtenidas en esta página: {len(organizations)}")  # Debug
@@ -179,6 +376,209 @@ class JohnDeereAPIService:
         return self._make_request(f'/machines/{machine_id}/deviceStateReports', params=params)
 
 
+def normalizar_serie(serie):
+    """Normalizar un número de serie/PIN: sin espacios ni separadores y en mayúsculas"""
+    if not serie:
+        return ''
+    return re.sub(r'[^0-9A-Z]', '', str(serie).upper())
+
+
+def secuencia_pin(serie):
+    """
+    Secuencia de fabricación de un PIN John Deere (últimos 6 caracteres).
+
+    Solo aplica a PIN completos de 13 o 17 caracteres; sirve para vincular
+    cuando una de las partes registra el PIN y la otra solo el número de serie.
+    """
+    serie = normalizar_serie(serie)
+    if len(serie) in (13, 17):
+        return serie[-6:]
+    return None
+
+
+class MachineMatchingService:
+    """Vincula las máquinas de Operations Center con los equipos locales por número de serie"""
+
+    BATCH_SIZE = 500
+
+    def _build_index(self):
+        """Índice en memoria de equipos por serie normalizada y por secuencia de PIN"""
+        por_serie = {}
+        por_secuencia = {}
+        for equipo_id, numero_serie in Equipo.objects.values_list('id', 'numero_serie'):
+            clave = normalizar_serie(numero_serie)
+            if clave:
+                por_serie.setdefault(clave, set()).add(equipo_id)
+            for secuencia in {secuencia_pin(numero_serie), clave if len(clave) == 6 else None}:
+                if secuencia:
+                    por_secuencia.setdefault(secuencia, set()).add(equipo_id)
+        return por_serie, por_secuencia
+
+    def match_machines(self):
+        """
+        Vincular en una sola pasada todas las máquinas sin equipo local.
+
+        Devuelve (vinculadas, ambiguas) donde ambiguas es una lista de
+        (máquina, ids de equipos candidatos) que requieren revisión manual.
+        Los vínculos existentes (manuales o previos) no se modifican.
+        """
+        por_serie, por_secuencia = self._build_index()
+        machines = list(Machine.objects.filter(
+            equipo_local__isnull=True
+        ).exclude(serial_number__isnull=True).exclude(serial_number=''))
+
+        candidatos = {}
+        ambiguas = []
+        for machine in machines:
+            clave = normalizar_serie(machine.serial_number)
+            equipos = por_serie.get(clave)
+            if not equipos:
+                secuencia = secuencia_pin(clave) or (clave if len(clave) == 6 else None)
+                equipos = por_secuencia.get(secuencia) if secuencia else None
+            if not equipos:
+                continue
+            if len(equipos) > 1:
+                ambiguas.append((machine, sorted(equipos)))
+                continue
+            candidatos[machine] = next(iter(equipos))
+
+        # Un equipo ya vinculado, o reclamado por más de una máquina, no se asigna automáticamente
+        ya_vinculados = set(Machine.objects.filter(
+            equipo_local_id__in=set(candidatos.values())
+        ).values_list('equipo_local_id', flat=True))
+        reclamos = {}
+        for machine, equipo_id in candidatos.items():
+            reclamos.setdefault(equipo_id, []).append(machine)
+
+        vincular = []
+        for equipo_id, machines_equipo in reclamos.items():
+            if len(machines_equipo) > 1 or equipo_id in ya_vinculados:
+                ambiguas.extend((machine, [equipo_id]) for machine in machines_equipo)
+                continue
+            machine = machines_equipo[0]
+            machine.equipo_local_id = equipo_id
+            vincular.append(machine)
+
+        Machine.objects.bulk_update(vincular, ['equipo_local'], batch_size=self.BATCH_SIZE)
+        if vincular:
+            # bulk_update no dispara post_save: el documento de búsqueda debe tomar el cliente vinculado
+            from buscador.services import BuscadorService
+            BuscadorService.indexar_queryset('MAQUINA', Machine.objects.filter(pk__in=[m.pk for m in vincular]))
+        return vincular, ambiguas
+
+
+class EngineHoursFeedService:
+    """Vuelca las horas de motor de telemetría al horómetro de los equipos locales"""
+
+    ORIGEN = 'API_JD_LINK'
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def api_response_id(machine_id, timestamp):
+        """Clave de deduplicación de una lectura: máquina + timestamp de la lectura"""
+        return f"{machine_id}:{timestamp.isoformat()}"
+
+    def _latest_readings(self):
+        """
+        Última lectura de horas por equipo vinculado, en una sola consulta: el
+        máximo timestamp por máquina sale de una función de ventana sobre las
+        lecturas de las máquinas activas vinculadas, sin subconsulta por fila.
+        """
+        lecturas = MachineEngineHours.objects.filter(
+            machine__equipo_local__isnull=False,
+            machine__is_active=True,
+        ).annotate(
+            ultimo_timestamp=Window(Max('timestamp'), partition_by=[F('machine')]),
+        ).filter(
+            timestamp=F('ultimo_timestamp'),
+        ).values_list(
+            'machine__equipo_local_id', 'machine__machine_id', 'timestamp', 'engine_hours'
+        )
+
+        # Si un equipo tiene más de una máquina vinculada, gana la lectura más reciente
+        por_equipo = {}
+        for equipo_id, machine_id, timestamp, engine_hours in lecturas:
+            actual = por_equipo.get(equipo_id)
+            if actual is None or timestamp > actual[1]:
+                por_equipo[equipo_id] = (machine_id, timestamp, engine_hours)
+        return por_equipo
+
+    def feed(self):
+        """
+        Registrar la última lectura de cada equipo vinculado en RegistroHorometro.
+
+        Las lecturas ya volcadas (mismo api_response_id) se omiten; los registros
+        nuevos se insertan con bulk_create, fechados con el timestamp de la
+        lectura, y Equipo.ultima_hora_registrada se actualiza con un único
+        bulk_update cuando la lectura es más nueva que la última del equipo.
+        Devuelve la cantidad de registros nuevos.
+        """
+        por_equipo = self._latest_readings()
+        if not por_equipo:
+            return 0
+
+        claves = {
+            equipo_id: self.api_response_id(machine_id, timestamp)
+            for equipo_id, (machine_id, timestamp, _) in por_equipo.items()
+        }
+        existentes = set(RegistroHorometro.objects.filter(
+            origen=self.ORIGEN,
+            api_response_id__in=claves.values(),
+        ).values_list('api_response_id', flat=True))
+
+        nuevos = {
+            equipo_id: lectura for equipo_id, lectura in por_equipo.items()
+            if claves[equipo_id] not in existentes
+        }
+        if not nuevos:
+            return 0
+
+        registros = [
+            RegistroHorometro(
+                equipo_id=equipo_id,
+                horas=engine_hours,
+                origen=self.ORIGEN,
+                api_response_id=claves[equipo_id],
+                datos_api={
+                    'machine_id': machine_id,
+                    'timestamp': timestamp.isoformat(),
+                    'engine_hours': str(engine_hours),
+                },
+                observaciones="Registro automático desde Operations Center",
+            )
+            for equipo_id, (machine_id, timestamp, engine_hours) in nuevos.items()
+        ]
+        with transaction.atomic():
+            RegistroHorometro.objects.bulk_create(registros, batch_size=self.BATCH_SIZE)
+            # bulk_create no dispara señales ni devuelve PKs en MySQL: se recuperan
+            # por su clave para fecharlos y actualizar el puntero de cada equipo
+            creados = list(RegistroHorometro.objects.filter(
+                origen=self.ORIGEN,
+                api_response_id__in=[claves[equipo_id] for equipo_id in nuevos],
+            ).only('pk', 'equipo_id', 'fecha_registro'))
+            # fecha_registro es auto_now_add; bulk_update no lo pisa y deja la fecha de la lectura
+            for registro in creados:
+                registro.fecha_registro = nuevos[registro.equipo_id][1]
+            RegistroHorometro.objects.bulk_update(creados, ['fecha_registro'], batch_size=self.BATCH_SIZE)
+
+            registros_por_equipo = {registro.equipo_id: registro.pk for registro in creados}
+            equipos = list(Equipo.objects.filter(pk__in=nuevos.keys()).annotate(
+                fecha_ultima_lectura=F('ultimo_registro_horometro__fecha_registro')
+            ).only('pk', 'ultima_hora_registrada', 'ultimo_registro_horometro'))
+            # Una lectura de telemetría más vieja que la última cargada no pasa a ser la última
+            equipos = [
+                equipo for equipo in equipos
+                if equipo.fecha_ultima_lectura is None or equipo.fecha_ultima_lectura <= nuevos[equipo.pk][1]
+            ]
+            for equipo in equipos:
+                equipo.ultima_hora_registrada = nuevos[equipo.pk][2]
+                equipo.ultimo_registro_horometro_id = registros_por_equipo.get(equipo.pk)
+            Equipo.objects.bulk_update(
+                equipos, ['ultima_hora_registrada', 'ultimo_registro_horometro'], batch_size=self.BATCH_SIZE
+            )
+        return len(registros)
+
+
 class OperationsCenterSyncService:
     """Servicio para sincronizar datos con Operations Center"""
     
@@ -325,6 +725,7 @@ class OperationsCenterSyncService:
                         'severity': alert.get('severity', 'MEDIUM'),
                         'status': alert.get('status', 'ACTIVE'),
                         'category': alert.get('category'),
+                        'code': alert.get('code') or '',
                         'description': alert.get('description'),
                         'timestamp': timestamp,
                     }
@@ -335,6 +736,7 @@ class OperationsCenterSyncService:
                     machine_alert.severity = alert.get('severity', machine_alert.severity)
                     machine_alert.status = alert.get('status', machine_alert.status)
                     machine_alert.description = alert.get('description', machine_alert.description)
+                    machine_alert.code = alert.get('code') or machine_alert.code
                     machine_alert.save()
             
             return True, f"Sincronizadas alertas para máquina {machine_id}"
@@ -342,6 +744,50 @@ class OperationsCenterSyncService:
         except Exception as e:
             return False, f"Error al sincronizar alertas: {str(e)}"
     
+    def link_machines(self):
+        """Vincular máquinas nuevas con equipos locales por número de serie"""
+        try:
+            vinculadas, ambiguas = MachineMatchingService().match_machines()
+            message = f"Vinculadas {len(vinculadas)} máquinas con equipos locales"
+            if ambiguas:
+                detalle = ', '.join(
+                    f"{machine.serial_number} (equipos {', '.join(map(str, equipos))})"
+                    for machine, equipos in ambiguas
+                )
+                message += f". Requieren revisión manual: {detalle}"
+            return True, message
+        
+        except Exception as e:
+            return False, f"Error al vincular máquinas: {str(e)}"
+    
+    def bridge_alerts(self):
+        """Crear/actualizar las alertas del Centro de Soluciones a partir de las alertas sincronizadas"""
+        from centroSoluciones.services import DespachoAlertasService, PuenteAlertasService
+
+        try:
+            resultado = PuenteAlertasService().sincronizar()
+            asignadas = DespachoAlertasService.despachar_criticas()
+            message = (
+                f"Alertas del Centro de Soluciones: {resultado['creadas']} creadas, "
+                f"{resultado['actualizadas']} actualizadas, {resultado['cerradas']} cerradas, "
+                f"{len(asignadas)} críticas asignadas"
+            )
+            if resultado['sin_equipo']:
+                message += f". {resultado['sin_equipo']} alertas activas de máquinas sin equipo local vinculado"
+            return True, message
+        
+        except Exception as e:
+            return False, f"Error al generar alertas del Centro de Soluciones: {str(e)}"
+    
+    def feed_engine_hours(self):
+        """Actualizar el horómetro de los equipos locales con la telemetría sincronizada"""
+        try:
+            creados = EngineHoursFeedService().feed()
+            return True, f"Registradas {creados} lecturas de horómetro desde telemetría"
+        
+        except Exception as e:
+            return False, f"Error al registrar horómetros: {str(e)}"
+    
     def sync_all_machine_data(self, days_back=7):
         """Sincronizar todos los datos de todas las máquinas"""
         results = []
@@ -351,6 +797,10 @@ class OperationsCenterSyncService:
         results.append(('Máquinas', success, message))
         
         if success:
+            # Vincular con el parque local antes de traer la telemetría
+            link_success, link_message = self.link_machines()
+            results.append(('Vinculación de equipos', link_success, link_message))
+            
             # Luego sincronizar datos de cada máquina
             machines = Machine.objects.filter(is_active=True)
             for machine in machines:
@@ -365,5 +815,13 @@ class OperationsCenterSyncService:
                 # Alertas (más días hacia atrás)
                 success, message = self.sync_machine_alerts(machine.machine_id, 30)
                 results.append((f'Alertas {machine}', success, message))
+            
+            # Pasar las alertas activas al Centro de Soluciones
+            success, message = self.bridge_alerts()
+            results.append(('Alertas Centro de Soluciones', success, message))
+            
+            # Volcar las horas de motor al horómetro de los equipos vinculados
+            success, message = self.feed_engine_hours()
+            results.append(('Horómetros', success, message))
         
         return results 
\ No newline at end of file
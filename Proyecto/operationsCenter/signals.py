@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import OperationsCenterConfig
+from .services import DeereTokenManager
+
+
+@receiver(post_save, sender=OperationsCenterConfig)
+@receiver(post_delete, sender=OperationsCenterConfig)
+def invalidar_cache_config(sender, instance, **kwargs):
+    """Cualquier cambio en la configuración (tokens, organización) descarta la caché"""
+    DeereTokenManager.invalidate(instance.pk)
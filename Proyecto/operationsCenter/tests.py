@@ -1,3 +1,125 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import OperationsCenterConfig
+from .services import JohnDeereAPIService
+
+
+class FakeOperationsCenterHandler(BaseHTTPRequestHandler):
+    """Responde /machines/<id> con ETag y 304 cuando el cliente ya tiene la versión vigente"""
+
+    ETAG = '"v1"'
+    LAST_MODIFIED = 'Mon, 19 Oct 2026 12:00:00 GMT'
+
+    def do_GET(self):
+        self.server.peticiones.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.ETAG:
+            self.send_response(304)
+            self.send_header('ETag', self.ETAG)
+            self.end_headers()
+            return
+        body = json.dumps({'id': self.path.rsplit('/', 1)[-1], 'name': 'Tractor 6110J'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', self.ETAG)
+        self.send_header('Last-Modified', self.LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ResponseCacheTests(TestCase):
+    """Caché de respuestas de JohnDeereAPIService contra un servidor HTTP local"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOperationsCenterHandler)
+        cls.server.peticiones = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            OPERATIONS_CENTER_API_URL=f'http://127.0.0.1:{cls.server.server_port}'
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.peticiones.clear()
+        OperationsCenterConfig.objects.create(
+            client_id='test',
+            client_secret='secret',
+            redirect_uri='http://localhost/callback',
+            access_token='token-vigente',
+            token_expires_at=timezone.now() + timedelta(hours=12),
+        )
+        self.service = JohnDeereAPIService()
+
+    def _vencer(self, endpoint):
+        """Forzar el vencimiento del TTL de una respuesta cacheada"""
+        key = self.service._response_cache_key(endpoint, None)
+        cached = cache.get(key)
+        cached['fresh_until'] = 0
+        cache.set(key, cached, JohnDeereAPIService.RESPONSE_CACHE_RETENTION)
+
+    def test_dentro_del_ttl_no_consulta_la_api(self):
+        primera = self.service.get_machine_details('M1')
+        segunda = self.service.get_machine_details('M1')
+
+        self.assertEqual(primera, segunda)
+        self.assertEqual(len(self.server.peticiones), 1)
+        self.assertEqual(JohnDeereAPIService.get_cache_stats(), {'hits': 1, 'revalidated': 0, 'misses': 1})
+
+    def test_ttl_vencido_revalida_con_etag_y_recibe_304(self):
+        primera = self.service.get_machine_details('M1')
+        self._vencer('/machines/M1')
+
+        segunda = self.service.get_machine_details('M1')
+
+        self.assertEqual(primera, segunda)
+        self.assertEqual(len(self.server.peticiones), 2)
+        self.assertNotIn('If-None-Match', self.server.peticiones[0])
+        self.assertEqual(self.server.peticiones[1]['If-None-Match'], FakeOperationsCenterHandler.ETAG)
+        self.assertEqual(self.server.peticiones[1]['If-Modified-Since'], FakeOperationsCenterHandler.LAST_MODIFIED)
+        self.assertEqual(JohnDeereAPIService.get_cache_stats(), {'hits': 0, 'revalidated': 1, 'misses': 1})
+
+    def test_revalidacion_renueva_el_ttl(self):
+        self.service.get_machine_details('M1')
+        self._vencer('/machines/M1')
+        self.service.get_machine_details('M1')
+
+        self.service.get_machine_details('M1')
+
+        self.assertEqual(len(self.server.peticiones), 2)
+        self.assertEqual(JohnDeereAPIService.get_cache_stats(), {'hits': 1, 'revalidated': 1, 'misses': 1})
+
+    def test_endpoint_sin_ttl_no_se_cachea(self):
+        self.service._make_request('/machines/M1/engineHours')
+        self.service._make_request('/machines/M1/engineHours')
+
+        self.assertEqual(len(self.server.peticiones), 2)
+        self.assertNotIn('If-None-Match', self.server.peticiones[1])
+        self.assertEqual(JohnDeereAPIService.get_cache_stats(), {'hits': 0, 'revalidated': 0, 'misses': 0})
+
+    def test_sin_cache_siempre_consulta_la_api(self):
+        self.service._make_request('/machines/M1')
+        self.service._make_request('/machines/M1', use_cache=False)
+
+        self.assertEqual(len(self.server.peticiones), 2)
+        self.assertNotIn('If-None-Match', self.server.peticiones[1])
+        self.assertEqual(JohnDeereAPIService.get_cache_stats(), {'hits': 0, 'revalidated': 0, 'misses': 1})
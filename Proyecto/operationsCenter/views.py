@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Avg, Sum
+from django.db.models import Count, Avg, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
@@ -15,7 +15,8 @@ from .models import (
     MachineAlert, MachineHoursOfOperation, DeviceStateReport,
     TelemetryReport, TelemetryReportMachine
 )
-from .services import OperationsCenterSyncService, JohnDeereAPIService
+from .services import OperationsCenterSyncService, JohnDeereAPIService, DeereTokenManager
+from buscador.services import BuscadorService
 from clientes.models import Cliente, Equipo
 
 
@@ -81,12 +82,7 @@ def lista_maquinas(request):
     machines = Machine.objects.filter(is_active=True)
     
     if search:
-        machines = machines.filter(
-            Q(serial_number__icontains=search) |
-            Q(model_name__icontains=search) |
-            Q(make_name__icontains=search) |
-            Q(equipo_local__cliente__razon_social__icontains=search)
-        )
+        machines = machines.filter(pk__in=BuscadorService.ids('MAQUINA', search))
     
     if status_filter == 'with_alerts':
         machines = machines.filter(alerts__status='ACTIVE').distinct()
@@ -444,12 +440,15 @@ def api_test_connection(request):
     
     try:
         api_service = JohnDeereAPIService()
-        organizations = api_service.get_organizations()
+        # La prueba tiene que llegar a John Deere: no se responde desde la caché
+        organizations = api_service.get_organizations(use_cache=False)
         
         return JsonResponse({
             'success': True,
             'message': 'Conexión exitosa',
-            'organizations': organizations.get('values', [])
+            'organizations': organizations.get('values', []),
+            'token_metrics': DeereTokenManager.get_metrics(),
+            'response_cache': JohnDeereAPIService.get_cache_stats(),
         })
     except Exception as e:
         return JsonResponse({
@@ -550,7 +549,7 @@ def oauth_callback(request):
             # Intentar obtener organizaciones
             try:
                 api_service = JohnDeereAPIService()
-                organizations = api_service.get_organizations()
+                organizations = api_service.get_organizations(use_cache=False)
                 if organizations.get('values'):
                     # Guardar la primera organización
                     org = organizations['values'][0]
@@ -633,7 +632,7 @@ def habilitar_conexiones_organizaciones(request):
     try:
         # Obtener organizaciones
         api_service = JohnDeereAPIService()
-        organizations = api_service.get_organizations()
+        organizations = api_service.get_organizations(use_cache=False)
         
         # Buscar organizaciones que necesitan conexión
         orgs_needing_connection = []
@@ -675,7 +674,7 @@ def verificar_estado_conexiones(request):
     try:
         # Obtener organizaciones
         api_service = JohnDeereAPIService()
-        organizations = api_service.get_organizations()
+        organizations = api_service.get_organizations(use_cache=False)
         
         # Analizar el estado de las conexiones
         orgs_status = []
@@ -36,7 +36,7 @@ class CiudadAdmin(admin.ModelAdmin):
 @admin.register(Sucursal)
 class SucursalAdmin(admin.ModelAdmin):
     model = Sucursal
-    list_display = ('nombre', 'direccion', 'ciudad', 'provincia')
+    list_display = ('nombre', 'direccion', 'ciudad', 'provincia', 'latitud', 'longitud')
 
 @admin.register(TarifaManoObra)
 class TarifaManoObraAdmin(admin.ModelAdmin):
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursosHumanos', '0013_remove_actividadtrabajo_categoria_facturacion_destinatario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sucursal',
+            name='latitud',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True, verbose_name='Latitud'),
+        ),
+        migrations.AddField(
+            model_name='sucursal',
+            name='longitud',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True, verbose_name='Longitud'),
+        ),
+    ]
@@ -37,6 +37,8 @@ class Sucursal(models.Model):
     direccion = models.CharField(max_length=200, verbose_name="Dirección")
     ciudad = models.ForeignKey(Ciudad, on_delete=models.CASCADE, verbose_name="Ciudad")
     provincia = models.ForeignKey(Provincia, on_delete=models.CASCADE, verbose_name="Provincia")
+    latitud = models.DecimalField(max_digits=10, decimal_places=8, blank=True, null=True, verbose_name="Latitud")
+    longitud = models.DecimalField(max_digits=11, decimal_places=8, blank=True, null=True, verbose_name="Longitud")
     activo = models.BooleanField(default=True, verbose_name="Activo")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     fecha_modificacion = models.DateTimeField(auto_now=True, verbose_name="Última Modificación")
@@ -16,6 +16,20 @@ $(document).ready(function () {
             }
         },
         "scrollX": false,
+        // Los clientes se piden paginados al servidor en lugar de venir todos en la página
+        "serverSide": true,
+        "processing": true,
+        "pageLength": 25,
+        "ajax": $('#tablaClientes').data('url'),
+        "columns": [
+            { "data": "razon_social", "render": $.fn.dataTable.render.text() },
+            { "data": "email", "render": $.fn.dataTable.render.text() },
+            { "data": "telefono", "render": $.fn.dataTable.render.text() },
+            { "data": "provincia", "render": $.fn.dataTable.render.text() }
+        ],
+        "createdRow": function (row, data) {
+            $(row).addClass('fila-servicio').attr('data-url', data.url);
+        },
     });
 
     // Manejar clics en filas con la clase 'fila-servicio' usando delegación de eventos
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from buscador.admin import BusquedaAdminMixin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
@@ -9,7 +10,7 @@ from .models import (
 
 
 @admin.register(EquipoStock)
-class EquipoStockAdmin(admin.ModelAdmin):
+class EquipoStockAdmin(BusquedaAdminMixin, admin.ModelAdmin):
     list_display = [
         'numero_serie', 'modelo', 'tipo_equipo', 'estado', 
         'sucursal', 'fecha_compra_jd', 'dias_en_stock', 'costo_compra'
@@ -12,6 +12,7 @@ import json
 from .models import EquipoStock, Certificado, MovimientoStockCertificado, VentaEquipo, TransferenciaEquipo
 from clientes.models import Cliente, Equipo
 from recursosHumanos.models import Usuario
+from buscador.services import BuscadorService
 
 
 def es_gerente(user):
@@ -85,12 +86,7 @@ def lista_equipos_stock(request):
     if tipo_equipo:
         equipos = equipos.filter(tipo_equipo_id=tipo_equipo)
     if search:
-        equipos = equipos.filter(
-            Q(numero_serie__icontains=search) |
-            Q(modelo__nombre__icontains=search) |
-            Q(modelo__marca__icontains=search) |
-            Q(numero_orden_compra__icontains=search)
-        )
+        equipos = equipos.filter(pk__in=BuscadorService.ids('EQUIPO_STOCK', search))
     
     # Paginación
     paginator = Paginator(equipos, 20)
@@ -298,9 +294,8 @@ def lista_ventas(request):
         ventas = ventas.filter(fecha_venta__lte=fecha_hasta)
     if search:
         ventas = ventas.filter(
-            Q(cliente__razon_social__icontains=search) |
-            Q(cliente__cuit__icontains=search) |
-            Q(equipo_stock__numero_serie__icontains=search) |
+            Q(cliente__in=BuscadorService.ids('CLIENTE', search)) |
+            Q(equipo_stock__in=BuscadorService.ids('EQUIPO_STOCK', search)) |
             Q(numero_factura__icontains=search)
         )
     